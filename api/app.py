@@ -1,11 +1,29 @@
+import os
+import gc
 import json
-import faiss
-import numpy as np
-from fastapi import FastAPI
-from pydantic import BaseModel
-from sentence_transformers import SentenceTransformer
+import time
+import asyncio
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.datastructures import UploadFile
+from starlette.requests import ClientDisconnect
+from pydantic import BaseModel, ValidationError
 from pathlib import Path
-from typing import List
+from typing import List, Optional
+
+from api import bulk, metrics
+from api.memory import process_memory
+from api.batching import SHED_REASONS, DeadlineExceeded, MicroBatcher, QueueFull
+from pipeline.embedding_store import EmbeddingStore
+from pipeline.encoders import ENCODER_BACKEND, encoder_key
+from pipeline.filters import make_filters
+from pipeline.record_store import RECORDS_PATH
+from pipeline.retriever import RecommenderEngine
 
 
 # ========================
@@ -13,22 +31,191 @@ from typing import List
 # ========================
 
 FAISS_INDEX_PATH = Path("data/processed/faiss.index")
-CORPUS_PATH = Path("data/processed/embedding_corpus.json")
+JSON_CORPUS_PATH = Path("data/processed/embedding_corpus.json")
+LEXICAL_INDEX_PATH = Path("data/processed/bm25.npz")
+
+# Compiled, memory-mapped records (pipeline/build_record_store.py) when
+# available; the JSON corpus otherwise
+CORPUS_PATH = RECORDS_PATH if RECORDS_PATH.exists() else JSON_CORPUS_PATH
 MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 TOP_K = 5
 
+# Micro-batching of concurrent /recommend calls
+BATCH_MAX_SIZE = int(os.getenv("RECOMMEND_BATCH_MAX_SIZE", "32"))
+BATCH_WINDOW_MS = float(os.getenv("RECOMMEND_BATCH_WINDOW_MS", "5"))
+
+# Admission control: bounded inference queue, worker threads, torch
+# threads per worker (0 = torch default) and per-request deadline
+# (0 = none). Full queue -> 429, deadline that can't be met -> 503.
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "256"))
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+INFERENCE_TORCH_THREADS = int(os.getenv("INFERENCE_TORCH_THREADS", "0"))
+REQUEST_DEADLINE_MS = float(os.getenv("REQUEST_DEADLINE_MS", "0"))
+
+# Seconds clients are told to wait before retrying a shed request
+RETRY_AFTER = os.getenv("RETRY_AFTER_SECONDS", "1")
+
+# /recommend/batch: queries per encode, threads shared by all bulk
+# requests (kept off the interactive batcher), bulk requests admitted at
+# once (more -> 429) and how much of a request body is buffered in memory
+# before spilling to a temp file
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", str(bulk.DEFAULT_CHUNK_SIZE)))
+BULK_WORKERS = int(os.getenv("BULK_WORKERS", "1"))
+BULK_MAX_REQUESTS = int(os.getenv("BULK_MAX_REQUESTS", "4"))
+BULK_SPOOL_BYTES = int(os.getenv("BULK_SPOOL_BYTES", str(1024 * 1024)))
+
+# Fuse FAISS results with BM25 (pipeline/preprocess.py) by reciprocal
+# rank fusion; helps queries that name a specific skill
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "0") == "1"
+
+# Persistent query-embedding store shared by all workers
+QUERY_STORE_ENABLED = os.getenv("QUERY_STORE_ENABLED", "1") == "1"
+
+# Seconds between checks for a rebuilt index/corpus; 0 disables polling
+INDEX_WATCH_INTERVAL = float(os.getenv("INDEX_WATCH_INTERVAL", "0"))
+
+# "background": serve /health immediately and load + warm up in a thread
+# (poll /ready); "eager": finish loading before accepting connections
+STARTUP_MODE = os.getenv("STARTUP_MODE", "background")
+
 # ========================
 # LOAD RESOURCES ON START
 # ========================
 
-app = FastAPI(title="SHL Assessment Recommendation API")
+# Nothing heavy happens at import time: faiss, torch and the model are
+# loaded by load_engine() once the server has started
+engine = RecommenderEngine(
+    index_path=FAISS_INDEX_PATH,
+    corpus_path=CORPUS_PATH,
+    model_name=MODEL_NAME,
+    lexical_path=LEXICAL_INDEX_PATH if HYBRID_SEARCH else None,
+    encoder_backend=ENCODER_BACKEND,
+    lazy=True
+)
+
+startup_state = {"started_at": time.perf_counter(), "error": None}
+
+
+def load_engine():
+    try:
+        engine.load_index()
+
+        if QUERY_STORE_ENABLED:
+            # Keyed per backend: int8 / ONNX embeddings differ slightly from fp32
+            engine.store = EmbeddingStore(
+                encoder_key(MODEL_NAME, ENCODER_BACKEND), engine.index.d
+            )
+
+        engine.warm_up()
+    except Exception as exc:
+        startup_state["error"] = repr(exc)
+        print(f"❌ Startup failed: {exc!r}")
+        return
+
+    if INDEX_WATCH_INTERVAL > 0:
+        engine.start_watcher(INDEX_WATCH_INTERVAL)
+
+    ready_after = time.perf_counter() - startup_state["started_at"]
+    print(f"✅ Ready after {ready_after:.3f}s")
+
+
+def preload():
+    """
+    Load the index, records and model in the gunicorn master before it
+    forks workers (api/gunicorn_conf.py). Workers then share those pages
+    copy-on-write instead of each loading a copy; load_engine() in the
+    worker only warms up.
+
+    Nothing is encoded here and torch is held to one thread, so no
+    OpenMP thread pool exists at fork time (one inherited by a forked
+    child deadlocks). after_fork() restores the thread count.
+    """
+    import torch
+
+    startup_state["torch_threads"] = torch.get_num_threads()
+    torch.set_num_threads(1)
+
+    engine.load_index()
+    engine.model
+
+    # Move everything loaded so far out of the collector's reach: a GC
+    # pass writes to every object header it visits, un-sharing the pages
+    gc.freeze()
+    print("✅ Preloaded index and model for forked workers")
+
+
+def after_fork():
+    threads = startup_state.pop("torch_threads", None)
+    if threads is not None:
+        import torch
+        torch.set_num_threads(threads)
+
 
-index = faiss.read_index(str(FAISS_INDEX_PATH))
+@asynccontextmanager
+async def lifespan(app):
+    batcher.start()
 
-with open(CORPUS_PATH, "r", encoding="utf-8") as f:
-    corpus = json.load(f)
+    if STARTUP_MODE == "eager":
+        load_engine()
+    else:
+        threading.Thread(
+            target=load_engine, name="engine-startup", daemon=True
+        ).start()
 
-model = SentenceTransformer(MODEL_NAME)
+    yield
+
+    batcher.close()
+    bulk_executor.shutdown(wait=False, cancel_futures=True)
+    engine.close()
+
+
+app = FastAPI(title="SHL Assessment Recommendation API", lifespan=lifespan)
+
+batcher = MicroBatcher(
+    engine,
+    top_k=TOP_K,
+    max_batch_size=BATCH_MAX_SIZE,
+    batch_window_ms=BATCH_WINDOW_MS,
+    max_queue=INFERENCE_QUEUE_SIZE,
+    workers=INFERENCE_WORKERS,
+    torch_threads=INFERENCE_TORCH_THREADS,
+    deadline_ms=REQUEST_DEADLINE_MS,
+    # Started by the lifespan, i.e. in the worker process when forked
+    autostart=False
+)
+
+
+def _init_bulk_worker():
+    if INFERENCE_TORCH_THREADS:
+        import torch
+        torch.set_num_threads(INFERENCE_TORCH_THREADS)
+
+
+bulk_executor = ThreadPoolExecutor(
+    max_workers=BULK_WORKERS,
+    thread_name_prefix="recommend-bulk",
+    initializer=_init_bulk_worker
+)
+
+# Each admitted bulk request has at most one chunk on bulk_executor, so
+# this also bounds the executor's backlog
+bulk_slots = threading.BoundedSemaphore(BULK_MAX_REQUESTS)
+
+# Per-stage latency histograms and gauges for /metrics
+engine.stage_observer = metrics.observe_stage
+batcher.stage_observer = metrics.observe_stage
+metrics.QUEUE_DEPTH.set_function(lambda: batcher.queue_depth)
+metrics.READY.set_function(lambda: int(engine.ready.is_set()))
+metrics.QUEUE_CAPACITY.set(INFERENCE_QUEUE_SIZE)
+metrics.WORKERS.set(INFERENCE_WORKERS)
+for _reason in SHED_REASONS:
+    metrics.SHED.labels(_reason).set_function(
+        lambda reason=_reason: batcher.stats.shed[reason]
+    )
+for _kind in metrics.MEMORY_KINDS:
+    metrics.PROCESS_MEMORY.labels(_kind).set_function(
+        lambda kind=_kind: (process_memory() or {}).get(kind, 0)
+    )
 
 # ========================
 # REQUEST / RESPONSE MODELS
@@ -37,6 +224,13 @@ model = SentenceTransformer(MODEL_NAME)
 class RecommendationRequest(BaseModel):
     query: str
 
+    # Optional metadata filters, applied inside the vector search
+    min_duration: Optional[int] = None      # minutes, inclusive
+    max_duration: Optional[int] = None      # minutes, inclusive
+    remote_support: Optional[bool] = None
+    adaptive_support: Optional[bool] = None
+    job_levels: Optional[List[str]] = None  # matches any of these
+
 
 class RecommendationResponse(BaseModel):
     url: str
@@ -48,38 +242,317 @@ class RecommendationResponse(BaseModel):
     test_type: str
 
 
+RESPONSE_FIELDS = (
+    "url", "name", "description", "duration",
+    "remote_support", "adaptive_support", "test_type"
+)
+
+
+def to_response(record):
+    if "name" in record:
+        # Record store: every field is precomputed at build time
+        return {field: record[field] for field in RESPONSE_FIELDS}
+
+    # Plain embedding_corpus.json records only carry url + text
+    return {
+        "url": record["url"],
+        "name": record["text"].split(".")[0],
+        "description": record["text"],
+        "duration": "Not specified",
+        "remote_support": "Yes",
+        "adaptive_support": "Yes",
+        "test_type": "Individual Test"
+    }
+
+
 # ========================
 # ENDPOINTS
 # ========================
 
 @app.get("/health")
 def health_check():
+    # Liveness only: the process is up. Use /ready for traffic routing.
     return {"status": "ok"}
 
 
+@app.get("/ready")
+def readiness_check():
+    timings = {
+        phase: round(seconds, 3)
+        for phase, seconds in engine.timings.items()
+    }
+
+    if engine.ready.is_set():
+        return {"status": "ready", "timings": timings}
+
+    status = "failed" if startup_state["error"] else "loading"
+
+    return JSONResponse(
+        status_code=503,
+        content={
+            "status": status,
+            "error": startup_state["error"],
+            "timings": timings
+        }
+    )
+
+
+@app.get("/stats/batching")
+def batching_stats():
+    return {
+        "max_batch_size": batcher.max_batch_size,
+        "batch_window_ms": BATCH_WINDOW_MS,
+        "workers": batcher.workers,
+        "queue_depth": batcher.queue_depth,
+        "queue_capacity": batcher.max_queue,
+        "deadline_ms": REQUEST_DEADLINE_MS,
+        **batcher.stats.snapshot()
+    }
+
+
+@app.get("/stats/cache")
+def cache_stats():
+    return {
+        "memory": engine.cache.stats(),
+        "disk": engine.store.stats() if engine.store is not None else None
+    }
+
+
+@app.get("/stats/memory")
+def memory_stats():
+    """
+    This worker's RSS / PSS in bytes; see benchmarks/memory.py for the
+    whole server.
+    """
+    return {"pid": os.getpid(), "memory": process_memory()}
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.post("/admin/reload")
+def reload_index():
+    """
+    Load a rebuilt faiss.index / embedding_corpus.json in the background
+    and swap it in without interrupting requests.
+    """
+    if not engine.ready.is_set():
+        raise HTTPException(status_code=503, detail="Model is still loading")
+
+    engine.reload_in_background()
+    return {"status": "reloading", "current_vectors": engine.index.ntotal}
+
+
+def request_filters(request):
+    return make_filters(
+        min_duration=request.min_duration,
+        max_duration=request.max_duration,
+        remote=request.remote_support,
+        adaptive=request.adaptive_support,
+        job_levels=request.job_levels
+    )
+
+
 @app.post("/recommend", response_model=List[RecommendationResponse])
-def recommend_assessments(request: RecommendationRequest):
-    query_embedding = model.encode(
-        [request.query],
-        normalize_embeddings=True
+async def recommend_assessments(request: RecommendationRequest):
+    with metrics.track_request("/recommend"):
+        if not engine.ready.is_set():
+            raise HTTPException(status_code=503, detail="Model is still loading")
+
+        # Encoding + search run on the batcher thread, coalesced with any
+        # other requests that arrive within the batch window
+        filters = request_filters(request)
+
+        try:
+            hits = await asyncio.wrap_future(
+                batcher.submit(request.query, filters=filters)
+            )
+        except QueueFull as exc:
+            raise HTTPException(
+                status_code=429, detail=str(exc), headers={"Retry-After": RETRY_AFTER}
+            )
+        except DeadlineExceeded as exc:
+            raise HTTPException(
+                status_code=503, detail=str(exc), headers={"Retry-After": RETRY_AFTER}
+            )
+
+        start = time.perf_counter()
+        response = [to_response(hit.record) for hit in hits]
+        metrics.observe_stage("response", time.perf_counter() - start)
+
+        return response
+
+
+# ========================
+# BULK ENDPOINT
+# ========================
+
+def parse_bulk_row(row):
+    try:
+        request = RecommendationRequest.model_validate(row)
+    except ValidationError as exc:
+        raise ValueError("; ".join(
+            f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+            for error in exc.errors()
+        )) from None
+    return request.query, request_filters(request)
+
+
+def _bulk_search_sync(queries, filters):
+    # Bulk queries are mostly one-off: skip the embedding caches so a
+    # large sync doesn't evict the interactive traffic's hot queries
+    hits = engine.search(queries, TOP_K, filters, use_cache=False)
+    return [[to_response(hit.record) for hit in row] for row in hits]
+
+
+async def bulk_search(queries, filters):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        bulk_executor, _bulk_search_sync, queries, filters
     )
 
-    scores, indices = index.search(query_embedding, TOP_K)
 
-    results = []
+def observe_bulk(outcome, count):
+    metrics.BULK_QUERIES.labels(outcome).inc(count)
+
+
+async def spool_body(request):
+    """
+    The request body in a temp file (in memory up to BULK_SPOOL_BYTES).
+    The response can't read the body while it streams, so the body is
+    buffered first, then parsed a chunk at a time.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=BULK_SPOOL_BYTES)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+    return UploadFile(spool)
+
+
+async def read_bulk_rows(request):
+    """
+    Rows of a /recommend/batch request and the files to close once the
+    response has been streamed.
+    """
+    content_type = request.headers.get("content-type", "")
+
+    if content_type.startswith("multipart/form-data"):
+        try:
+            form = await request.form()
+        except AssertionError:
+            # Starlette asserts when python-multipart is not installed
+            raise HTTPException(
+                status_code=415,
+                detail="File uploads need python-multipart; send the CSV / JSONL as the request body instead"
+            )
+
+        upload = form.get("file")
+        if not isinstance(upload, UploadFile):
+            await form.close()
+            raise HTTPException(status_code=422, detail="Expected a 'file' field")
+
+        fmt = bulk.format_for(upload.content_type, upload.filename)
+        closing = form.close
+    else:
+        fmt = bulk.format_for(content_type)
+        if fmt is None:
+            raise HTTPException(
+                status_code=415,
+                detail="Send JSON, JSONL (application/x-ndjson), CSV (text/csv) or a multipart file upload"
+            )
+
+        upload = await spool_body(request)
+        closing = upload.close
+
+    if fmt is None:
+        await closing()
+        raise HTTPException(status_code=415, detail="Upload a .csv, .jsonl or .json file")
+
+    if fmt != "json":
+        return bulk.rows_from_stream(bulk.upload_chunks(upload), fmt), closing
+
+    try:
+        rows = bulk.json_rows(json.loads(await upload.read()))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    finally:
+        await closing()
+
+    return bulk.rows_from_list(rows), None
 
-    for idx in indices[0]:
-        item = corpus[idx]
 
-        results.append({
-            "url": item["url"],
-            "name": item["text"].split(".")[0],
-            "description": item["text"],
-            "duration": "Not specified",
-            "remote_support": "Yes",
-            "adaptive_support": "Yes",
-            "test_type": "Individual Test"
-        })
+class TrackedStreamingResponse(StreamingResponse):
+    """
+    A StreamingResponse that owns `tracking`, an ExitStack holding the
+    request's track_request and bulk slot, and closes it once the body has
+    been sent, has failed, or was abandoned by the client. A stream that
+    stopped before its last line is recorded as CLIENT_CLOSED_STATUS.
+    """
 
-    return results
+    def __init__(self, content, tracking, outcome, **kwargs):
+        super().__init__(self._until_done(content), **kwargs)
+        self.tracking = tracking
+        self.outcome = outcome
+        self.completed = False
 
+    async def _until_done(self, content):
+        async for chunk in content:
+            yield chunk
+        self.completed = True
+
+    async def __call__(self, scope, receive, send):
+        disconnected = None
+
+        with self.tracking:
+            try:
+                await super().__call__(scope, receive, send)
+            except ClientDisconnect as exc:
+                disconnected = exc
+
+            if not self.completed:
+                self.outcome["status"] = metrics.CLIENT_CLOSED_STATUS
+
+        if disconnected is not None:
+            raise disconnected
+
+
+@app.post("/recommend/batch")
+async def recommend_batch(request: Request):
+    """
+    Recommendations for many queries: a JSON list, or a CSV / JSONL body
+    or file upload. Results stream back as NDJSON, one line per query in
+    input order, written as each chunk of BULK_CHUNK_SIZE finishes.
+    """
+    with ExitStack() as stack:
+        outcome = stack.enter_context(metrics.track_request("/recommend/batch"))
+
+        if not engine.ready.is_set():
+            raise HTTPException(status_code=503, detail="Model is still loading")
+
+        if not bulk_slots.acquire(blocking=False):
+            metrics.SHED.labels("bulk_full").inc()
+            raise HTTPException(
+                status_code=429,
+                detail=f"Too many bulk requests ({BULK_MAX_REQUESTS} in progress)",
+                headers={"Retry-After": RETRY_AFTER}
+            )
+        stack.callback(bulk_slots.release)
+
+        rows, closing = await read_bulk_rows(request)
+
+        # From here the response owns the tracking and the slot, so the
+        # request is timed to its last line and errors while streaming
+        # are counted
+        tracking = stack.pop_all()
+
+    return TrackedStreamingResponse(
+        bulk.stream_results(
+            rows, parse_bulk_row, bulk_search, BULK_CHUNK_SIZE, observe_bulk
+        ),
+        tracking,
+        outcome,
+        media_type=bulk.NDJSON_MEDIA_TYPE,
+        background=BackgroundTask(closing) if closing is not None else None
+    )
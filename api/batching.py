@@ -0,0 +1,416 @@
+import math
+import threading
+import time
+import queue
+from collections import Counter, deque
+from concurrent.futures import Future, InvalidStateError
+
+import numpy as np
+
+
+# ========================
+# CONFIG
+# ========================
+
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_BATCH_WINDOW_MS = 5.0
+
+# Admission control: queries allowed to wait, batch worker threads, torch
+# intra-op threads per worker (0 = torch default) and the per-query
+# deadline (0 = none)
+DEFAULT_MAX_QUEUE = 256
+DEFAULT_WORKERS = 1
+DEFAULT_TORCH_THREADS = 0
+DEFAULT_DEADLINE_MS = 0.0
+
+# Smoothing of the batch service time used to predict queue waits
+SERVICE_TIME_ALPHA = 0.2
+
+# How often idle workers check whether the batcher was closed
+CLOSE_POLL_SECONDS = 0.1
+
+# Number of recent queue-wait samples kept for percentile reporting
+WAIT_SAMPLE_SIZE = 2048
+
+
+# ========================
+# ERRORS
+# ========================
+
+class Overloaded(RuntimeError):
+    """
+    A query shed by admission control; `reason` says why.
+    """
+
+    reason = "overloaded"
+
+
+class QueueFull(Overloaded):
+    reason = "queue_full"
+
+
+class DeadlineExceeded(Overloaded):
+    def __init__(self, reason):
+        super().__init__(f"Deadline exceeded ({reason})")
+        self.reason = reason
+
+
+SHED_REASONS = ("queue_full", "deadline_predicted", "deadline_expired")
+
+
+def _resolve(future, result=None, exc=None):
+    """
+    Settle a caller's future, ignoring one the caller already cancelled
+    (e.g. a disconnected client), so a batch worker never dies on it.
+    """
+    try:
+        if exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+# ========================
+# PENDING REQUEST
+# ========================
+
+class _PendingQuery:
+    __slots__ = ("query", "top_k", "filters", "future", "enqueued_at", "deadline")
+
+    def __init__(self, query, top_k, filters=None, deadline=None):
+        self.query = query
+        self.top_k = top_k
+        self.filters = filters
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+        self.deadline = deadline
+
+
+# ========================
+# STATS
+# ========================
+
+class BatchStats:
+    """
+    Running batch-size and queue-wait statistics for a MicroBatcher.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.largest_batch = 0
+        self.batch_sizes = Counter()
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.recent_waits = deque(maxlen=WAIT_SAMPLE_SIZE)
+        self.shed = Counter({reason: 0 for reason in SHED_REASONS})
+
+        # Smoothed seconds per processed batch
+        self.service_time = 0.0
+
+    def record_shed(self, reason, count=1):
+        with self._lock:
+            self.shed[reason] += count
+
+    def record_cancelled(self, count):
+        with self._lock:
+            self.cancelled += count
+
+    def record_service_time(self, seconds):
+        with self._lock:
+            if self.service_time:
+                self.service_time += SERVICE_TIME_ALPHA * (seconds - self.service_time)
+            else:
+                self.service_time = seconds
+
+    def record_batch(self, size, waits, failed=False):
+        with self._lock:
+            self.batches += 1
+            self.requests += size
+            if failed:
+                self.errors += size
+            self.largest_batch = max(self.largest_batch, size)
+            self.batch_sizes[size] += 1
+            self.total_wait += sum(waits)
+            self.max_wait = max(self.max_wait, max(waits))
+            self.recent_waits.extend(waits)
+
+    def snapshot(self):
+        with self._lock:
+            waits = np.array(self.recent_waits, dtype=np.float64) * 1000
+            p50, p95, p99 = (
+                np.percentile(waits, [50, 95, 99]) if len(waits) else (0.0, 0.0, 0.0)
+            )
+
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "errors": self.errors,
+                "cancelled": self.cancelled,
+                "mean_batch_size": (
+                    round(self.requests / self.batches, 2) if self.batches else 0.0
+                ),
+                "largest_batch": self.largest_batch,
+                "service_time_ms": round(self.service_time * 1000, 3),
+                "shed": dict(self.shed),
+                "batch_size_histogram": {
+                    str(size): count
+                    for size, count in sorted(self.batch_sizes.items())
+                },
+                "queue_wait_ms": {
+                    "mean": round(
+                        self.total_wait * 1000 / self.requests, 3
+                    ) if self.requests else 0.0,
+                    "p50": round(float(p50), 3),
+                    "p95": round(float(p95), 3),
+                    "p99": round(float(p99), 3),
+                    "max": round(self.max_wait * 1000, 3),
+                },
+            }
+
+
+# ========================
+# MICRO-BATCHER
+# ========================
+
+class MicroBatcher:
+    """
+    Coalesces concurrent queries into a single encode / index.search on a
+    RecommenderEngine.
+
+    The worker thread takes the first waiting query, then keeps collecting
+    queries until either `max_batch_size` is reached or `batch_window_ms`
+    has passed since the first one arrived. The whole batch is encoded and
+    searched in one call and each caller gets its own row of the result.
+    Queries with metadata filters share the encode; the engine runs one
+    search per distinct filter set.
+
+    Admission control: at most `max_queue` queries wait, and `workers`
+    threads process batches, each limited to `torch_threads` intra-op
+    threads so they don't oversubscribe the CPU. submit() sheds load
+    instead of letting latency grow without bound. It raises QueueFull
+    when the queue is full, and DeadlineExceeded when the predicted wait
+    already exceeds the query's deadline. Queries whose deadline passes
+    while queued are failed with DeadlineExceeded instead of being run.
+    """
+
+    def __init__(
+        self,
+        engine,
+        top_k,
+        max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+        batch_window_ms=DEFAULT_BATCH_WINDOW_MS,
+        max_queue=DEFAULT_MAX_QUEUE,
+        workers=DEFAULT_WORKERS,
+        torch_threads=DEFAULT_TORCH_THREADS,
+        deadline_ms=DEFAULT_DEADLINE_MS,
+        autostart=True,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        if batch_window_ms < 0:
+            raise ValueError("batch_window_ms must be >= 0")
+        if max_queue < 1:
+            raise ValueError("max_queue must be >= 1")
+        if workers < 1:
+            raise ValueError("workers must be >= 1")
+
+        self.engine = engine
+        self.top_k = top_k
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_queue = max_queue
+        self.workers = workers
+        self.torch_threads = torch_threads
+        self.deadline = deadline_ms / 1000.0
+
+        self.stats = BatchStats()
+
+        # Optional observer(stage, seconds, count), e.g. api.metrics
+        self.stage_observer = None
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = threading.Event()
+        self._workers = []
+
+        if autostart:
+            self.start()
+
+    # ------------------------
+    # Public API
+    # ------------------------
+
+    def start(self):
+        """
+        Start the worker threads. Servers that fork after importing the
+        app (gunicorn --preload) pass autostart=False and call this in
+        each worker, since threads don't survive a fork.
+        """
+        if self._workers:
+            return
+
+        self._workers = [
+            threading.Thread(
+                target=self._run,
+                name=f"recommend-batcher-{i}",
+                daemon=True
+            )
+            for i in range(self.workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, query, top_k=None, filters=None, deadline_ms=None):
+        """
+        Queue a query and return a Future resolving to that query's list
+        of engine hits. `deadline_ms` overrides the batcher's deadline.
+        Raises QueueFull / DeadlineExceeded when the query is shed.
+        """
+        if self._closed.is_set():
+            raise RuntimeError("MicroBatcher is closed")
+
+        now = time.perf_counter()
+        budget = self.deadline if deadline_ms is None else deadline_ms / 1000.0
+        deadline = now + budget if budget > 0 else None
+
+        if deadline is not None and now + self.predicted_wait() > deadline:
+            self.stats.record_shed("deadline_predicted")
+            raise DeadlineExceeded("deadline_predicted")
+
+        pending = _PendingQuery(query, top_k or self.top_k, filters, deadline)
+        try:
+            self._queue.put_nowait(pending)
+        except queue.Full:
+            self.stats.record_shed("queue_full")
+            raise QueueFull(f"Inference queue full ({self.max_queue} waiting)") from None
+
+        return pending.future
+
+    def search(self, query, top_k=None, timeout=None, filters=None):
+        return self.submit(query, top_k, filters).result(timeout=timeout)
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def predicted_wait(self):
+        """
+        Seconds a query submitted now would likely wait before its batch
+        finishes: the batches queued ahead of it, plus its own, spread
+        over the workers at the smoothed batch service time.
+        """
+        batches = math.ceil((self._queue.qsize() + 1) / self.max_batch_size)
+        return batches * self.stats.service_time / self.workers
+
+    def close(self):
+        self._closed.set()
+        for worker in self._workers:
+            worker.join(timeout=5)
+
+    # ------------------------
+    # Worker
+    # ------------------------
+
+    def _collect_batch(self, first):
+        batch = [first]
+        deadline = time.perf_counter() + self.batch_window
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+
+            try:
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+            batch.append(item)
+
+        return batch
+
+    def _run(self):
+        if self.torch_threads:
+            import torch
+
+            # Per calling thread under OpenMP, so each worker gets its own cap
+            torch.set_num_threads(self.torch_threads)
+
+        while not self._closed.is_set():
+            try:
+                first = self._queue.get(timeout=CLOSE_POLL_SECONDS)
+            except queue.Empty:
+                continue
+
+            batch = self._collect_batch(first)
+
+            # Drop queries whose caller cancelled while they waited; the
+            # rest are marked running and can no longer be cancelled
+            live = [item for item in batch if item.future.set_running_or_notify_cancel()]
+            if len(live) < len(batch):
+                self.stats.record_cancelled(len(batch) - len(live))
+            if not live:
+                continue
+
+            try:
+                self._process(live)
+            except Exception as exc:
+                # Keep the worker alive: fail this batch, serve the next
+                for item in live:
+                    _resolve(item.future, exc=exc)
+
+        # Fail anything still queued after close()
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            _resolve(item.future, exc=RuntimeError("MicroBatcher is closed"))
+
+    def _process(self, batch):
+        started = time.perf_counter()
+
+        expired = [
+            item for item in batch
+            if item.deadline is not None and started > item.deadline
+        ]
+        if expired:
+            self.stats.record_shed("deadline_expired", len(expired))
+            for item in expired:
+                _resolve(item.future, exc=DeadlineExceeded("deadline_expired"))
+
+            batch = [item for item in batch if item not in expired]
+            if not batch:
+                return
+
+        waits = [started - item.enqueued_at for item in batch]
+
+        if self.stage_observer is not None:
+            for wait in waits:
+                self.stage_observer("queue_wait", wait)
+
+        try:
+            max_k = max(item.top_k for item in batch)
+            filters = [item.filters for item in batch]
+            results = self.engine.search(
+                [item.query for item in batch],
+                top_k=max_k,
+                filters=filters if any(f is not None for f in filters) else None
+            )
+        except Exception as exc:
+            self.stats.record_batch(len(batch), waits, failed=True)
+            for item in batch:
+                _resolve(item.future, exc=exc)
+            return
+
+        self.stats.record_batch(len(batch), waits)
+        self.stats.record_service_time(time.perf_counter() - started)
+
+        for hits, item in zip(results, batch):
+            _resolve(item.future, hits[:item.top_k])
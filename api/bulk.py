@@ -0,0 +1,269 @@
+import csv
+import json
+import codecs
+
+
+# ========================
+# CONFIG
+# ========================
+
+# Queries encoded and searched together per streamed chunk
+DEFAULT_CHUNK_SIZE = 64
+
+# Bytes read from an upload at a time
+READ_SIZE = 64 * 1024
+
+# Request / upload content types, by the format they are parsed as
+CONTENT_TYPES = {
+    "application/json": "json",
+    "application/x-ndjson": "jsonl",
+    "application/jsonl": "jsonl",
+    "application/jsonlines": "jsonl",
+    "text/csv": "csv",
+}
+
+SUFFIXES = {
+    ".json": "json",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".csv": "csv",
+}
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Sent in place of a search exception, whose type and message (faiss,
+# torch, file paths) are internal; the exception is printed server-side
+SEARCH_ERROR = "search failed"
+
+# CSV cells holding several values, e.g. "Graduate;Entry-Level"
+LIST_FIELDS = ("job_levels",)
+LIST_SEPARATOR = ";"
+
+
+# ========================
+# FORMATS
+# ========================
+
+def format_for(content_type=None, filename=None):
+    """
+    Input format ("json", "jsonl" or "csv") from a filename suffix or a
+    content type, None when neither is recognised.
+    """
+    if filename:
+        for suffix, fmt in SUFFIXES.items():
+            if filename.lower().endswith(suffix):
+                return fmt
+
+    if content_type:
+        return CONTENT_TYPES.get(content_type.split(";")[0].strip().lower())
+
+    return None
+
+
+def _as_row(item):
+    return item if isinstance(item, dict) else {"query": str(item)}
+
+
+def json_rows(payload):
+    """
+    Rows of a JSON body: a list of query strings / request objects, or
+    {"queries": [...]}.
+    """
+    if isinstance(payload, dict):
+        payload = payload.get("queries")
+    if not isinstance(payload, list):
+        raise ValueError('Expected a JSON list of queries or {"queries": [...]}')
+
+    return [_as_row(item) for item in payload]
+
+
+# ========================
+# STREAMED PARSING
+# ========================
+
+async def upload_chunks(upload, size=READ_SIZE):
+    """
+    Byte chunks of a starlette UploadFile.
+    """
+    while True:
+        data = await upload.read(size)
+        if not data:
+            return
+        yield data
+
+
+async def iter_lines(chunks):
+    """
+    Text lines of a stream of byte chunks, decoded incrementally (UTF-8,
+    leading BOM dropped) so only one chunk is held at a time.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def jsonl_rows(lines):
+    """
+    One row per non-empty line: a request object or a bare query string.
+    Lines that don't parse are yielded as the ValueError instead, so one
+    bad line doesn't abort the stream.
+    """
+    async for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield _as_row(json.loads(line))
+        except ValueError as exc:
+            yield ValueError(f"Invalid JSON line: {exc}")
+
+
+def _csv_row(header, values):
+    row = {}
+    for name, value in zip(header, values):
+        value = value.strip()
+        if not name or not value:
+            continue
+        if name in LIST_FIELDS:
+            value = [v.strip() for v in value.split(LIST_SEPARATOR) if v.strip()]
+        row[name] = value
+    return row
+
+
+async def csv_rows(lines):
+    """
+    One row per CSV record, keyed by the header row (which must have a
+    `query` column). Quoted fields may span lines: a record is complete
+    once it holds an even number of quote characters.
+    """
+    header = None
+    record = ""
+
+    async for line in lines:
+        record += line
+        if record.count('"') % 2:
+            continue
+
+        text, record = record, ""
+        if not text.strip():
+            continue
+
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            if "query" not in header:
+                yield ValueError("CSV header must include a 'query' column")
+                return
+            continue
+
+        yield _csv_row(header, values)
+
+    if record.strip():
+        yield ValueError("Unterminated quoted field at end of CSV")
+
+
+def rows_from_stream(chunks, fmt):
+    lines = iter_lines(chunks)
+
+    if fmt == "csv":
+        return csv_rows(lines)
+    if fmt == "jsonl":
+        return jsonl_rows(lines)
+
+    raise ValueError(f"Streaming is not supported for {fmt!r} input")
+
+
+async def rows_from_list(rows):
+    for row in rows:
+        yield row
+
+
+# ========================
+# NDJSON RESULTS
+# ========================
+
+async def stream_results(rows, parse, search, chunk_size=DEFAULT_CHUNK_SIZE, observe=None):
+    """
+    NDJSON lines answering `rows`, one per input row and in input order,
+    produced chunk by chunk: `chunk_size` rows are read, turned into
+    (query, filters) by `parse`, searched with one `await search(queries,
+    filters)` call and written out before the next chunk is read.
+    Memory therefore stays bounded by the chunk whatever the input size.
+
+    Rows that fail to parse or search produce {"index", "id"?, "error"}
+    lines (the parse error's message, or SEARCH_ERROR), the others
+    {"index", "id"?, "query", "recommendations"}. `observe`, if given, is
+    called with ("ok" | "error", count) per chunk.
+    """
+    index = 0
+    chunk = []
+
+    def start_line(position, row):
+        line = {"index": position}
+        if isinstance(row, dict) and "id" in row:
+            line["id"] = row["id"]
+        return line
+
+    async def flush(chunk):
+        lines = {}
+        accepted = []
+
+        for position, row in chunk:
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                query, filters = parse(row)
+            except ValueError as exc:
+                lines[position] = {**start_line(position, row), "error": str(exc)}
+                continue
+            accepted.append((position, row, query, filters))
+
+        if accepted:
+            filters = [filters for _, _, _, filters in accepted]
+            try:
+                results = await search(
+                    [query for _, _, query, _ in accepted],
+                    filters if any(f is not None for f in filters) else None
+                )
+            except Exception as exc:
+                print(f"❌ Bulk search failed for {len(accepted)} queries: {exc!r}")
+                results = [exc] * len(accepted)
+
+            for (position, row, query, _), result in zip(accepted, results):
+                line = start_line(position, row)
+                if isinstance(result, Exception):
+                    line["error"] = SEARCH_ERROR
+                else:
+                    line["query"] = query
+                    line["recommendations"] = result
+                lines[position] = line
+
+        if observe is not None:
+            errors = sum(1 for line in lines.values() if "error" in line)
+            observe("ok", len(lines) - errors)
+            observe("error", errors)
+
+        return "".join(
+            json.dumps(lines[position], ensure_ascii=False) + "\n"
+            for position in sorted(lines)
+        )
+
+    async for row in rows:
+        chunk.append((index, row))
+        index += 1
+
+        if len(chunk) >= chunk_size:
+            yield await flush(chunk)
+            chunk = []
+
+    if chunk:
+        yield await flush(chunk)
@@ -0,0 +1,32 @@
+import os
+
+# ========================
+# SHARED-MEMORY SERVING
+# ========================
+#
+#   gunicorn -c api/gunicorn_conf.py api.app:app
+#
+# The master imports the app and loads the FAISS index, records and model
+# once (api.app.preload) before forking. Workers share those pages instead
+# of each holding a copy: the index and records.bin are mmap'd read-only,
+# and the model weights are inherited copy-on-write.
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_WORKERS", "2"))
+worker_class = "uvicorn_worker.UvicornWorker"
+
+preload_app = True
+
+# Worker start-up only warms up, but give slow disks some room
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+
+
+def when_ready(server):
+    # Runs in the master after the app is imported, before any fork
+    from api.app import preload
+    preload()
+
+
+def post_fork(server, worker):
+    from api.app import after_fork
+    after_fork()
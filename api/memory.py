@@ -0,0 +1,79 @@
+import os
+from pathlib import Path
+
+
+# ========================
+# CONFIG
+# ========================
+
+PROC = Path("/proc")
+
+# smaps_rollup fields reported, in kB as the kernel gives them
+FIELDS = (
+    "Rss", "Pss", "Shared_Clean", "Shared_Dirty",
+    "Private_Clean", "Private_Dirty", "Swap",
+)
+
+
+# ========================
+# /proc READERS
+# ========================
+
+def process_memory(pid=None):
+    """
+    Memory of one process from /proc/<pid>/smaps_rollup, in bytes.
+
+    RSS counts every resident page the process maps, so pages shared with
+    other workers (mmap'd index and records, copy-on-write model weights)
+    are counted once per worker. PSS splits each shared page evenly
+    between the processes mapping it: summed over workers it is the real
+    footprint. Returns None where smaps_rollup is unavailable (non-Linux,
+    kernels before 4.14).
+    """
+    path = PROC / str(pid or os.getpid()) / "smaps_rollup"
+
+    try:
+        text = path.read_text()
+    except OSError:
+        return None
+
+    usage = {}
+    for line in text.splitlines():
+        name, _, rest = line.partition(":")
+        if name in FIELDS:
+            usage[name.lower()] = int(rest.split()[0]) * 1024
+
+    usage["shared"] = usage.get("shared_clean", 0) + usage.get("shared_dirty", 0)
+    usage["private"] = usage.get("private_clean", 0) + usage.get("private_dirty", 0)
+    return usage
+
+
+def children(pid):
+    """
+    Direct child pids of `pid`.
+    """
+    pids = []
+    for task in (PROC / str(pid) / "task").glob("*"):
+        try:
+            pids.extend(int(child) for child in (task / "children").read_text().split())
+        except OSError:
+            continue
+    return pids
+
+
+def process_tree(pid):
+    """
+    `pid` followed by all of its descendants.
+    """
+    tree = [pid]
+    for child in children(pid):
+        tree.extend(process_tree(child))
+    return tree
+
+
+def command_line(pid):
+    try:
+        raw = (PROC / str(pid) / "cmdline").read_bytes()
+    except OSError:
+        return ""
+    return " ".join(part.decode(errors="replace") for part in raw.split(b"\0") if part)
@@ -0,0 +1,348 @@
+import time
+import asyncio
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+# ========================
+# CONFIG
+# ========================
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Per-process memory kinds exported from /proc/self/smaps_rollup
+MEMORY_KINDS = ("rss", "pss", "shared", "private")
+
+# Seconds; spans a cached query (~0.1 ms) to a cold encode of a long JD
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+
+# Status label of requests the client gave up on before a response
+# (nginx's "client closed request")
+CLIENT_CLOSED_STATUS = "499"
+
+
+# ========================
+# METRIC TYPES
+# ========================
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """
+    A metric family. Children per label-value tuple are created on first
+    use and cached, so the hot path is a dict lookup plus a locked add.
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+        self._lock = threading.Lock()
+        self._children = {}
+
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value", "lock", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+        self.function = None
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, function):
+        """
+        Evaluate `function` at scrape time instead of storing a value.
+        """
+        self.function = function
+
+    def get(self):
+        return self.function() if self.function is not None else self.value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def _render_child(self, values, child):
+        labels = _format_labels(self.labelnames, values)
+        return [f"{self.name}{labels} {_format_value(child.get())}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+    def set(self, value):
+        self._default.set(value)
+
+    def set_function(self, function):
+        self._default.set_function(function)
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One slot per bucket plus +Inf; made cumulative at render time
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value, count=1):
+        slot = bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[slot] += count
+            self.sum += value * count
+
+    @contextmanager
+    def time(self, count=1):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, count)
+
+
+class Histogram(_Metric):
+    """
+    Cumulative-bucket histogram. observe(value, count) records `count`
+    events of the same value, e.g. every request in a micro-batch that
+    shared one encode.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value, count=1):
+        self._default.observe(value, count)
+
+    def time(self, count=1):
+        return self._default.time(count)
+
+    def _render_child(self, values, child):
+        with child.lock:
+            counts = list(child.counts)
+            total_sum = child.sum
+
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            labels = _format_labels(
+                self.labelnames, values, ("le", _format_value(bound))
+            )
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total_sum)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+# ========================
+# REGISTRY
+# ========================
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """
+        Prometheus text exposition format (version 0.0.4).
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# ========================
+# API METRICS
+# ========================
+
+registry = Registry()
+
+REQUESTS = registry.counter(
+    "shl_requests_total",
+    "Requests handled, by endpoint and HTTP status.",
+    ("endpoint", "status"),
+)
+ERRORS = registry.counter(
+    "shl_request_errors_total",
+    "Failed requests, by endpoint and error type.",
+    ("endpoint", "error"),
+)
+IN_FLIGHT = registry.gauge(
+    "shl_requests_in_flight",
+    "Requests currently being handled, by endpoint.",
+    ("endpoint",),
+)
+REQUEST_DURATION = registry.histogram(
+    "shl_request_duration_seconds",
+    "Time spent in the endpoint handler, by endpoint.",
+    ("endpoint",),
+)
+STAGE_DURATION = registry.histogram(
+    "shl_stage_duration_seconds",
+    "Per-request time in each recommend stage: queue_wait, encode "
+    "(cache lookups, tokenize and model forward), tokenize, search, response.",
+    ("stage",),
+)
+QUEUE_DEPTH = registry.gauge(
+    "shl_batcher_queue_depth",
+    "Queries waiting for the micro-batcher.",
+)
+QUEUE_CAPACITY = registry.gauge(
+    "shl_batcher_queue_capacity",
+    "Queries allowed to wait before new ones are rejected with 429.",
+)
+WORKERS = registry.gauge(
+    "shl_batcher_workers",
+    "Inference worker threads.",
+)
+SHED = registry.counter(
+    "shl_requests_shed_total",
+    "Queries rejected by admission control: queue_full (429), "
+    "deadline_predicted / deadline_expired (503); bulk_full counts "
+    "/recommend/batch requests rejected with 429.",
+    ("reason",),
+)
+BULK_QUERIES = registry.counter(
+    "shl_bulk_queries_total",
+    "Queries answered by /recommend/batch, by outcome (ok / error).",
+    ("outcome",),
+)
+PROCESS_MEMORY = registry.gauge(
+    "shl_process_memory_bytes",
+    "Memory of this worker process by kind: rss, pss (shared pages "
+    "split between the processes mapping them), shared, private.",
+    ("kind",),
+)
+READY = registry.gauge(
+    "shl_engine_ready",
+    "1 once the index and model are loaded and warmed up.",
+)
+
+
+def observe_stage(stage, seconds, count=1):
+    STAGE_DURATION.labels(stage).observe(seconds, count)
+
+
+@contextmanager
+def track_request(endpoint):
+    """
+    Count, time and track in-flight state for one request. HTTPExceptions
+    are recorded with their status code, anything else as a 500. A request
+    abandoned by its client (the handler cancelled, or a streamed body
+    closed early) is recorded as CLIENT_CLOSED_STATUS. Yields a dict in
+    which the caller may set "status" for a request that ends without an
+    exception, e.g. a stream the server stopped after a disconnect.
+    """
+    in_flight = IN_FLIGHT.labels(endpoint)
+    in_flight.inc()
+    start = time.perf_counter()
+    outcome = {}
+    status = None
+
+    try:
+        yield outcome
+    except (asyncio.CancelledError, GeneratorExit):
+        status = CLIENT_CLOSED_STATUS
+        raise
+    except Exception as exc:
+        status = str(getattr(exc, "status_code", 500))
+        ERRORS.labels(endpoint, type(exc).__name__).inc()
+        raise
+    finally:
+        status = status or outcome.get("status", "200")
+        in_flight.dec()
+        REQUEST_DURATION.labels(endpoint).observe(time.perf_counter() - start)
+        REQUESTS.labels(endpoint, status).inc()
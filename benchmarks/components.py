@@ -0,0 +1,244 @@
+import json
+import time
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from pipeline.index_config import (
+    INDEX_CONFIG_PATH,
+    apply_search_params,
+    build_index,
+    load_index_config,
+)
+from pipeline.record_store import RecordStore, compile_records, open_records
+
+# ========================
+# CONFIG
+# ========================
+
+CORPUS_PATH = Path("data/processed/embedding_corpus.json")
+CATALOGUE_PATH = Path("data/processed/shl_catalogue.json")
+EMBEDDINGS_PATH = Path("data/processed/embeddings.npy")
+
+BATCH_SIZES = (1, 8, 32)
+SCALES = (1, 10, 100)
+TOP_K = 5
+
+# Spread of the synthetic copies around their source vector
+SCALE_NOISE = 0.02
+
+
+# ========================
+# TIMING
+# ========================
+
+# Fast calls are repeated until this much time is sampled, so sub-ms
+# p50s are stable enough to compare against a baseline
+MIN_SAMPLE_SECONDS = 0.5
+MAX_REPEATS = 20000
+
+
+def time_calls(function, repeats=20, warmup=2, min_seconds=MIN_SAMPLE_SECONDS):
+    """
+    Wall time of `function()` over at least `repeats` calls (more for
+    fast calls, see MIN_SAMPLE_SECONDS), after `warmup` untimed ones.
+    Returns p50 / p95 / min / mean in milliseconds.
+    """
+    for _ in range(warmup):
+        function()
+
+    samples = []
+    total = 0.0
+    while len(samples) < repeats or (total < min_seconds and len(samples) < MAX_REPEATS):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        samples.append(elapsed)
+        total += elapsed
+
+    ms = np.array(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "min_ms": round(float(ms.min()), 4),
+        "mean_ms": round(float(ms.mean()), 4),
+        "repeats": len(samples),
+    }
+
+
+# ========================
+# SYNTHETIC SCALE-UPS
+# ========================
+
+def load_artifacts():
+    with open(CORPUS_PATH, "r", encoding="utf-8") as f:
+        corpus = json.load(f)
+    with open(CATALOGUE_PATH, "r", encoding="utf-8") as f:
+        catalogue = json.load(f)
+
+    return corpus, catalogue, np.load(EMBEDDINGS_PATH)
+
+
+def scale_corpus(corpus, catalogue, scale):
+    """
+    `scale` copies of every record under distinct URLs, so ids and
+    joins stay unique.
+    """
+    if scale == 1:
+        return corpus, catalogue
+
+    def copy_url(url, i):
+        return url if i == 0 else f"{url.rstrip('/')}-copy-{i}/"
+
+    scaled_corpus = [
+        {**item, "url": copy_url(item["url"], i)}
+        for i in range(scale) for item in corpus
+    ]
+    scaled_catalogue = [
+        {**record, "url": copy_url(record["url"], i)}
+        for i in range(scale) for record in catalogue
+    ]
+    return scaled_corpus, scaled_catalogue
+
+
+def scale_embeddings(embeddings, scale, seed=0):
+    """
+    Copies of the catalogue vectors jittered and re-normalised, so the
+    index sees distinct (but realistically clustered) points.
+    """
+    if scale == 1:
+        return embeddings
+
+    rng = np.random.default_rng(seed)
+    scaled = np.tile(embeddings, (scale, 1))
+    scaled[len(embeddings):] += SCALE_NOISE * rng.standard_normal(
+        scaled[len(embeddings):].shape
+    ).astype(np.float32)
+    scaled /= np.linalg.norm(scaled, axis=1, keepdims=True)
+    return np.ascontiguousarray(scaled, dtype=np.float32)
+
+
+def sample_queries(embeddings, n, seed=1):
+    """
+    Query-like vectors: catalogue vectors with noise, re-normalised.
+    """
+    rng = np.random.default_rng(seed)
+    rows = embeddings[rng.integers(len(embeddings), size=n)]
+    queries = rows + 0.1 * rng.standard_normal(rows.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return np.ascontiguousarray(queries, dtype=np.float32)
+
+
+# ========================
+# COMPONENTS
+# ========================
+
+def bench_encode(model, queries, batch_sizes=BATCH_SIZES, repeats=10):
+    """
+    model.encode(..., normalize_embeddings=True) per batch size, cycling
+    through the labeled queries so every call sees fresh text.
+    """
+    results = {}
+
+    for batch_size in batch_sizes:
+        offset = [0]
+
+        def encode():
+            start = offset[0] % len(queries)
+            batch = (queries[start:] + queries)[:batch_size]
+            offset[0] += batch_size
+            model.encode(batch, batch_size=batch_size, normalize_embeddings=True)
+
+        results[f"encode/bs={batch_size}"] = time_calls(encode, repeats)
+
+    return results
+
+
+def bench_search(embeddings, scales=SCALES, batch_sizes=BATCH_SIZES, repeats=50):
+    """
+    index.search for the configured index type (index_config.json) over
+    the catalogue vectors scaled up `scale` times.
+    """
+    config = load_index_config(INDEX_CONFIG_PATH)
+    queries = sample_queries(embeddings, max(batch_sizes))
+    results = {}
+
+    for scale in scales:
+        index, _ = build_index(scale_embeddings(embeddings, scale), config)
+        apply_search_params(index, config)
+
+        for batch_size in batch_sizes:
+            batch = queries[:batch_size]
+            results[f"search/{config['type']}/x{scale}/bs={batch_size}"] = time_calls(
+                lambda: index.search(batch, TOP_K), repeats
+            )
+
+    return results
+
+
+def bench_corpus_load(corpus, catalogue, scales=SCALES, repeats=5):
+    """
+    Opening the corpus as the API does: embedding_corpus.json through
+    json.load, and the compiled records.bin (mmap + header), plus a full
+    pass over the store's records.
+    """
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in scales:
+            scaled_corpus, scaled_catalogue = scale_corpus(corpus, catalogue, scale)
+
+            json_path = Path(tmp) / f"corpus-x{scale}.json"
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(scaled_corpus, f)
+
+            store_path = Path(tmp) / f"records-x{scale}.bin"
+            compile_records(scaled_corpus, scaled_catalogue, store_path)
+
+            results[f"load/json/x{scale}"] = time_calls(
+                lambda: open_records(json_path), repeats, warmup=1
+            )
+            results[f"load/records_bin/x{scale}"] = time_calls(
+                lambda: open_records(store_path), repeats, warmup=1
+            )
+
+            store = RecordStore(store_path)
+            results[f"load/records_bin_scan/x{scale}"] = time_calls(
+                lambda: sum(1 for _ in store), max(1, repeats // 2), warmup=1
+            )
+            del store
+
+    return results
+
+
+def bench_response(corpus, catalogue, batch_sizes=BATCH_SIZES, repeats=200):
+    """
+    api.app.to_response over TOP_K hits per request, for a micro-batch of
+    requests, from RecordStore records and plain JSON records.
+    """
+    from api.app import to_response
+
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store_path = Path(tmp) / "records.bin"
+        compile_records(corpus, catalogue, store_path)
+        store = RecordStore(store_path)
+
+        rng = np.random.default_rng(2)
+        positions = rng.integers(len(corpus), size=(max(batch_sizes), TOP_K))
+
+        for source, records in (("records_bin", store), ("json", corpus)):
+            for batch_size in batch_sizes:
+                rows = positions[:batch_size]
+
+                def build():
+                    for row in rows:
+                        [to_response(records[int(p)]) for p in row]
+
+                results[f"response/{source}/bs={batch_size}"] = time_calls(build, repeats)
+
+        del store
+
+    return results
@@ -0,0 +1,368 @@
+import sys
+import json
+import time
+import random
+import itertools
+import asyncio
+import argparse
+import subprocess
+from collections import Counter
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import numpy as np
+
+# httpx (and the app, for --transport asgi) are imported when a run starts
+
+# ========================
+# CONFIG
+# ========================
+
+ENDPOINT = "/recommend"
+READY_TIMEOUT = 300.0
+REQUEST_TIMEOUT = 30.0
+
+UVICORN_HOST = "127.0.0.1"
+UVICORN_PORT = 8765
+
+RESULTS_PATH = Path("benchmarks/results/loadgen.json")
+
+
+# ========================
+# WORKLOAD
+# ========================
+
+def load_requests(path=None):
+    """
+    Request bodies to replay: one JSON object per line of `path` (a
+    /recommend body, e.g. {"query": ..., "max_duration": 30}) or a bare
+    query string, or the Gen_AI dataset queries when no file is given.
+    Raises ValueError naming the line for anything that isn't a request:
+    it would fail every time it is sent and be reported as load errors.
+    """
+    if path is None:
+        from pipeline.evaluate import load_labeled_data
+        return [{"query": query} for query in load_labeled_data()]
+
+    bodies = []
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                body = json.loads(line)
+            except ValueError as exc:
+                raise ValueError(f"{path}:{number}: not valid JSON ({exc})") from None
+
+            if not isinstance(body, dict):
+                body = {"query": str(body)}
+            elif not isinstance(body.get("query"), str) or not body["query"].strip():
+                raise ValueError(f'{path}:{number}: request object has no "query" string')
+
+            bodies.append(body)
+
+    if not bodies:
+        raise ValueError(f"{path} has no requests")
+    return bodies
+
+
+# ========================
+# TARGETS
+# ========================
+
+async def wait_ready(client, timeout=READY_TIMEOUT):
+    import httpx
+
+    deadline = time.perf_counter() + timeout
+
+    while time.perf_counter() < deadline:
+        try:
+            response = await client.get("/ready")
+            if response.status_code == 200:
+                return
+            if response.json().get("status") == "failed":
+                raise RuntimeError(f"API failed to start: {response.json()}")
+        except httpx.TransportError:
+            # uvicorn not listening yet
+            pass
+        await asyncio.sleep(0.25)
+
+    raise TimeoutError(f"API not ready after {timeout:.0f}s")
+
+
+@asynccontextmanager
+async def asgi_client():
+    """
+    The app in this process through httpx's ASGI transport: no sockets,
+    so the numbers isolate the server-side cost.
+    """
+    import httpx
+    from api.app import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://loadgen", timeout=REQUEST_TIMEOUT
+        ) as client:
+            await wait_ready(client)
+            yield client
+
+
+@asynccontextmanager
+async def uvicorn_client(host=UVICORN_HOST, port=UVICORN_PORT, workers=1):
+    """
+    A locally started `uvicorn api.app:app`, stopped afterwards.
+    """
+    import httpx
+
+    server = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "api.app:app",
+        "--host", host, "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ])
+
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://{host}:{port}",
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=None),
+        ) as client:
+            await wait_ready(client)
+            yield client
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+@asynccontextmanager
+async def url_client(url):
+    """
+    An already running server.
+    """
+    import httpx
+
+    async with httpx.AsyncClient(
+        base_url=url,
+        timeout=REQUEST_TIMEOUT,
+        limits=httpx.Limits(max_connections=None, max_keepalive_connections=None),
+    ) as client:
+        await wait_ready(client)
+        yield client
+
+
+# ========================
+# LOAD
+# ========================
+
+async def _send(client, body):
+    """
+    POST one request; returns (seconds, status) where status is the HTTP
+    code or the exception name for transport failures.
+    """
+    start = time.perf_counter()
+    try:
+        response = await client.post(ENDPOINT, json=body)
+        status = str(response.status_code)
+    except Exception as exc:
+        status = type(exc).__name__
+
+    return time.perf_counter() - start, status
+
+
+async def closed_loop(client, bodies, concurrency, total):
+    """
+    `concurrency` clients, each sending its next request as soon as the
+    previous one returns. Measures capacity at a fixed number of users.
+    """
+    samples, statuses = [], Counter()
+    sent = iter(range(total))
+
+    async def user():
+        for i in sent:
+            latency, status = await _send(client, next(bodies))
+            samples.append((latency, status == "200"))
+            statuses[status] += 1
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return samples, statuses
+
+
+async def open_loop(client, bodies, concurrency, total, rate, seed=0):
+    """
+    Poisson arrivals at `rate` requests/s, with at most `concurrency` in
+    flight. Latency counts from the scheduled arrival, so time spent
+    waiting for a free slot is included (no coordinated omission).
+    """
+    samples, statuses = [], Counter()
+    slots = asyncio.Semaphore(concurrency)
+    rng = random.Random(seed)
+
+    async def arrival(body, scheduled):
+        async with slots:
+            _, status = await _send(client, body)
+
+        samples.append((time.perf_counter() - scheduled, status == "200"))
+        statuses[status] += 1
+
+    tasks = []
+    next_arrival = time.perf_counter()
+
+    for i in range(total):
+        delay = next_arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        tasks.append(asyncio.create_task(arrival(next(bodies), next_arrival)))
+        next_arrival += rng.expovariate(rate)
+
+    await asyncio.gather(*tasks)
+    return samples, statuses
+
+
+def summarize(samples, statuses, elapsed, concurrency, rate=None):
+    # Latency of successful requests only: shed requests (429 / 503)
+    # return in well under a millisecond and would hide the real tail
+    latencies = np.array([latency for latency, success in samples if success]) * 1000
+    ok = len(latencies)
+    total = len(samples)
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if ok else (0.0, 0.0, 0.0)
+
+    return {
+        "concurrency": concurrency,
+        "target_rate": rate,
+        "requests": total,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(ok / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round((total - ok) / total, 4) if total else 0.0,
+        "statuses": dict(statuses),
+        "latency_ms": {
+            "p50": round(float(p50), 2),
+            "p95": round(float(p95), 2),
+            "p99": round(float(p99), 2),
+            "max": round(float(latencies.max()), 2) if ok else 0.0,
+        },
+    }
+
+
+def workload(bodies, unique=False):
+    """
+    Endless stream of request bodies cycling through `bodies`. With
+    `unique`, every query gets a sequence number so no request is served
+    from the query-embedding caches and each pays for a real encode.
+    """
+    for i in itertools.count():
+        body = bodies[i % len(bodies)]
+        yield {**body, "query": f"{body['query']} #{i}"} if unique else body
+
+
+async def run_level(client, bodies, concurrency, total, rate=None, warmup=0):
+    if warmup:
+        await closed_loop(client, bodies, concurrency, warmup)
+
+    start = time.perf_counter()
+    if rate:
+        samples, statuses = await open_loop(client, bodies, concurrency, total, rate)
+    else:
+        samples, statuses = await closed_loop(client, bodies, concurrency, total)
+    elapsed = time.perf_counter() - start
+
+    return summarize(samples, statuses, elapsed, concurrency, rate)
+
+
+def print_result(result):
+    latency = result["latency_ms"]
+    rate = f"{result['target_rate']:g}/s" if result["target_rate"] else "closed"
+    print(
+        f"c={result['concurrency']:<4} {rate:>9} | "
+        f"{result['throughput_rps']:>8.1f} req/s | "
+        f"p50 {latency['p50']:>8.2f} ms  p95 {latency['p95']:>8.2f} ms  "
+        f"p99 {latency['p99']:>8.2f} ms | errors {result['error_rate']:.2%}"
+    )
+
+
+async def run(args, distinct):
+    bodies = workload(distinct, args.unique)
+
+    if args.url:
+        target = url_client(args.url)
+    elif args.transport == "uvicorn":
+        target = uvicorn_client(port=args.port, workers=args.workers)
+    else:
+        target = asgi_client()
+
+    levels = args.sweep or [args.concurrency]
+    results = []
+
+    async with target as client:
+        print(f"Replaying {len(distinct)} distinct requests against {ENDPOINT} ({args.url or args.transport})\n")
+
+        for concurrency in levels:
+            result = await run_level(
+                client, bodies, concurrency, args.total, args.rate, args.warmup
+            )
+            print_result(result)
+            results.append(result)
+
+    return results
+
+
+# ========================
+# MAIN
+# ========================
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load generator for the recommendation API")
+    parser.add_argument(
+        "--requests", type=Path,
+        help="JSONL file of /recommend bodies to replay (default: Gen_AI dataset queries)"
+    )
+    parser.add_argument(
+        "--transport", choices=("asgi", "uvicorn"), default="asgi",
+        help="in-process ASGI app, or a locally started uvicorn server"
+    )
+    parser.add_argument("--url", help="target an already running server instead")
+    parser.add_argument("--port", type=int, default=UVICORN_PORT)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--sweep", type=int, nargs="+",
+        help="run each of these concurrency levels in turn to find saturation"
+    )
+    parser.add_argument(
+        "--rate", type=float,
+        help="open-loop Poisson arrival rate (req/s); default: closed loop"
+    )
+    parser.add_argument("--total", type=int, default=500, help="requests per level")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests per level")
+    parser.add_argument(
+        "--unique", action="store_true",
+        help="make every query distinct so no request is served from the embedding cache"
+    )
+    parser.add_argument("--output", type=Path, default=RESULTS_PATH)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    try:
+        distinct = load_requests(args.requests)
+    except (OSError, ValueError) as exc:
+        sys.exit(f"❌ {exc}")
+
+    results = asyncio.run(run(args, distinct))
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"transport": args.url or args.transport, "levels": results}, f, indent=2)
+    print(f"\nSaved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from api.memory import command_line, process_memory, process_tree
+
+# httpx is imported when a server is launched
+
+# ========================
+# CONFIG
+# ========================
+
+APP = "api.app:app"
+GUNICORN_CONFIG = Path("api/gunicorn_conf.py")
+
+HOST = "127.0.0.1"
+PORT = 8766
+READY_TIMEOUT = 300.0
+
+# /recommend calls per worker before measuring, so every worker has
+# touched the model and index pages it serves from
+WARM_REQUESTS_PER_WORKER = 20
+
+RESULTS_PATH = Path("benchmarks/results/memory.json")
+
+MB = 1024 * 1024
+
+
+# ========================
+# REPORT
+# ========================
+
+def memory_report(pid):
+    """
+    RSS / PSS of a server process and all of its workers.
+    """
+    processes = []
+    for i, child in enumerate(process_tree(pid)):
+        usage = process_memory(child)
+        if usage is None:
+            continue
+        processes.append({
+            "pid": child,
+            "role": "master" if i == 0 else "worker",
+            "command": command_line(child)[:80],
+            **usage,
+        })
+
+    totals = {
+        kind: sum(process[kind] for process in processes)
+        for kind in ("rss", "pss", "shared", "private")
+    }
+    return {"pid": pid, "processes": processes, "totals": totals}
+
+
+def print_report(report, title=None):
+    if title:
+        print(f"\n{title}")
+
+    print(f"{'pid':>8} {'role':<7} {'RSS MB':>9} {'PSS MB':>9} {'shared MB':>10} {'private MB':>11}")
+    for process in report["processes"]:
+        print(
+            f"{process['pid']:>8} {process['role']:<7} "
+            f"{process['rss'] / MB:>9.1f} {process['pss'] / MB:>9.1f} "
+            f"{process['shared'] / MB:>10.1f} {process['private'] / MB:>11.1f}"
+        )
+
+    totals = report["totals"]
+    print(
+        f"{'total':>8} {'':<7} {totals['rss'] / MB:>9.1f} {totals['pss'] / MB:>9.1f} "
+        f"{totals['shared'] / MB:>10.1f} {totals['private'] / MB:>11.1f}"
+    )
+
+
+# ========================
+# LAUNCH
+# ========================
+
+def server_command(mode, app, workers, port):
+    if mode == "gunicorn":
+        return [
+            sys.executable, "-m", "gunicorn", "-c", str(GUNICORN_CONFIG),
+            "--bind", f"{HOST}:{port}", "--workers", str(workers), app,
+        ]
+
+    return [
+        sys.executable, "-m", "uvicorn", app, "--host", HOST, "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ]
+
+
+def wait_for_workers(client, workers, timeout=READY_TIMEOUT):
+    """
+    Wait until /ready succeeds, then send traffic until `workers` distinct
+    worker pids have answered /recommend and /stats/memory.
+    """
+    import httpx
+
+    deadline = time.perf_counter() + timeout
+    seen = set()
+    warm = WARM_REQUESTS_PER_WORKER * workers
+
+    def call(i):
+        try:
+            if client.post("/recommend", json={"query": f"warm-up query {i}"}).status_code != 200:
+                return None
+            return client.get("/stats/memory").json()["pid"]
+        except httpx.TransportError:
+            return None
+
+    with ThreadPoolExecutor(max_workers=2 * workers) as pool:
+        while time.perf_counter() < deadline:
+            pids = list(pool.map(call, range(warm)))
+            seen.update(pid for pid in pids if pid is not None)
+            if len(seen) >= workers and None not in pids:
+                return seen
+            time.sleep(0.5)
+
+    raise TimeoutError(f"Only {len(seen)} of {workers} workers answered after {timeout:.0f}s")
+
+
+def measure(mode, app=APP, workers=2, port=PORT):
+    """
+    Start `mode` ("uvicorn" or "gunicorn"), warm every worker up, report
+    its memory and stop it.
+    """
+    import httpx
+
+    server = subprocess.Popen(server_command(mode, app, workers, port))
+
+    try:
+        # A fresh connection per request, so the kernel spreads them over
+        # the workers instead of one worker serving a kept-alive pool
+        with httpx.Client(
+            base_url=f"http://{HOST}:{port}",
+            timeout=60,
+            limits=httpx.Limits(max_keepalive_connections=0),
+        ) as client:
+            wait_for_workers(client, workers)
+        return memory_report(server.pid)
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+# ========================
+# MAIN
+# ========================
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Per-worker RSS / PSS of the API server")
+    parser.add_argument("--pid", type=int, help="report an already running server (its master pid)")
+    parser.add_argument(
+        "--launch", choices=("uvicorn", "gunicorn"),
+        help="start the server in this mode, warm it up and report it"
+    )
+    parser.add_argument(
+        "--compare", action="store_true",
+        help="report uvicorn --workers N against the shared-memory gunicorn mode"
+    )
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--app", default=APP)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--output", type=Path, default=RESULTS_PATH)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if os.name != "posix" or process_memory() is None:
+        sys.exit("❌ /proc/<pid>/smaps_rollup is not available on this system")
+
+    if args.pid:
+        reports = {"pid": memory_report(args.pid)}
+    elif args.compare:
+        reports = {
+            mode: measure(mode, args.app, args.workers, args.port)
+            for mode in ("uvicorn", "gunicorn")
+        }
+    elif args.launch:
+        reports = {args.launch: measure(args.launch, args.app, args.workers, args.port)}
+    else:
+        sys.exit("Give --pid, --launch or --compare")
+
+    for name, report in reports.items():
+        print_report(report, title=f"{name} ({len(report['processes'])} processes)")
+
+    if len(reports) == 2:
+        separate, shared = (reports[mode]["totals"]["pss"] for mode in ("uvicorn", "gunicorn"))
+        print(
+            f"\n✅ Total PSS: {separate / MB:.1f} MB → {shared / MB:.1f} MB "
+            f"({1 - shared / separate:.0%} less) with {args.workers} workers"
+        )
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"workers": args.workers, "reports": reports}, f, indent=2)
+    print(f"\nSaved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
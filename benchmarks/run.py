@@ -0,0 +1,183 @@
+import sys
+import json
+import time
+import argparse
+import platform
+from pathlib import Path
+
+from benchmarks.components import (
+    BATCH_SIZES,
+    SCALES,
+    bench_corpus_load,
+    bench_encode,
+    bench_response,
+    bench_search,
+    load_artifacts,
+)
+
+# ========================
+# CONFIG
+# ========================
+
+RESULTS_PATH = Path("benchmarks/results/latest.json")
+BASELINE_PATH = Path("benchmarks/baseline.json")
+
+COMPONENTS = ("encode", "search", "load", "response")
+
+# A benchmark regresses when its p50 exceeds the baseline by this fraction
+DEFAULT_THRESHOLD = 0.25
+
+# Below this p50 (ms), timer noise dominates; only flag absolute slowdowns
+NOISE_FLOOR_MS = 0.05
+
+
+# ========================
+# RUN
+# ========================
+
+def run(components, scales, batch_sizes, encoder_backend="fp32", model_name=None):
+    corpus, catalogue, embeddings = load_artifacts()
+    results = {}
+
+    if "encode" in components:
+        from pipeline.evaluate import MODEL_NAME, load_labeled_data
+        from pipeline.retriever import load_model
+
+        model = load_model(model_name or MODEL_NAME, backend=encoder_backend)
+        queries = list(load_labeled_data())
+        results.update(bench_encode(model, queries, batch_sizes))
+
+    if "search" in components:
+        results.update(bench_search(embeddings, scales, batch_sizes))
+
+    if "load" in components:
+        results.update(bench_corpus_load(corpus, catalogue, scales))
+
+    if "response" in components:
+        results.update(bench_response(corpus, catalogue, batch_sizes))
+
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "corpus_size": len(corpus),
+            "scales": list(scales),
+            "batch_sizes": list(batch_sizes),
+            "encoder_backend": encoder_backend,
+            "model": model_name,
+        },
+        "results": results,
+    }
+
+
+def save(report, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+
+# ========================
+# COMPARE
+# ========================
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare p50s against the baseline. Returns the names of regressed
+    benchmarks; ones missing on either side are reported, not failed.
+    """
+    current = report["results"]
+    previous = baseline["results"]
+    regressions = []
+
+    print(f"\n{'benchmark':<42} {'baseline':>10} {'current':>10} {'change':>8}")
+
+    for name in sorted(set(current) | set(previous)):
+        if name not in previous:
+            print(f"{name:<42} {'-':>10} {current[name]['p50_ms']:>10.4f}      new")
+            continue
+        if name not in current:
+            print(f"{name:<42} {previous[name]['p50_ms']:>10.4f} {'-':>10}  skipped")
+            continue
+
+        before = previous[name]["p50_ms"]
+        after = current[name]["p50_ms"]
+        change = (after - before) / before if before else 0.0
+
+        regressed = change > threshold and after - before > NOISE_FLOOR_MS
+        if regressed:
+            regressions.append(name)
+
+        print(
+            f"{name:<42} {before:>10.4f} {after:>10.4f} {change:>+7.1%}"
+            + ("  ❌" if regressed else "")
+        )
+
+    return regressions
+
+
+# ========================
+# MAIN
+# ========================
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Component micro-benchmarks")
+    parser.add_argument(
+        "--components", nargs="+", choices=COMPONENTS, default=list(COMPONENTS),
+        help="which stages to time (default: all)"
+    )
+    parser.add_argument("--scales", type=int, nargs="+", default=list(SCALES))
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=list(BATCH_SIZES))
+    parser.add_argument(
+        "--encoder-backend", default="fp32",
+        help="query encoder for the encode benchmark (see pipeline/encoders.py)"
+    )
+    parser.add_argument("--model", help="model for the encode benchmark (default: the serving model)")
+    parser.add_argument("--output", type=Path, default=RESULTS_PATH)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument(
+        "--threshold", type=float, default=DEFAULT_THRESHOLD,
+        help="allowed p50 slowdown vs. the baseline, as a fraction (default: 0.25)"
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true",
+        help="store this run as the new baseline instead of comparing"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    report = run(
+        args.components, args.scales, args.batch_sizes,
+        args.encoder_backend, args.model
+    )
+    save(report, args.output)
+    print(f"Saved results to: {args.output}")
+
+    if args.save_baseline:
+        save(report, args.baseline)
+        print(f"Saved baseline to: {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    regressions = compare(report, baseline, args.threshold)
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} benchmark(s) slower than baseline by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+    print(f"\n✅ No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
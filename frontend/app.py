@@ -1,8 +1,5 @@
+import sys
 import streamlit as st
-import json
-import faiss
-import numpy as np
-from sentence_transformers import SentenceTransformer
 from pathlib import Path
 
 # ========================
@@ -14,8 +11,18 @@ TOP_K = 5
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 
-EMBEDDINGS_PATH = BASE_DIR / "data" / "processed" / "embeddings.npy"
-CORPUS_PATH = BASE_DIR / "data" / "processed" / "embedding_corpus.json"
+# `streamlit run frontend/app.py` only puts frontend/ on sys.path
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from pipeline.retriever import RecommenderEngine  # noqa: E402
+
+INDEX_PATH = BASE_DIR / "data" / "processed" / "faiss.index"
+RECORDS_PATH = BASE_DIR / "data" / "processed" / "records.bin"
+JSON_CORPUS_PATH = BASE_DIR / "data" / "processed" / "embedding_corpus.json"
+
+# Compiled record store when built, with real duration / flags
+CORPUS_PATH = RECORDS_PATH if RECORDS_PATH.exists() else JSON_CORPUS_PATH
 
 
 # ========================
@@ -24,25 +31,17 @@ CORPUS_PATH = BASE_DIR / "data" / "processed" / "embedding_corpus.json"
 
 @st.cache_resource
 def load_resources():
-    # Load embeddings
-    embeddings = np.load(EMBEDDINGS_PATH)
-
-    # Build FAISS index dynamically (cross-platform safe)
-    dim = embeddings.shape[1]
-    index = faiss.IndexFlatIP(dim)
-    index.add(embeddings)
-
-    # Load corpus
-    with open(CORPUS_PATH, "r", encoding="utf-8") as f:
-        corpus = json.load(f)
+    # Load the index built by pipeline/build_faiss_index.py (type and
+    # search parameters come from index_config.json next to it).
+    # The engine's query embedding cache is shared by every session.
+    return RecommenderEngine(
+        index_path=INDEX_PATH,
+        corpus_path=CORPUS_PATH,
+        model_name=MODEL_NAME
+    )
 
-    # Load embedding model
-    model = SentenceTransformer(MODEL_NAME)
 
-    return index, corpus, model
-
-
-index, corpus, model = load_resources()
+engine = load_resources()
 
 # ========================
 # UI
@@ -68,26 +67,21 @@ if st.button("Get Recommendations"):
         st.warning("Please enter a valid query.")
     else:
         with st.spinner("Finding relevant assessments..."):
-            query_embedding = model.encode(
-                [query],
-                normalize_embeddings=True
-            )
-
-            scores, indices = index.search(query_embedding, TOP_K)
+            hits = engine.recommend(query, TOP_K)
 
         st.success(f"Top {TOP_K} recommendations:")
 
-        for rank, idx in enumerate(indices[0], start=1):
-            item = corpus[idx]
-            name = item["text"].split(".")[0]
+        for rank, hit in enumerate(hits, start=1):
+            item = hit.record
+            name = item.get("name") or item["text"].split(".")[0]
 
             st.markdown(f"### {rank}. {name}")
             st.markdown(f"**URL:** {item['url']}")
-            st.markdown(f"**Description:** {item['text']}")
+            st.markdown(f"**Description:** {item.get('description', item['text'])}")
             st.markdown(
-                "- Duration: Not specified\n"
-                "- Remote Support: Yes\n"
-                "- Adaptive Support: Yes\n"
-                "- Test Type: Individual Test"
+                f"- Duration: {item.get('duration', 'Not specified')}\n"
+                f"- Remote Support: {item.get('remote_support', 'Yes')}\n"
+                f"- Adaptive Support: {item.get('adaptive_support', 'Yes')}\n"
+                f"- Test Type: {item.get('test_type', 'Individual Test')}"
             )
             st.markdown("---")
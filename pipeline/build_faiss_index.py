@@ -1,28 +1,322 @@
+import os
+import json
+import time
+import argparse
 import numpy as np
 import faiss
 from pathlib import Path
 
+from pipeline.index_config import (
+    INDEX_CONFIG_PATH,
+    INDEX_TYPES,
+    VECTOR_STORAGE,
+    build_index,
+    make_config,
+    save_index_config,
+)
+
 EMBEDDING_PATH = Path("data/processed/embeddings.npy")
 INDEX_PATH = Path("data/processed/faiss.index")
+REPORT_PATH = Path("data/processed/index_report.json")
 
+REPORT_KS = (5, 10)
+REPORT_REPEATS = 5
 
-def main():
+# Variants compared by --report; the first one is the exact baseline
+REPORT_VARIANTS = [
+    make_config("flat"),
+    make_config("hnsw", m=16, ef_search=16),
+    make_config("hnsw", m=32, ef_search=64),
+    make_config("hnsw", m=32, ef_search=128),
+    make_config("ivf", nprobe=1),
+    make_config("ivf", nprobe=4),
+    make_config("ivf", nprobe=16),
+]
+
+# Compressed vector storage, compared by --report compression
+COMPRESSION_VARIANTS = [
+    make_config("flat"),
+    make_config("flat", storage="fp16"),
+    make_config("flat", storage="int8"),
+    make_config("flat", pca=192),
+    make_config("flat", pca=128),
+    make_config("flat", pca=128, storage="fp16"),
+    make_config("flat", pca=128, storage="int8"),
+    make_config("flat", pca=64, storage="int8"),
+    make_config("hnsw", storage="int8"),
+]
+
+REPORTS = {"ann": REPORT_VARIANTS, "compression": COMPRESSION_VARIANTS}
+
+# Catalogue size used to project the memory footprint in the report
+PROJECTED_VECTORS = 1_000_000
+
+
+# ========================
+# BUILD
+# ========================
+
+def write_index(index, config):
+    INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+
+    # Write next to the target and rename, so servers that memory-map the
+    # index never see a half-written file
+    tmp_path = INDEX_PATH.with_suffix(".index.tmp")
+    faiss.write_index(index, str(tmp_path))
+    os.replace(tmp_path, INDEX_PATH)
+
+    # Written after the index: a watcher reloading on the config change
+    # always finds the matching index
+    save_index_config(config, INDEX_CONFIG_PATH)
+
+
+def build(config):
     print("Loading embeddings...")
     embeddings = np.load(EMBEDDING_PATH)
 
     dim = embeddings.shape[1]
     print(f"Embedding dimension: {dim}")
 
-    print("Building FAISS index (IndexFlatIP)...")
-    index = faiss.IndexFlatIP(dim)
+    start = time.perf_counter()
+    index, built = build_index(embeddings, config)
+    elapsed = time.perf_counter() - start
 
-    index.add(embeddings)
+    print(f"Built FAISS index ({built['factory_resolved']}) in {elapsed:.2f}s")
 
-    INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
-    faiss.write_index(index, str(INDEX_PATH))
+    write_index(index, built)
 
     print(f"Total vectors indexed: {index.ntotal}")
     print(f"Index saved to: {INDEX_PATH}")
+    print(f"Index config saved to: {INDEX_CONFIG_PATH}")
+
+
+# ========================
+# REPORT
+# ========================
+
+def load_report_queries(source, embeddings):
+    """
+    Query vectors for the report: the labeled dataset queries encoded with
+    the serving model, or the corpus vectors themselves ("corpus").
+    Returns (queries, relevant) where relevant holds, per labeled query,
+    the corpus positions of its relevant assessments (None for "corpus").
+    """
+    if source == "corpus":
+        return embeddings, None
+
+    from pipeline.evaluate import CORPUS_PATH, MODEL_NAME, extract_slug, load_labeled_data
+    from pipeline.embedding_cache import encode_queries
+    from pipeline.retriever import load_corpus, load_model
+
+    labeled = load_labeled_data()
+
+    positions = {}
+    for position, item in enumerate(load_corpus(CORPUS_PATH)):
+        positions.setdefault(extract_slug(item["url"]), position)
+
+    relevant = [
+        [positions[slug] for slug in slugs if slug in positions]
+        for slugs in labeled.values()
+    ]
+
+    queries = encode_queries(load_model(MODEL_NAME), list(labeled))
+    return queries, relevant
+
+
+def footprint(index):
+    """
+    Serialized size split into a fixed part (trained quantizer, PCA
+    matrix, ...) and the cost of each stored vector.
+    """
+    total = int(faiss.serialize_index(index).size)
+
+    empty = faiss.clone_index(index)
+    empty.reset()
+    fixed = int(faiss.serialize_index(empty).size)
+
+    per_vector = (total - fixed) / max(index.ntotal, 1)
+    return total, fixed, per_vector
+
+
+def search_latencies(index, queries, k, repeats=REPORT_REPEATS):
+    """
+    Per-query latency in ms, one query per search call as the API does
+    for a lone request.
+    """
+    latencies = []
+
+    for _ in range(repeats):
+        for row in range(len(queries)):
+            start = time.perf_counter()
+            index.search(queries[row:row + 1], k)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    return np.array(latencies)
+
+
+def overlap_recall(labels, exact_labels, k):
+    """
+    Mean fraction of the exact top-k that the approximate top-k recovers.
+    """
+    found = [
+        len(np.intersect1d(row[:k], exact[:k])) / k
+        for row, exact in zip(labels, exact_labels)
+    ]
+    return float(np.mean(found))
+
+
+def benchmark(embeddings, queries, variants=REPORT_VARIANTS, ks=REPORT_KS, repeats=REPORT_REPEATS, relevant=None):
+    from pipeline.evaluator import hit_matrix, metrics_at_ks
+
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    max_k = min(max(ks), len(embeddings))
+
+    results = []
+    exact_labels = None
+
+    for config in variants:
+        start = time.perf_counter()
+        index, built = build_index(embeddings, config)
+        build_seconds = time.perf_counter() - start
+
+        _, labels = index.search(queries, max_k)
+        if exact_labels is None:
+            exact_labels = labels
+
+        latencies = search_latencies(index, queries, max_k, repeats)
+        total, fixed, per_vector = footprint(index)
+
+        result = {
+            "type": built["type"],
+            "factory": built["factory_resolved"],
+            "params": built["params"],
+            "build_seconds": round(build_seconds, 4),
+            "index_bytes": total,
+            "fixed_bytes": fixed,
+            "bytes_per_vector": round(per_vector, 1),
+            "projected_mb": round((fixed + per_vector * PROJECTED_VECTORS) / 2**20, 1),
+            "latency_ms": {
+                "p50": round(float(np.percentile(latencies, 50)), 4),
+                "p99": round(float(np.percentile(latencies, 99)), 4),
+            },
+        }
+        for k in ks:
+            result[f"recall_vs_flat@{k}"] = round(
+                overlap_recall(labels, exact_labels, min(k, max_k)), 4
+            )
+
+        if relevant is not None:
+            # Recall against the labeled ground truth, as pipeline.evaluate reports
+            n_relevant = np.array([len(r) for r in relevant])
+            metrics = metrics_at_ks(hit_matrix(labels, relevant), n_relevant, ks)
+            for k in ks:
+                result[f"recall@{k}"] = round(float(np.mean(metrics[k]["recall"])), 4)
+
+        results.append(result)
+
+    return results
+
+
+def print_report(results, ks=REPORT_KS):
+    labeled = "recall@" + str(ks[0]) in results[0]
+
+    header = f"{'index':<28}{'size KB':>10}{'B/vec':>8}{'1M MB':>8}{'p50 ms':>10}{'p99 ms':>10}"
+    header += "".join(f"{f'R@{k}':>8}" for k in ks)
+    if labeled:
+        header += "".join(f"{f'GT@{k}':>8}" for k in ks)
+    print(header)
+
+    for result in results:
+        params = ",".join(
+            f"{name}={value}" for name, value in result["params"].items()
+            if name in ("ef_search", "nprobe")
+        )
+        label = result["factory"] + (f" {params}" if params else "")
+
+        line = (
+            f"{label:<28}{result['index_bytes'] / 1024:>10.1f}"
+            f"{result['bytes_per_vector']:>8.0f}{result['projected_mb']:>8.0f}"
+            f"{result['latency_ms']['p50']:>10.3f}{result['latency_ms']['p99']:>10.3f}"
+        )
+        line += "".join(f"{result[f'recall_vs_flat@{k}']:>8.3f}" for k in ks)
+        if labeled:
+            line += "".join(f"{result[f'recall@{k}']:>8.3f}" for k in ks)
+        print(line)
+
+
+def report(query_source, variants="ann"):
+    embeddings = np.load(EMBEDDING_PATH)
+    queries, relevant = load_report_queries(query_source, embeddings)
+
+    configs = [
+        config for config in REPORTS[variants]
+        if not config["params"].get("pca") or config["params"]["pca"] < embeddings.shape[1]
+    ]
+
+    print(f"Benchmarking {len(configs)} index variants over {len(embeddings)} vectors, {len(queries)} queries\n")
+
+    results = benchmark(embeddings, queries, configs, relevant=relevant)
+    print_report(results)
+
+    REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(REPORT_PATH, "w", encoding="utf-8") as f:
+        json.dump({
+            "ntotal": int(len(embeddings)),
+            "variants": variants,
+            "queries": query_source,
+            "n_queries": int(len(queries)),
+            "results": results,
+        }, f, indent=2)
+
+    print(f"\nReport saved to: {REPORT_PATH}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build the FAISS index")
+    parser.add_argument("--type", default="flat", choices=sorted(INDEX_TYPES))
+    parser.add_argument("--factory", help="raw faiss index_factory string (overrides --type)")
+    parser.add_argument("--hnsw-m", dest="m", type=int)
+    parser.add_argument("--ef-construction", type=int)
+    parser.add_argument("--ef-search", type=int)
+    parser.add_argument("--nlist", type=int)
+    parser.add_argument("--nprobe", type=int)
+    parser.add_argument(
+        "--storage", default="fp32", choices=sorted(VECTOR_STORAGE),
+        help="vector encoding inside the index (fp16 halves memory, int8 quarters it)"
+    )
+    parser.add_argument("--pca", type=int, help="reduce vectors to this many dimensions")
+    parser.add_argument(
+        "--report", nargs="?", const="ann", choices=sorted(REPORTS),
+        help="compare index variants against the flat baseline instead of building"
+    )
+    parser.add_argument(
+        "--queries", choices=["labeled", "corpus"], default="labeled",
+        help="query set for --report"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.report:
+        report(args.queries, args.report)
+        return
+
+    params = {
+        "m": args.m,
+        "ef_construction": args.ef_construction,
+        "ef_search": args.ef_search,
+        "nlist": args.nlist,
+        "nprobe": args.nprobe,
+    }
+
+    if args.factory:
+        config = make_config(factory=args.factory, **{k: v for k, v in params.items() if v is not None})
+    else:
+        config = make_config(args.type, storage=args.storage, pca=args.pca, **params)
+
+    build(config)
 
 
 if __name__ == "__main__":
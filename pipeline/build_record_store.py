@@ -0,0 +1,34 @@
+import json
+import time
+from pathlib import Path
+
+from pipeline.record_store import RECORDS_PATH, RecordStore, compile_records
+
+CATALOGUE_PATH = Path("data/processed/shl_catalogue.json")
+CORPUS_PATH = Path("data/processed/embedding_corpus.json")
+
+
+def main():
+    start = time.perf_counter()
+
+    with open(CORPUS_PATH, "r", encoding="utf-8") as f:
+        corpus = json.load(f)
+
+    with open(CATALOGUE_PATH, "r", encoding="utf-8") as f:
+        catalogue = json.load(f)
+
+    # Rows follow embedding_corpus.json, i.e. FAISS index positions
+    count = compile_records(corpus, catalogue, RECORDS_PATH)
+
+    store = RecordStore(RECORDS_PATH)
+    known_duration = int((store.duration >= 0).sum())
+
+    print(f"Compiled {count} records in {time.perf_counter() - start:.2f}s")
+    print(f"Durations known: {known_duration}/{count}")
+    print(f"Store size: {RECORDS_PATH.stat().st_size / 1024:.1f} KB "
+          f"(corpus JSON: {CORPUS_PATH.stat().st_size / 1024:.1f} KB)")
+    print(f"Saved to: {RECORDS_PATH}")
+
+
+if __name__ == "__main__":
+    main()
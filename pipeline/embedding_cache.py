@@ -0,0 +1,162 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+# ========================
+# CONFIG
+# ========================
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "4096"))
+
+# Seconds; 0 disables expiry
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "0"))
+
+
+# ========================
+# HELPERS
+# ========================
+
+def normalize_query(query):
+    """
+    Cache key for a query. all-MiniLM-L6-v2 uses an uncased tokenizer, so
+    case and whitespace differences produce the same embedding.
+    """
+    return " ".join(str(query).lower().split())
+
+
+# ========================
+# LRU CACHE
+# ========================
+
+class EmbeddingCache:
+    """
+    Thread-safe LRU cache of query embeddings keyed on normalized text.
+    """
+
+    def __init__(self, max_size=QUERY_CACHE_SIZE, ttl_seconds=QUERY_CACHE_TTL):
+        if max_size < 1:
+            raise ValueError("max_size must be >= 1")
+
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds or None
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, query):
+        key = normalize_query(query)
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None:
+                embedding, stored_at = entry
+
+                if self.ttl_seconds and time.monotonic() - stored_at > self.ttl_seconds:
+                    del self._entries[key]
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return embedding
+
+            self.misses += 1
+            return None
+
+    def put(self, query, embedding):
+        key = normalize_query(query)
+
+        embedding = np.array(embedding, dtype=np.float32)
+        embedding.setflags(write=False)
+
+        with self._lock:
+            self._entries[key] = (embedding, time.monotonic())
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# ========================
+# ENCODING
+# ========================
+
+def encode_queries(model, queries, cache=None, store=None):
+    """
+    Encode queries into a (n, dim) float32 matrix, running the model only
+    for queries missing from the cache (and the persistent store, if one
+    is given). Duplicates within the call are encoded once.
+    """
+    queries = list(queries)
+
+    if cache is None and store is None:
+        return np.asarray(
+            model.encode(queries, normalize_embeddings=True),
+            dtype=np.float32
+        )
+
+    rows = [cache.get(q) if cache is not None else None for q in queries]
+
+    missing = {}
+    for i, row in enumerate(rows):
+        if row is None:
+            missing.setdefault(normalize_query(queries[i]), []).append(i)
+
+    if missing and store is not None:
+        for key in list(missing):
+            positions = missing[key]
+            embedding = store.get(queries[positions[0]])
+
+            if embedding is not None:
+                if cache is not None:
+                    cache.put(queries[positions[0]], embedding)
+                for i in positions:
+                    rows[i] = embedding
+                del missing[key]
+
+    if missing:
+        # Encode the first spelling seen for each normalized key
+        texts = [queries[positions[0]] for positions in missing.values()]
+        embeddings = model.encode(texts, normalize_embeddings=True)
+
+        for positions, text, embedding in zip(missing.values(), texts, embeddings):
+            if cache is not None:
+                cache.put(text, embedding)
+            if store is not None:
+                store.put(text, embedding)
+            for i in positions:
+                rows[i] = embedding
+
+    if not rows:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    return np.vstack(rows).astype(np.float32, copy=False)
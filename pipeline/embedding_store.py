@@ -0,0 +1,235 @@
+import os
+import mmap
+import hashlib
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from pipeline.embedding_cache import normalize_query
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are still single write() calls
+    fcntl = None
+
+
+# ========================
+# CONFIG
+# ========================
+
+QUERY_STORE_DIR = Path(os.getenv("QUERY_STORE_DIR", "data/cache"))
+QUERY_STORE_MAX_RECORDS = int(os.getenv("QUERY_STORE_MAX_RECORDS", "200000"))
+
+MAGIC = b"SHLQEMB1"
+HEADER_SIZE = 64
+KEY_SIZE = 16
+
+
+# ========================
+# HELPERS
+# ========================
+
+def query_key(query):
+    return hashlib.blake2b(
+        normalize_query(query).encode("utf-8"),
+        digest_size=KEY_SIZE
+    ).digest()
+
+
+def model_fingerprint(model_name):
+    return hashlib.blake2b(model_name.encode("utf-8"), digest_size=16).digest()
+
+
+def store_path_for(model_name, directory=QUERY_STORE_DIR):
+    """
+    One file per model, so changing MODEL_NAME starts a fresh store.
+    """
+    slug = model_fingerprint(model_name).hex()[:16]
+    return Path(directory) / f"query_embeddings-{slug}.f32"
+
+
+def _build_header(model_name, dim):
+    header = bytearray(HEADER_SIZE)
+    header[0:8] = MAGIC
+    header[8:12] = int(dim).to_bytes(4, "little")
+    header[12:28] = model_fingerprint(model_name)
+    return bytes(header)
+
+
+# ========================
+# PERSISTENT STORE
+# ========================
+
+class EmbeddingStore:
+    """
+    Append-only, memory-mapped file of fixed-width query embedding records.
+
+    Layout: a 64-byte header (magic, dim, model fingerprint) followed by
+    records of [16-byte blake2b key of the normalized query][dim x float32].
+    Any number of processes can read the file concurrently; new records are
+    appended with a single write() under an exclusive flock, and readers
+    pick them up by remapping when the file has grown.
+    """
+
+    def __init__(self, model_name, dim, path=None, max_records=QUERY_STORE_MAX_RECORDS):
+        self.model_name = model_name
+        self.dim = int(dim)
+        self.path = Path(path) if path else store_path_for(model_name)
+        self.max_records = max_records
+
+        self.record_dtype = np.dtype([
+            ("key", f"V{KEY_SIZE}"),
+            ("vector", "<f4", (self.dim,)),
+        ])
+        self.record_size = self.record_dtype.itemsize
+
+        self._lock = threading.Lock()
+        self._positions = {}
+        self._records = None
+        self._count = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+        self._open()
+
+    # ------------------------
+    # File handling
+    # ------------------------
+
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        header = _build_header(self.model_name, self.dim)
+
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, "wb") as f:
+                f.write(header)
+
+        with open(self.path, "rb") as f:
+            existing = f.read(HEADER_SIZE)
+
+        if existing != header:
+            # Written by another model or an older layout: start over
+            tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(header)
+            os.replace(tmp_path, self.path)
+
+        self._refresh()
+
+    def _refresh(self):
+        """
+        Map any records appended (by any process) since the last refresh.
+        """
+        size = os.path.getsize(self.path)
+        count = max(size - HEADER_SIZE, 0) // self.record_size
+
+        if count == self._count:
+            return
+
+        if count < self._count:
+            # File was reset (model change in another worker)
+            self._positions.clear()
+            self._count = 0
+
+        with open(self.path, "rb") as f:
+            mm = mmap.mmap(
+                f.fileno(),
+                HEADER_SIZE + count * self.record_size,
+                access=mmap.ACCESS_READ
+            )
+
+        records = np.frombuffer(
+            mm, dtype=self.record_dtype, count=count, offset=HEADER_SIZE
+        )
+
+        keys = records["key"]
+        for position in range(self._count, count):
+            # First write wins if two workers raced on the same query
+            self._positions.setdefault(keys[position].tobytes(), position)
+
+        self._records = records
+        self._count = count
+
+    # ------------------------
+    # Lookup
+    # ------------------------
+
+    def __len__(self):
+        return len(self._positions)
+
+    def get(self, query):
+        key = query_key(query)
+
+        with self._lock:
+            position = self._positions.get(key)
+
+            if position is None:
+                self._refresh()
+                position = self._positions.get(key)
+
+            if position is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return np.array(self._records[position]["vector"], dtype=np.float32)
+
+    def put(self, query, embedding):
+        key = query_key(query)
+
+        vector = np.asarray(embedding, dtype="<f4").reshape(-1)
+        if vector.shape[0] != self.dim:
+            raise ValueError(
+                f"Expected embedding of dim {self.dim}, got {vector.shape[0]}"
+            )
+
+        with self._lock:
+            if key in self._positions:
+                return False
+
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+
+                # Another worker may have appended the same query meanwhile
+                self._refresh()
+                if key in self._positions or len(self._positions) >= self.max_records:
+                    return False
+
+                # Drop a torn record left by a writer that crashed mid-append
+                size = os.fstat(fd).st_size
+                torn = (size - HEADER_SIZE) % self.record_size
+                if torn:
+                    os.ftruncate(fd, size - torn)
+
+                os.write(fd, key + vector.tobytes())
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+            self.writes += 1
+            self._refresh()
+            return True
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+
+            return {
+                "path": str(self.path),
+                "records": len(self._positions),
+                "max_records": self.max_records,
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
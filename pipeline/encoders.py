@@ -0,0 +1,414 @@
+import os
+import json
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# torch, sentence_transformers, transformers and onnxruntime are imported by
+# the backend that needs them, so the ONNX backends never load torch
+
+# ========================
+# CONFIG
+# ========================
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Query encoder used by the API / engine: see ENCODER_BACKENDS
+ENCODER_BACKEND = os.getenv("ENCODER_BACKEND", "fp32")
+
+# onnxruntime intra-op threads; 0 lets onnxruntime decide
+ENCODER_THREADS = int(os.getenv("ENCODER_THREADS", "0"))
+
+ONNX_DIR = Path(os.getenv("ONNX_DIR", "data/models"))
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model.int8.onnx"
+ONNX_META_FILE = "encoder.json"
+
+ENCODER_REPORT_PATH = Path("data/processed/encoder_report.json")
+
+ENCODER_BACKENDS = {
+    "fp32": "SentenceTransformer, float32 (reference)",
+    "int8": "SentenceTransformer with Linear layers dynamically quantized to int8",
+    "onnx": "exported ONNX graph on onnxruntime, float32",
+    "onnx-int8": "exported ONNX graph, dynamically quantized to int8",
+}
+
+
+def encoder_key(model_name, backend):
+    """
+    Identity of the embeddings a backend produces, e.g. for keying the
+    persistent query store: backends agree closely but not exactly.
+    """
+    return model_name if backend == "fp32" else f"{model_name}#{backend}"
+
+
+def onnx_dir_for(model_name, directory=ONNX_DIR):
+    return Path(directory) / model_name.replace("/", "__")
+
+
+# ========================
+# TORCH BACKENDS
+# ========================
+
+def load_sentence_transformer(model_name, quantize=False):
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+
+    if quantize:
+        import torch
+        from torch.ao.quantization import quantize_dynamic
+
+        # Weights to int8 once; activations are quantized per call
+        quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+    return model
+
+
+# ========================
+# ONNX BACKEND
+# ========================
+
+def export_onnx(model_name=MODEL_NAME, directory=ONNX_DIR, quantize=True):
+    """
+    Export the transformer of a SentenceTransformer to ONNX, with its
+    tokenizer and pooling metadata, so the ONNX backends start without
+    torch or the Hub. Optionally also writes a dynamically quantized
+    int8 copy. Returns the output directory.
+    """
+    import torch
+
+    model = load_sentence_transformer(model_name)
+    transformer = model[0]
+
+    out_dir = onnx_dir_for(model_name, directory)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    tokenizer = transformer.tokenizer
+    tokenizer.save_pretrained(out_dir)
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [
+        name for name in ("input_ids", "attention_mask", "token_type_ids")
+        if name in sample
+    ]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    class LastHiddenState(torch.nn.Module):
+        # Positional inputs -> keyword call; only the token embeddings out
+        def __init__(self, auto_model):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, *inputs):
+            return self.auto_model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    wrapped = LastHiddenState(transformer.auto_model).eval()
+
+    tmp_path = out_dir / (ONNX_FILE + ".tmp")
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapped,
+            tuple(sample[name] for name in input_names),
+            str(tmp_path),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            dynamo=False,
+        )
+    os.replace(tmp_path, out_dir / ONNX_FILE)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        tmp_path = out_dir / (ONNX_INT8_FILE + ".tmp")
+        quantize_dynamic(
+            str(out_dir / ONNX_FILE), str(tmp_path), weight_type=QuantType.QInt8
+        )
+        os.replace(tmp_path, out_dir / ONNX_INT8_FILE)
+
+    meta = {
+        "model_name": model_name,
+        "max_seq_length": model.max_seq_length,
+        "dim": model.get_sentence_embedding_dimension(),
+        "pooling": "mean",
+    }
+    with open(out_dir / ONNX_META_FILE, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    return out_dir
+
+
+class OnnxEncoder:
+    """
+    SentenceTransformer-compatible encode() over an exported ONNX graph.
+
+    The tokenizer and the InferenceSession are created once and reused for
+    every call; pooling (masked mean) and normalisation run in numpy.
+    """
+
+    def __init__(self, model_name=MODEL_NAME, quantized=False, directory=ONNX_DIR,
+                 threads=ENCODER_THREADS):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_dir = onnx_dir_for(model_name, directory)
+        model_path = model_dir / (ONNX_INT8_FILE if quantized else ONNX_FILE)
+
+        if not model_path.exists():
+            raise FileNotFoundError(
+                f"{model_path} not found; run `python -m pipeline.encoders --export`"
+            )
+
+        with open(model_dir / ONNX_META_FILE, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+
+        self.session = ort.InferenceSession(
+            str(model_path), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [node.name for node in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        self.max_seq_length = meta["max_seq_length"]
+        self.dim = meta["dim"]
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def tokenize(self, texts):
+        return self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np",
+        )
+
+    def encode(self, sentences, batch_size=32, normalize_embeddings=False, **kwargs):
+        if isinstance(sentences, str):
+            sentences = [sentences]
+
+        output = np.empty((len(sentences), self.dim), dtype=np.float32)
+
+        for start in range(0, len(sentences), batch_size):
+            batch = list(sentences[start:start + batch_size])
+            tokens = self.tokenize(batch)
+
+            feed = {
+                name: tokens[name].astype(np.int64) for name in self.input_names
+            }
+            hidden = self.session.run(None, feed)[0]
+
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+            if normalize_embeddings:
+                pooled /= np.maximum(
+                    np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12
+                )
+
+            output[start:start + len(batch)] = pooled
+
+        return output
+
+
+# ========================
+# FACTORY
+# ========================
+
+# The method each backend's encode() calls to tokenize a batch:
+# SentenceTransformer.preprocess (tokenize on older versions) or
+# OnnxEncoder.tokenize
+TOKENIZE_METHODS = ("preprocess", "tokenize")
+
+
+def instrument_tokenizer(encoder, observe, lock=None):
+    """
+    Wrap the encoder's tokenize step (on this instance only) so that
+    observe(seconds, n_texts) is called for every batch it tokenizes.
+    With `lock`, tokenization is serialized: fast tokenizers raise
+    "Already borrowed" when one instance is used from several threads.
+    """
+    for name in TOKENIZE_METHODS:
+        tokenize = getattr(encoder, name, None)
+        if tokenize is not None:
+            break
+    else:
+        return encoder
+
+    def timed_tokenize(texts, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            if lock is None:
+                return tokenize(texts, *args, **kwargs)
+            with lock:
+                return tokenize(texts, *args, **kwargs)
+        finally:
+            observe(time.perf_counter() - start, len(texts))
+
+    setattr(encoder, name, timed_tokenize)
+    return encoder
+
+
+def load_encoder(model_name=MODEL_NAME, backend=ENCODER_BACKEND):
+    """
+    An object with SentenceTransformer's encode(..., normalize_embeddings=)
+    for the given backend.
+    """
+    if backend == "fp32":
+        return load_sentence_transformer(model_name)
+    if backend == "int8":
+        return load_sentence_transformer(model_name, quantize=True)
+    if backend == "onnx":
+        return OnnxEncoder(model_name)
+    if backend == "onnx-int8":
+        return OnnxEncoder(model_name, quantized=True)
+
+    raise ValueError(
+        f"Unknown encoder backend {backend!r}; expected one of {sorted(ENCODER_BACKENDS)}"
+    )
+
+
+# ========================
+# PARITY / LATENCY REPORT
+# ========================
+
+def comparison_queries():
+    """
+    Labeled dataset queries plus assessment names from the corpus: long
+    job descriptions and short skill queries.
+    """
+    from pipeline.evaluate import CORPUS_PATH, load_labeled_data
+    from pipeline.retriever import load_corpus
+
+    queries = list(load_labeled_data())
+    queries += [item["text"].split(".")[0] for item in load_corpus(CORPUS_PATH)]
+    return queries
+
+
+def latency(encoder, queries, repeats=3):
+    single = []
+    for _ in range(repeats):
+        for query in queries:
+            start = time.perf_counter()
+            encoder.encode([query], normalize_embeddings=True)
+            single.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    encoder.encode(queries, batch_size=32, normalize_embeddings=True)
+    batch_seconds = time.perf_counter() - start
+
+    ms = np.array(single) * 1000
+    return {
+        "single_p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "single_p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "batch32_queries_per_s": round(len(queries) / batch_seconds, 1),
+    }
+
+
+def compare_backends(backends, model_name=MODEL_NAME, ks=(5, 10)):
+    """
+    Encode the same queries with every backend and compare against fp32:
+    cosine agreement of the embeddings and Recall@k of each backend's
+    FAISS top-k against the fp32 top-k, plus load time and latency.
+    """
+    from pipeline.index_config import apply_search_params, config_path_for, load_index_config
+    from pipeline.retriever import INDEX_PATH, read_index
+
+    index = read_index(INDEX_PATH)
+    apply_search_params(index, load_index_config(config_path_for(INDEX_PATH)))
+
+    queries = comparison_queries()
+    max_k = max(ks)
+
+    report = {"model": model_name, "queries": len(queries), "backends": {}}
+    reference = None
+
+    for backend in ["fp32"] + [b for b in backends if b != "fp32"]:
+        start = time.perf_counter()
+        try:
+            encoder = load_encoder(model_name, backend)
+        except (ImportError, FileNotFoundError) as exc:
+            print(f"⚠️ Skipping {backend}: {exc}")
+            continue
+        load_seconds = time.perf_counter() - start
+
+        embeddings = np.asarray(
+            encoder.encode(queries, batch_size=32, normalize_embeddings=True),
+            dtype=np.float32
+        )
+        _, labels = index.search(embeddings, max_k)
+
+        if reference is None:
+            reference = (embeddings, labels)
+
+        ref_embeddings, ref_labels = reference
+        cosine = (embeddings * ref_embeddings).sum(axis=1)
+
+        result = {
+            "load_s": round(load_seconds, 3),
+            "cosine_mean": round(float(cosine.mean()), 5),
+            "cosine_min": round(float(cosine.min()), 5),
+        }
+        for k in ks:
+            overlap = [
+                len(set(row[:k]) & set(ref_row[:k])) / k
+                for row, ref_row in zip(labels, ref_labels)
+            ]
+            result[f"recall@{k}_vs_fp32"] = round(float(np.mean(overlap)), 4)
+
+        result.update(latency(encoder, queries[:50]))
+        report["backends"][backend] = result
+
+        print(
+            f"{backend:>9} | load {result['load_s']:.2f}s | "
+            f"cos mean {result['cosine_mean']:.4f} min {result['cosine_min']:.4f} | "
+            + " | ".join(f"R@{k} {result[f'recall@{k}_vs_fp32']:.3f}" for k in ks)
+            + f" | p50 {result['single_p50_ms']:.1f} ms, p99 {result['single_p99_ms']:.1f} ms"
+            f" | {result['batch32_queries_per_s']:.0f} q/s batched"
+        )
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query encoder backends")
+    parser.add_argument(
+        "--export", action="store_true",
+        help="export the model to ONNX (and an int8 copy) under data/models/"
+    )
+    parser.add_argument(
+        "--compare", nargs="+", choices=sorted(ENCODER_BACKENDS),
+        help="parity + latency report of these backends against fp32"
+    )
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 10])
+    parser.add_argument("--model", default=MODEL_NAME)
+    args = parser.parse_args()
+
+    if args.export:
+        out_dir = export_onnx(args.model)
+        print(f"✅ Exported ONNX encoder to: {out_dir}")
+
+    if args.compare:
+        report = compare_backends(args.compare, args.model, ks=args.k)
+
+        ENCODER_REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(ENCODER_REPORT_PATH, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved to: {ENCODER_REPORT_PATH}")
+
+    if not (args.export or args.compare):
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
-import json
-import pandas as pd
-import faiss
+import time
+import argparse
 import numpy as np
+import pandas as pd
 from urllib.parse import urlparse
 from collections import defaultdict
-from sentence_transformers import SentenceTransformer
+
+from pipeline.evaluator import hit_matrix, metrics_at_ks
+from pipeline.retriever import RecommenderEngine
 
 # ========================
 # PATHS & CONFIG
@@ -14,9 +16,12 @@ DATASET_PATH = r"data/given/Gen_AI Dataset.xlsx"
 
 FAISS_INDEX_PATH = "data/processed/faiss.index"
 CORPUS_PATH = "data/processed/embedding_corpus.json"
+LEXICAL_INDEX_PATH = "data/processed/bm25.npz"
 
 MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 
+EVAL_KS = (5, 10)
+
 
 # ========================
 # HELPERS
@@ -51,10 +56,10 @@ def load_labeled_data():
 
     grouped = defaultdict(set)
 
-    for _, row in df.iterrows():
-        query = str(row["Query"]).strip()
-        slug = extract_slug(row["Assessment_url"])
+    queries = df["Query"].astype(str).str.strip()
+    slugs = df["Assessment_url"].map(extract_slug)
 
+    for query, slug in zip(queries, slugs):
         if query and slug:
             grouped[query].add(slug)
 
@@ -68,33 +73,30 @@ def load_labeled_data():
 # EVALUATION
 # ========================
 
-def evaluate_recall_at_k(labeled_data, k=5):
-    print(f"\n📊 Evaluating Recall@{k}\n")
+def load_engine(hybrid=False):
+    return RecommenderEngine(
+        index_path=FAISS_INDEX_PATH,
+        corpus_path=CORPUS_PATH,
+        model_name=MODEL_NAME,
+        lexical_path=LEXICAL_INDEX_PATH if hybrid else None
+    )
 
-    # Load FAISS index
-    index = faiss.read_index(FAISS_INDEX_PATH)
 
-    # Load corpus
-    with open(CORPUS_PATH, "r", encoding="utf-8") as f:
-        corpus = json.load(f)
+def evaluate_recall_at_k(labeled_data, k=5, engine=None):
+    print(f"\n📊 Evaluating Recall@{k}\n")
 
-    # Load model
-    model = SentenceTransformer(MODEL_NAME)
+    if engine is None:
+        engine = load_engine()
 
     recalls = []
 
     for query, relevant_slugs in labeled_data.items():
-        query_embedding = model.encode(
-            [query],
-            normalize_embeddings=True
-        )
-
-        scores, indices = index.search(query_embedding, k)
+        hits = engine.recommend(query, k)
 
         retrieved_slugs = set()
 
-        for idx in indices[0]:
-            url = corpus[idx]["url"]
+        for hit in hits:
+            url = hit.record["url"]
             slug = extract_slug(url)
             if slug:
                 retrieved_slugs.add(slug)
@@ -114,12 +116,114 @@ def evaluate_recall_at_k(labeled_data, k=5):
     return avg_recall
 
 
+def evaluate_batch(labeled_data, ks=EVAL_KS, engine=None, verbose=False):
+    """
+    Evaluate every k in one pass: all queries are encoded in one batch and
+    searched with a single index.search at max(k); Recall@k, MRR@k and
+    nDCG@k are then computed with array operations on integer slug ids.
+    """
+    if engine is None:
+        engine = load_engine()
+
+    ks = sorted(ks)
+    max_k = ks[-1]
+
+    queries = list(labeled_data)
+    start = time.perf_counter()
+
+    # Map slugs to integer ids, corpus slugs first
+    snapshot = engine.snapshot
+    slug_ids = {}
+    corpus_slug_ids = np.array([
+        slug_ids.setdefault(slug, len(slug_ids)) if slug else -1
+        for slug in (extract_slug(item["url"]) for item in snapshot.corpus)
+    ], dtype=np.int64)
+
+    relevant_ids = [
+        [slug_ids.setdefault(slug, len(slug_ids)) for slug in labeled_data[q]]
+        for q in queries
+    ]
+    n_relevant = np.array([len(ids) for ids in relevant_ids])
+
+    query_embeddings = engine.encode(queries)
+
+    if snapshot.lexical is None:
+        _, indices = snapshot.search(query_embeddings, max_k)
+    else:
+        # Hybrid: fused rankings come back as hits, not index arrays
+        indices = np.full((len(queries), max_k), -1, dtype=np.int64)
+        results = engine.search_embeddings(query_embeddings, max_k, queries=queries)
+        for row, hits in enumerate(results):
+            indices[row, :len(hits)] = [hit.position for hit in hits]
+
+    retrieved_ids = np.where(indices >= 0, corpus_slug_ids[indices], -1)
+    hits = hit_matrix(retrieved_ids, relevant_ids)
+
+    per_query = metrics_at_ks(hits, n_relevant, ks)
+    elapsed = time.perf_counter() - start
+
+    if verbose:
+        for i, query in enumerate(queries):
+            print(f"Query: {query[:70]}...")
+            print(
+                f"Relevant: {n_relevant[i]} | "
+                + " | ".join(
+                    f"Hits@{k}: {int(hits[i, :k].sum())}" for k in ks
+                )
+            )
+
+    summary = {
+        k: {
+            name: float(values.mean())
+            for name, values in metrics.items()
+        }
+        for k, metrics in per_query.items()
+    }
+
+    print(f"\n📊 Evaluated {len(queries)} queries in {elapsed:.2f}s\n")
+    for k, metrics in summary.items():
+        print(
+            f"✅ Recall@{k}: {metrics['recall']:.4f} | "
+            f"MRR@{k}: {metrics['mrr']:.4f} | "
+            f"nDCG@{k}: {metrics['ndcg']:.4f}"
+        )
+
+    return summary
+
+
 # ========================
 # MAIN
 # ========================
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Evaluate retrieval on the labeled train set")
+    parser.add_argument(
+        "--k", type=int, nargs="+", default=list(EVAL_KS),
+        help="cut-offs to evaluate (default: 5 10)"
+    )
+    parser.add_argument(
+        "--per-query", action="store_true",
+        help="use the original one-query-at-a-time Recall@k loop"
+    )
+    parser.add_argument(
+        "--verbose", action="store_true",
+        help="print per-query hit counts"
+    )
+    parser.add_argument(
+        "--hybrid", action="store_true",
+        help="fuse FAISS results with the BM25 index (python -m pipeline.preprocess)"
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = parse_args()
+
     labeled_data = load_labeled_data()
+    engine = load_engine(hybrid=args.hybrid)
 
-    evaluate_recall_at_k(labeled_data, k=5)
-    evaluate_recall_at_k(labeled_data, k=10)
+    if args.per_query:
+        for k in args.k:
+            evaluate_recall_at_k(labeled_data, k=k, engine=engine)
+    else:
+        evaluate_batch(labeled_data, ks=args.k, engine=engine, verbose=args.verbose)
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def recall_at_k(retrieved_urls, relevant_urls, k=10):
     retrieved_k = retrieved_urls[:k]
 
@@ -21,3 +24,87 @@ def mean_recall_at_k(results, k=10):
     ]
 
     return sum(scores) / len(scores)
+
+
+# ========================
+# VECTORIZED METRICS
+# ========================
+
+def hit_matrix(retrieved_ids, relevant_ids):
+    """
+    retrieved_ids: (n_queries, k) int array of item ids in rank order,
+                   -1 for "no item"
+    relevant_ids: list of n_queries iterables of relevant item ids
+
+    Returns a (n_queries, k) bool array marking ranks that hit a relevant
+    item. Repeated ids in a row only count at their first rank, matching
+    the set semantics of recall_at_k.
+    """
+    retrieved_ids = np.asarray(retrieved_ids)
+    n_queries, k = retrieved_ids.shape
+
+    rows = np.repeat(
+        np.arange(n_queries),
+        [len(ids) for ids in relevant_ids]
+    )
+    cols = np.fromiter(
+        (item for ids in relevant_ids for item in ids),
+        dtype=np.int64,
+        count=len(rows)
+    )
+
+    n_items = int(max(retrieved_ids.max(initial=-1), cols.max(initial=-1))) + 1
+    relevance = np.zeros((n_queries, n_items + 1), dtype=bool)
+    relevance[rows, cols] = True
+
+    # -1 maps to the spare last column, which is never relevant
+    hits = relevance[np.arange(n_queries)[:, None], retrieved_ids]
+
+    earlier = np.tri(k, k, -1, dtype=bool).T
+    repeated = ((retrieved_ids[:, :, None] == retrieved_ids[:, None, :]) & earlier).any(axis=1)
+
+    return hits & ~repeated
+
+
+def metrics_at_ks(hits, n_relevant, ks):
+    """
+    Recall@k, MRR@k and nDCG@k (binary relevance) for every k at once.
+
+    hits: (n_queries, max_k) bool array from hit_matrix
+    n_relevant: (n_queries,) number of relevant items per query
+    """
+    hits = np.asarray(hits, dtype=bool)
+    n_relevant = np.asarray(n_relevant, dtype=np.float64)
+    max_k = hits.shape[1]
+
+    cumulative_hits = np.cumsum(hits, axis=1)
+
+    first_hit = np.where(hits.any(axis=1), hits.argmax(axis=1), max_k)
+
+    discounts = 1.0 / np.log2(np.arange(2, max_k + 2))
+    cumulative_dcg = np.cumsum(hits * discounts, axis=1)
+    ideal_dcg = np.concatenate([[0.0], np.cumsum(discounts)])
+
+    valid = n_relevant > 0
+    results = {}
+
+    for k in sorted(ks):
+        if k > max_k:
+            raise ValueError(f"k={k} exceeds retrieved depth {max_k}")
+
+        recall = np.zeros_like(n_relevant)
+        recall[valid] = cumulative_hits[valid, k - 1] / n_relevant[valid]
+
+        mrr = np.where(first_hit < k, 1.0 / (first_hit + 1), 0.0)
+
+        ideal = ideal_dcg[np.minimum(n_relevant, k).astype(int)]
+        ndcg = np.zeros_like(n_relevant)
+        ndcg[valid] = cumulative_dcg[valid, k - 1] / ideal[valid]
+
+        results[k] = {
+            "recall": recall,
+            "mrr": mrr,
+            "ndcg": ndcg,
+        }
+
+    return results
@@ -0,0 +1,209 @@
+from collections import namedtuple
+
+import numpy as np
+
+from pipeline.record_store import parse_duration, parse_flag
+
+# faiss is imported inside the functions that need it, like retriever.py
+
+# ========================
+# FILTERS
+# ========================
+
+# Hashable so the batcher can group requests that share the same filters.
+# None = no constraint; job_levels matches any of the given levels.
+Filters = namedtuple(
+    "Filters",
+    ["min_duration", "max_duration", "remote", "adaptive", "job_levels"],
+    defaults=(None, None, None, None, None),
+)
+
+
+def make_filters(
+    min_duration=None,
+    max_duration=None,
+    remote=None,
+    adaptive=None,
+    job_levels=None,
+):
+    """
+    Filters from request fields, or None when nothing is constrained.
+    """
+    if job_levels:
+        job_levels = tuple(sorted({normalize_level(level) for level in job_levels}))
+    else:
+        job_levels = None
+
+    filters = Filters(min_duration, max_duration, remote, adaptive, job_levels)
+    if all(value is None for value in filters):
+        return None
+
+    return filters
+
+
+def normalize_level(level):
+    return " ".join(level.split()).lower()
+
+
+def split_levels(value):
+    """
+    "Mid-Professional, Professional Individual Contributor" -> levels.
+    """
+    if not value or value == "Not specified":
+        return []
+    return [normalize_level(level) for level in value.split(",") if level.strip()]
+
+
+# ========================
+# FILTER INDEX
+# ========================
+
+class FilterIndex:
+    """
+    Precomputed metadata indexes over a corpus, by position: a sorted
+    duration index for range queries and boolean bitmaps for the flags
+    and each job level. mask() combines them with vectorized ANDs / ORs.
+    """
+
+    def __init__(self, corpus):
+        count = len(corpus)
+
+        if hasattr(corpus, "duration"):
+            # RecordStore: typed columns already
+            durations = np.asarray(corpus.duration, dtype=np.int32)
+            remote = np.asarray(corpus.remote, dtype=np.int8)
+            adaptive = np.asarray(corpus.adaptive, dtype=np.int8)
+            job_levels = corpus.strings("job_levels")
+        else:
+            durations = np.array(
+                [parse_duration(item.get("duration", "")) for item in corpus],
+                dtype=np.int32
+            )
+            remote = np.array(
+                [parse_flag(item.get("remote_support", "")) for item in corpus],
+                dtype=np.int8
+            )
+            adaptive = np.array(
+                [parse_flag(item.get("adaptive_support", "")) for item in corpus],
+                dtype=np.int8
+            )
+            job_levels = [item.get("job_levels", "") for item in corpus]
+
+        self.count = count
+
+        # Unknown durations (-1) never match a duration filter
+        known = np.flatnonzero(durations >= 0)
+        order = np.argsort(durations[known], kind="stable")
+        self._duration_positions = known[order]
+        self._sorted_durations = durations[known][order]
+
+        self._flags = {
+            "remote": {True: remote == 1, False: remote == 0},
+            "adaptive": {True: adaptive == 1, False: adaptive == 0},
+        }
+
+        self._levels = {}
+        for position, value in enumerate(job_levels):
+            for level in split_levels(value):
+                bitmap = self._levels.get(level)
+                if bitmap is None:
+                    bitmap = self._levels[level] = np.zeros(count, dtype=bool)
+                bitmap[position] = True
+
+    @property
+    def job_levels(self):
+        return sorted(self._levels)
+
+    def duration_mask(self, min_duration=None, max_duration=None):
+        lo = 0
+        hi = len(self._sorted_durations)
+
+        if min_duration is not None:
+            lo = np.searchsorted(self._sorted_durations, min_duration, side="left")
+        if max_duration is not None:
+            hi = np.searchsorted(self._sorted_durations, max_duration, side="right")
+
+        mask = np.zeros(self.count, dtype=bool)
+        mask[self._duration_positions[lo:hi]] = True
+        return mask
+
+    def mask(self, filters):
+        """
+        Boolean array of positions matching every constraint in `filters`.
+        """
+        mask = np.ones(self.count, dtype=bool)
+
+        if filters.min_duration is not None or filters.max_duration is not None:
+            mask &= self.duration_mask(filters.min_duration, filters.max_duration)
+
+        if filters.remote is not None:
+            mask &= self._flags["remote"][bool(filters.remote)]
+
+        if filters.adaptive is not None:
+            mask &= self._flags["adaptive"][bool(filters.adaptive)]
+
+        if filters.job_levels:
+            levels = np.zeros(self.count, dtype=bool)
+            for level in filters.job_levels:
+                bitmap = self._levels.get(level)
+                if bitmap is not None:
+                    levels |= bitmap
+            mask &= levels
+
+        return mask
+
+
+# ========================
+# FAISS SEARCH PARAMETERS
+# ========================
+
+def _unwrap(index):
+    """
+    The innermost index under ID maps and pre-transforms.
+    """
+    import faiss
+
+    index = faiss.downcast_index(index)
+    while isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2, faiss.IndexPreTransform)):
+        index = faiss.downcast_index(index.index)
+    return index
+
+
+def selector_for(mask, ids=None):
+    """
+    IDSelector admitting the masked positions: a bitmap over positions for
+    position-labelled indexes, or a batch of document ids for ID-mapped
+    ones. Returns (selector, keep_alive); keep_alive must outlive the
+    search because the selector points into it.
+    """
+    import faiss
+
+    if ids is not None:
+        allowed = np.ascontiguousarray(ids[mask], dtype=np.int64)
+        return faiss.IDSelectorBatch(allowed), allowed
+
+    bitmap = np.packbits(mask, bitorder="little")
+    return faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap)), bitmap
+
+
+def search_parameters(index, selector, exhaustive=False):
+    """
+    SearchParameters carrying `selector`, of the type the index expects.
+
+    IVF indexes reject the generic type, and the typed parameter objects
+    override the index's own nprobe / efSearch, so those are copied over.
+    `exhaustive` widens the search for rows that came back short.
+    """
+    import faiss
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        nprobe = ivf.nlist if exhaustive else ivf.nprobe
+        return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+
+    inner = _unwrap(index)
+    if exhaustive and hasattr(inner, "hnsw"):
+        ef_search = max(inner.hnsw.efSearch, index.ntotal)
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search)
+
+    return faiss.SearchParameters(sel=selector)
@@ -1,30 +1,32 @@
-import pandas as pd
+import csv
+
+# Legacy converter for wide-format files (Query, Recommended_Assessments).
+# pipeline/predict_test.py now writes the long format directly.
 
 INPUT_PATH = "submission_predictions.csv"
 OUTPUT_PATH = "submission_predictions_final.csv"
 
 
 def main():
-    df = pd.read_csv(INPUT_PATH)
-
-    rows = []
+    total_rows = 0
 
-    for _, row in df.iterrows():
-        query = row["Query"]
-        urls = row["Recommended_Assessments"].split(",")
+    with open(INPUT_PATH, "r", encoding="utf-8", newline="") as src, \
+            open(OUTPUT_PATH, "w", encoding="utf-8", newline="") as dst:
+        reader = csv.DictReader(src)
+        writer = csv.writer(dst, lineterminator="\n")
+        writer.writerow(["Query", "Assessment_url"])
 
-        for url in urls:
-            rows.append({
-                "Query": query,
-                "Assessment_url": url.strip()
-            })
+        for row in reader:
+            query = row["Query"]
+            urls = row["Recommended_Assessments"].split(",")
 
-    final_df = pd.DataFrame(rows)
-    final_df.to_csv(OUTPUT_PATH, index=False)
+            for url in urls:
+                writer.writerow([query, url.strip()])
+                total_rows += 1
 
     print("✅ Submission file reformatted successfully")
     print(f"Saved as: {OUTPUT_PATH}")
-    print(f"Total rows: {len(final_df)}")
+    print(f"Total rows: {total_rows}")
 
 
 if __name__ == "__main__":
@@ -1,45 +1,503 @@
+import os
+import sys
 import json
+import time
+import hashlib
+import argparse
+import multiprocessing
 import numpy as np
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from pathlib import Path
 from sentence_transformers import SentenceTransformer
 
+from pipeline.index_config import (
+    INDEX_CONFIG_PATH,
+    build_index,
+    load_index_config,
+    save_index_config,
+)
+from pipeline.prepare_embeddings import document_id
+
 INPUT_PATH = Path("data/processed/embedding_corpus.json")
 EMBEDDING_PATH = Path("data/processed/embeddings.npy")
 META_PATH = Path("data/processed/embedding_metadata.json")
+MANIFEST_PATH = Path("data/processed/embedding_manifest.json")
+INDEX_PATH = Path("data/processed/faiss.index")
 
 MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 
+# Texts per model.encode batch (--batch-size, every build mode)
+BATCH_SIZE = 32
 
-def main():
-    print("Loading embedding corpus...")
-    with open(INPUT_PATH, "r", encoding="utf-8") as f:
-        corpus = json.load(f)
+# Parallel build (--workers): texts per tokenizer call when measuring
+# lengths, and encode tasks queued per worker (bounds the texts held in
+# flight)
+LENGTH_CHUNK = 1024
+TASKS_PER_WORKER = 2
 
-    texts = [item["text"] for item in corpus]
-    metadata = [{"id": item["id"], "url": item["url"]} for item in corpus]
 
-    print("Loading model...")
-    model = SentenceTransformer(MODEL_NAME)
+# ========================
+# HELPERS
+# ========================
 
-    print("Generating embeddings...")
-    embeddings = model.encode(
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_manifest():
+    if not MANIFEST_PATH.exists():
+        return None
+
+    with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def build_manifest(corpus, dim):
+    return {
+        "model": MODEL_NAME,
+        "dim": int(dim),
+        "documents": {
+            item["url"]: content_hash(item["text"])
+            for item in corpus
+        }
+    }
+
+
+def save_outputs(embeddings, metadata, manifest):
+    EMBEDDING_PATH.parent.mkdir(parents=True, exist_ok=True)
+
+    # Write-then-rename so readers never see a partial file
+    tmp_path = EMBEDDING_PATH.with_suffix(".tmp.npy")
+    np.save(tmp_path, embeddings)
+    os.replace(tmp_path, EMBEDDING_PATH)
+
+    save_metadata(metadata, manifest)
+
+
+def save_metadata(metadata, manifest):
+    with open(META_PATH, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+
+    with open(MANIFEST_PATH, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def encode(model, texts, batch_size=BATCH_SIZE):
+    return model.encode(
         texts,
-        batch_size=32,
-        show_progress_bar=True,
+        batch_size=batch_size,
+        show_progress_bar=len(texts) > batch_size,
         normalize_embeddings=True
+    ).astype(np.float32)
+
+
+# ========================
+# INCREMENTAL UPDATE
+# ========================
+
+def diff_corpus(corpus, manifest):
+    """
+    Compare the corpus against the manifest by URL and content hash.
+    Returns (changed_or_added_positions, deleted_urls, changed_urls).
+    """
+    previous = manifest["documents"]
+    current_urls = set()
+
+    to_encode = []
+    changed = []
+
+    for position, item in enumerate(corpus):
+        url = item["url"]
+        current_urls.add(url)
+
+        old_hash = previous.get(url)
+        if old_hash is None:
+            to_encode.append(position)
+        elif old_hash != content_hash(item["text"]):
+            to_encode.append(position)
+            changed.append(url)
+
+    deleted = [url for url in previous if url not in current_urls]
+
+    return to_encode, deleted, changed
+
+
+def update_index(embeddings, corpus, to_encode, removed_urls, rebuild=False):
+    """
+    Apply the diff to faiss.index in place using ID-mapped vectors
+    (ids = document_id(url)). Falls back to a rebuild, with the index type
+    from index_config.json, for legacy position-labelled indexes or index
+    types without remove_ids (e.g. HNSW). `rebuild` ignores the existing
+    index, e.g. when every vector was re-encoded by a new model.
+    """
+    import faiss
+
+    ids = np.array([document_id(item["url"]) for item in corpus], dtype=np.int64)
+
+    index = None
+    if INDEX_PATH.exists() and not rebuild:
+        index = faiss.read_index(str(INDEX_PATH))
+        if not isinstance(faiss.downcast_index(index), faiss.IndexIDMap2):
+            index = None
+
+    rebuilt = index is None
+
+    if not rebuilt:
+        stale = np.array(
+            [document_id(url) for url in removed_urls], dtype=np.int64
+        )
+        try:
+            if len(stale):
+                index.remove_ids(stale)
+            if to_encode:
+                index.add_with_ids(embeddings[to_encode], ids[to_encode])
+        except RuntimeError:
+            rebuilt = True
+
+    config = None
+    if rebuilt or index.ntotal != len(corpus):
+        index, config = build_index(
+            embeddings, load_index_config(INDEX_CONFIG_PATH), ids=ids
+        )
+        rebuilt = True
+
+    tmp_path = INDEX_PATH.with_suffix(".index.tmp")
+    faiss.write_index(index, str(tmp_path))
+    os.replace(tmp_path, INDEX_PATH)
+
+    if config is not None:
+        save_index_config(config, INDEX_CONFIG_PATH)
+
+    return rebuilt
+
+
+def run_incremental(corpus, model, batch_size=BATCH_SIZE):
+    manifest = load_manifest()
+
+    if (
+        manifest is None
+        or manifest.get("model") != MODEL_NAME
+        or not EMBEDDING_PATH.exists()
+        or not META_PATH.exists()
+    ):
+        print("No usable manifest for this model; doing a full build.")
+        run_full(corpus, model, batch_size)
+        # Every vector changed: the old index must not be reused even when
+        # it holds the same ids
+        update_index(np.load(EMBEDDING_PATH), corpus, [], [], rebuild=True)
+        return
+
+    to_encode, deleted, changed = diff_corpus(corpus, manifest)
+
+    print(
+        f"Added: {len(to_encode) - len(changed)} | Changed: {len(changed)} | "
+        f"Deleted: {len(deleted)} | Unchanged: {len(corpus) - len(to_encode)}"
+    )
+
+    old_embeddings = np.load(EMBEDDING_PATH, mmap_mode="r")
+    with open(META_PATH, "r", encoding="utf-8") as f:
+        old_positions = {
+            item["url"]: position
+            for position, item in enumerate(json.load(f))
+        }
+
+    # Reuse vectors of unchanged documents in the new corpus order
+    embeddings = np.empty((len(corpus), manifest["dim"]), dtype=np.float32)
+    encode_set = set(to_encode)
+
+    for position, item in enumerate(corpus):
+        if position in encode_set:
+            continue
+
+        old_position = old_positions.get(item["url"])
+        if old_position is None:
+            # Manifest and metadata out of sync: treat as new
+            to_encode.append(position)
+        else:
+            embeddings[position] = old_embeddings[old_position]
+
+    to_encode.sort()
+
+    if to_encode:
+        print(f"Encoding {len(to_encode)} documents...")
+        embeddings[to_encode] = encode(
+            model(), [corpus[p]["text"] for p in to_encode], batch_size
+        )
+
+    del old_embeddings
+
+    metadata = [{"id": item["id"], "url": item["url"]} for item in corpus]
+    save_outputs(embeddings, metadata, build_manifest(corpus, embeddings.shape[1]))
+
+    rebuilt = update_index(embeddings, corpus, to_encode, deleted + changed)
+
+    print(f"Embeddings shape: {embeddings.shape}")
+    print(f"FAISS index {'rebuilt' if rebuilt else 'updated in place'}: {INDEX_PATH}")
+
+
+# ========================
+# PARALLEL BUILD
+# ========================
+
+# Per worker process: the model and the output memmap, set up once
+_worker = {}
+
+
+def _init_worker(model_name, threads):
+    import torch
+
+    # Split the cores between the workers instead of each using all
+    torch.set_num_threads(threads)
+    _worker["model"] = SentenceTransformer(model_name)
+
+
+def _dimension():
+    return _worker["model"].get_sentence_embedding_dimension()
+
+
+def _encode_batch(path, positions, texts):
+    """
+    Encode one batch and write it into the output .npy at its original
+    row positions. Returns the number of rows written.
+    """
+    if _worker.get("path") != path:
+        _worker["output"] = np.load(path, mmap_mode="r+")
+        _worker["path"] = path
+
+    _worker["output"][positions] = _worker["model"].encode(
+        texts, batch_size=len(texts), normalize_embeddings=True
+    )
+    return len(positions)
+
+
+def token_lengths(model_name, texts):
+    """
+    Token count of every text (special tokens included, capped at the
+    tokenizer's limit), from the tokenizer alone.
+    """
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    limit = min(tokenizer.model_max_length, 4096)
+    lengths = np.empty(len(texts), dtype=np.int32)
+
+    for start in range(0, len(texts), LENGTH_CHUNK):
+        encoded = tokenizer(
+            texts[start:start + LENGTH_CHUNK],
+            truncation=True, max_length=limit
+        )["input_ids"]
+        lengths[start:start + LENGTH_CHUNK] = [len(ids) for ids in encoded]
+
+    return lengths
+
+
+def length_sorted_batches(lengths, batch_size):
+    """
+    Row positions grouped into batches of similar token length, longest
+    first, so each batch pads to little more than its own texts and the
+    slowest batches start early.
+    """
+    order = np.argsort(-lengths, kind="stable")
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+
+def padding_ratio(lengths, batches):
+    """
+    Fraction of the encoded tokens that are padding for these batches.
+    """
+    padded = sum(int(lengths[batch].max()) * len(batch) for batch in batches)
+    return 1 - int(lengths.sum()) / padded if padded else 0.0
+
+
+def peak_memory_mb():
+    """
+    (this process, largest finished child) peak RSS in MB, or None where
+    the resource module is unavailable (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    # ru_maxrss is in kB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return tuple(
+        resource.getrusage(who).ru_maxrss * scale / (1024 * 1024)
+        for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)
     )
 
+
+def encode_parallel(texts, output_path, workers, batch_size=BATCH_SIZE, model_name=MODEL_NAME):
+    """
+    Encode `texts` on a pool of `workers` processes, in batches sorted by
+    token length, writing each batch straight into a preallocated .npy
+    memmap at `output_path` in the original order. Nothing but the
+    current batches is held in memory.
+
+    Returns (dim, encode_seconds); the time starts once the first worker
+    has loaded its model, so it excludes process start-up.
+    """
+    lengths = token_lengths(model_name, texts)
+    batches = length_sorted_batches(lengths, batch_size)
+
+    unsorted = [
+        np.arange(start, min(start + batch_size, len(texts)))
+        for start in range(0, len(texts), batch_size)
+    ]
+    print(
+        f"Padding: {padding_ratio(lengths, batches):.1%} of tokens "
+        f"(unsorted: {padding_ratio(lengths, unsorted):.1%})"
+    )
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    # spawn: each worker loads its own model; forking a parent that has
+    # run tokenizers / torch threads can deadlock
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(model_name, threads),
+    ) as pool:
+        dim = pool.submit(_dimension).result()
+        start = time.perf_counter()
+
+        output = np.lib.format.open_memmap(
+            output_path, mode="w+", dtype=np.float32, shape=(len(texts), dim)
+        )
+        del output
+
+        pending = set()
+        done = 0
+        remaining = iter(batches)
+
+        while True:
+            for batch in remaining:
+                pending.add(pool.submit(
+                    _encode_batch, str(output_path), batch,
+                    [texts[position] for position in batch]
+                ))
+                if len(pending) >= workers * TASKS_PER_WORKER:
+                    break
+
+            if not pending:
+                break
+
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                done += future.result()
+
+            print(f"\rEncoded {done}/{len(texts)}", end="", flush=True)
+
+        encode_seconds = time.perf_counter() - start
+
+    print()
+    return dim, encode_seconds
+
+
+def run_parallel(corpus, workers, batch_size=BATCH_SIZE):
+    texts = [item["text"] for item in corpus]
+    metadata = [{"id": item["id"], "url": item["url"]} for item in corpus]
+
     EMBEDDING_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = EMBEDDING_PATH.with_suffix(".tmp.npy")
 
-    np.save(EMBEDDING_PATH, embeddings)
+    print(f"Generating embeddings on {workers} worker processes...")
+    start = time.perf_counter()
+    dim, encode_seconds = encode_parallel(texts, tmp_path, workers, batch_size, MODEL_NAME)
+    elapsed = time.perf_counter() - start
 
-    with open(META_PATH, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, indent=2)
+    # Write-then-rename so readers never see a partial file
+    os.replace(tmp_path, EMBEDDING_PATH)
+    save_metadata(metadata, build_manifest(corpus, dim))
+
+    print(f"Embeddings shape: ({len(texts)}, {dim})")
+    print(
+        f"Throughput: {len(texts) / encode_seconds:.1f} docs/s encoding "
+        f"({encode_seconds:.2f}s; {elapsed:.2f}s with tokenizing and worker start-up)"
+    )
+
+    peak = peak_memory_mb()
+    if peak is not None:
+        print(f"Peak RSS: {peak[0]:.1f} MB main process, {peak[1]:.1f} MB largest worker")
+
+    print(f"Saved embeddings to: {EMBEDDING_PATH}")
+    print(f"Saved metadata to: {META_PATH}")
+
+
+# ========================
+# FULL BUILD
+# ========================
+
+def run_full(corpus, model, batch_size=BATCH_SIZE):
+    texts = [item["text"] for item in corpus]
+    metadata = [{"id": item["id"], "url": item["url"]} for item in corpus]
+
+    encoder = model()
+
+    print("Generating embeddings...")
+    start = time.perf_counter()
+    embeddings = encode(encoder, texts, batch_size)
+    elapsed = time.perf_counter() - start
+
+    save_outputs(embeddings, metadata, build_manifest(corpus, embeddings.shape[1]))
 
     print(f"Embeddings shape: {embeddings.shape}")
+    print(f"Throughput: {len(texts) / elapsed:.1f} docs/s ({elapsed:.2f}s)")
+
+    peak = peak_memory_mb()
+    if peak is not None:
+        print(f"Peak RSS: {peak[0]:.1f} MB")
     print(f"Saved embeddings to: {EMBEDDING_PATH}")
     print(f"Saved metadata to: {META_PATH}")
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Generate corpus embeddings")
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="re-encode only added/changed documents and update faiss.index in place"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=0,
+        help="full build on this many processes, length-sorted, written to a memmap "
+             "(default: one in-process encode)"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=BATCH_SIZE,
+        help=f"texts per model.encode batch (default: {BATCH_SIZE})"
+    )
+    args = parser.parse_args()
+
+    if args.workers and args.incremental:
+        parser.error("--workers applies to full builds only")
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+
+    start = time.perf_counter()
+
+    print("Loading embedding corpus...")
+    with open(INPUT_PATH, "r", encoding="utf-8") as f:
+        corpus = json.load(f)
+
+    loaded = {}
+
+    def model():
+        # Only load the model if something actually needs encoding
+        if "model" not in loaded:
+            print("Loading model...")
+            loaded["model"] = SentenceTransformer(MODEL_NAME)
+        return loaded["model"]
+
+    if args.incremental:
+        run_incremental(corpus, model, args.batch_size)
+    elif args.workers:
+        run_parallel(corpus, args.workers, args.batch_size)
+    else:
+        run_full(corpus, model, args.batch_size)
+
+    print(f"Done in {time.perf_counter() - start:.2f}s")
+
+
 if __name__ == "__main__":
     main()
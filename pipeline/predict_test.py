@@ -1,15 +1,21 @@
-import pandas as pd
+import csv
 import json
-import faiss
-from sentence_transformers import SentenceTransformer
-from urllib.parse import urlparse
+import time
+import hashlib
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+from pipeline.embedding_cache import encode_queries
+from pipeline.retriever import RecommenderEngine
 
 # ========================
 # CONFIG
 # ========================
 
 DATASET_PATH = r"data/given/Gen_AI Dataset.xlsx"
-OUTPUT_PATH = "submission_predictions.csv"
+OUTPUT_PATH = "submission_predictions_final.csv"
 
 FAISS_INDEX_PATH = "data/processed/faiss.index"
 CORPUS_PATH = "data/processed/embedding_corpus.json"
@@ -17,58 +23,156 @@ CORPUS_PATH = "data/processed/embedding_corpus.json"
 MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 TOP_K = 5
 
+CHUNK_SIZE = 256
+QUERY_COLUMN = "Query"
+
 
 # ========================
 # HELPERS
 # ========================
 
-def extract_slug(url):
-    if not isinstance(url, str):
-        return None
-    path = urlparse(url).path.strip("/")
-    return path.split("/")[-1]
+def iter_queries(path, sheet=1, column=QUERY_COLUMN):
+    """
+    Stream raw query strings from .xlsx (given sheet), .csv, .jsonl or
+    plain-text (one query per line) input without loading the whole file.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+
+    if suffix in {".xlsx", ".xlsm"}:
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True)
+        try:
+            rows = workbook.worksheets[sheet].iter_rows(values_only=True)
+            header = [str(c).strip() if c is not None else "" for c in next(rows)]
+            col = header.index(column)
+
+            for row in rows:
+                yield row[col] if col < len(row) else None
+        finally:
+            workbook.close()
+
+    elif suffix == ".csv":
+        for chunk in pd.read_csv(path, usecols=[column], chunksize=10_000):
+            yield from chunk[column].tolist()
+
+    elif suffix in {".jsonl", ".ndjson"}:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield record.get(column, record.get(column.lower()))
+
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                yield line
+
+
+def iter_unique_chunks(queries, chunk_size, stats):
+    """
+    Drop blanks and exact duplicates, yielding lists of up to chunk_size
+    queries. Only a 16-byte digest per unique query is kept in memory.
+    """
+    seen = set()
+    chunk = []
+
+    for query in queries:
+        if not isinstance(query, str) or not query.strip():
+            continue
+
+        query = query.strip()
+        stats["read"] += 1
+
+        digest = hashlib.blake2b(query.encode("utf-8"), digest_size=16).digest()
+        if digest in seen:
+            stats["duplicates"] += 1
+            continue
+
+        seen.add(digest)
+        chunk.append(query)
+
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
 
 
 # ========================
 # MAIN PREDICTION LOGIC
 # ========================
 
-def main():
-    print("Loading test queries...")
+def predict(input_path, output_path, sheet=1, chunk_size=CHUNK_SIZE, top_k=TOP_K, engine=None):
+    """
+    Encode unique queries chunk by chunk, search each chunk with one
+    index.search and stream (Query, Assessment_url) rows to output_path.
+    """
+    if engine is None:
+        engine = RecommenderEngine(
+            index_path=FAISS_INDEX_PATH,
+            corpus_path=CORPUS_PATH,
+            model_name=MODEL_NAME
+        )
+
+    stats = {"read": 0, "duplicates": 0, "written": 0, "rows": 0}
+    start = time.perf_counter()
 
-    # Load test queries
-    df = pd.read_excel(DATASET_PATH, sheet_name=1)
-    queries = df["Query"].dropna().tolist()
+    print(f"Streaming predictions from {input_path} -> {output_path}\n")
 
-    # Load FAISS + corpus
-    index = faiss.read_index(FAISS_INDEX_PATH)
+    with open(output_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(["Query", "Assessment_url"])
 
-    with open(CORPUS_PATH, "r", encoding="utf-8") as f:
-        corpus = json.load(f)
+        for chunk in iter_unique_chunks(iter_queries(input_path, sheet), chunk_size, stats):
+            # Bulk queries are mostly unique; skip the LRU cache
+            embeddings = encode_queries(engine.model, chunk)
 
-    model = SentenceTransformer(MODEL_NAME)
+            for query, hits in zip(chunk, engine.search_embeddings(embeddings, top_k)):
+                writer.writerows((query, hit.record["url"]) for hit in hits)
+                stats["rows"] += len(hits)
 
-    results = []
+            stats["written"] += len(chunk)
+            f.flush()
 
-    print(f"Generating predictions for {len(queries)} queries...\n")
+            elapsed = time.perf_counter() - start
+            print(
+                f"Processed {stats['read']} queries "
+                f"({stats['written']} unique, {stats['duplicates']} duplicates) "
+                f"| {stats['written'] / elapsed:.1f} queries/s"
+            )
 
-    for q in queries:
-        query_embedding = model.encode([q], normalize_embeddings=True)
-        scores, indices = index.search(query_embedding, TOP_K)
+    elapsed = time.perf_counter() - start
 
-        urls = []
-        for idx in indices[0]:
-            urls.append(corpus[idx]["url"])
+    print(f"\nSubmission file saved as: {output_path}")
+    print(f"Unique queries: {stats['written']} | Rows: {stats['rows']}")
+    print(f"Total time: {elapsed:.2f}s ({stats['written'] / max(elapsed, 1e-9):.1f} queries/s)")
 
-        results.append({
-            "Query": q,
-            "Recommended_Assessments": ", ".join(urls)
-        })
+    return stats
 
-    # Save submission file
-    pd.DataFrame(results).to_csv(OUTPUT_PATH, index=False)
 
-    print(f"Submission file saved as: {OUTPUT_PATH}")
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate long-format submission predictions")
+    parser.add_argument("--input", default=DATASET_PATH, help=".xlsx, .csv, .jsonl or .txt of queries")
+    parser.add_argument("--sheet", type=int, default=1, help="worksheet index for .xlsx input")
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    predict(
+        args.input,
+        args.output,
+        sheet=args.sheet,
+        chunk_size=args.chunk_size,
+        top_k=args.top_k
+    )
 
 
 if __name__ == "__main__":
@@ -1,19 +1,35 @@
 import json
+import hashlib
 from pathlib import Path
 
 INPUT_PATH = Path("data/processed/shl_catalogue.json")
 OUTPUT_PATH = Path("data/processed/embedding_corpus.json")
 
 
+def document_id(url):
+    """
+    Stable 63-bit id for an assessment, used as its FAISS id in ID-mapped
+    indexes so vectors survive corpus reordering.
+    """
+    digest = hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") & (2**63 - 1)
+
+
 def build_embedding_text(record):
+    def field(label, key, suffix=""):
+        value = record.get(key, "Not specified")
+        if not value or value == "Not specified":
+            return ""
+        return f"{label}: {value}{suffix}"
+
     parts = [
         record.get("name", ""),
         record.get("description", ""),
-        f"Job levels: {record.get('job_levels', 'Not specified')}",
-        f"Languages: {record.get('languages', 'Not specified')}",
-        f"Duration: {record.get('duration', 'Not specified')} minutes",
-        f"Remote support: {record.get('remote_support', 'Not specified')}",
-        f"Adaptive support: {record.get('adaptive_support', 'Not specified')}"
+        field("Job levels", "job_levels"),
+        field("Languages", "languages"),
+        field("Duration", "duration", " minutes"),
+        field("Remote support", "remote_support"),
+        field("Adaptive support", "adaptive_support")
     ]
     return ". ".join(p for p in parts if p and p != "Not specified")
 
@@ -0,0 +1,359 @@
+import re
+import gc
+import json
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# ========================
+# CONFIG
+# ========================
+
+CORPUS_PATH = Path("data/processed/embedding_corpus.json")
+LEXICAL_INDEX_PATH = Path("data/processed/bm25.npz")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Reciprocal rank fusion: score = sum(1 / (RRF_K + rank))
+RRF_K = 60
+
+# Candidates taken from each retriever before fusion
+FUSION_DEPTH = 50
+
+# Budget lexical search + RRF fusion must stay under together (see --benchmark)
+HYBRID_P99_BUDGET_MS = 1.0
+
+# A p99 needs a tail to read: every query is run untimed first, then the
+# queries are cycled until both minimums are reached
+BENCHMARK_WARMUP_ROUNDS = 5
+BENCHMARK_MIN_SAMPLES = 5000
+BENCHMARK_MIN_SECONDS = 1.0
+
+# Keeps "c++", "c#", ".net"-style skill names intact
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the
+this to was were will with who which we you your our their they them can
+not no yes specified
+""".split())
+
+
+def tokenize(text):
+    return [
+        token for token in TOKEN_PATTERN.findall(text.lower())
+        if token not in STOPWORDS
+    ]
+
+
+# ========================
+# BM25 INDEX
+# ========================
+
+class BM25Index:
+    """
+    BM25 over the embedding corpus as a CSR inverted index.
+
+    Postings for term t are doc_ids[offsets[t]:offsets[t + 1]] with the
+    matching precomputed BM25 weights (idf and length normalisation baked
+    in), so scoring a query is one gather of its terms' postings and one
+    bincount. The only dict is the term -> term id lookup.
+    """
+
+    def __init__(self, vocabulary, offsets, doc_ids, weights, n_docs):
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.n_docs = n_docs
+
+        self._term_ids = {term: i for i, term in enumerate(vocabulary)}
+
+    def __len__(self):
+        return self.n_docs
+
+    @classmethod
+    def build(cls, texts, k1=BM25_K1, b=BM25_B):
+        docs = [tokenize(text) for text in texts]
+        n_docs = len(docs)
+
+        lengths = np.array([len(tokens) for tokens in docs], dtype=np.float32)
+        avg_length = float(lengths.mean()) if n_docs else 0.0
+
+        # term -> ([doc ids], [term frequencies]), then flattened to CSR
+        postings = {}
+        for doc_id, tokens in enumerate(docs):
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+
+            for token, tf in counts.items():
+                ids, tfs = postings.setdefault(token, ([], []))
+                ids.append(doc_id)
+                tfs.append(tf)
+
+        vocabulary = sorted(postings)
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        doc_ids = []
+        weights = []
+
+        norm = k1 * (1 - b + b * lengths / max(avg_length, 1e-9))
+
+        for term_id, term in enumerate(vocabulary):
+            ids, tfs = postings[term]
+            ids = np.array(ids, dtype=np.int32)
+            tfs = np.array(tfs, dtype=np.float32)
+
+            df = len(ids)
+            idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+            doc_ids.append(ids)
+            weights.append(idf * tfs * (k1 + 1) / (tfs + norm[ids]))
+            offsets[term_id + 1] = offsets[term_id] + df
+
+        return cls(
+            np.array(vocabulary),
+            offsets,
+            np.concatenate(doc_ids) if doc_ids else np.zeros(0, dtype=np.int32),
+            np.concatenate(weights).astype(np.float32) if weights else np.zeros(0, dtype=np.float32),
+            n_docs,
+        )
+
+    def save(self, path=LEXICAL_INDEX_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # np.savez appends .npz to names that lack it
+        tmp_path = path.with_name(path.stem + ".tmp.npz")
+        np.savez(
+            tmp_path,
+            vocabulary=self.vocabulary,
+            offsets=self.offsets,
+            doc_ids=self.doc_ids,
+            weights=self.weights,
+            n_docs=np.array(self.n_docs),
+        )
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path=LEXICAL_INDEX_PATH):
+        with np.load(path) as data:
+            return cls(
+                data["vocabulary"],
+                data["offsets"],
+                data["doc_ids"],
+                data["weights"],
+                int(data["n_docs"]),
+            )
+
+    def scores(self, query, mask=None):
+        """
+        BM25 score of every document (0 where no query term occurs).
+        """
+        term_ids = [
+            self._term_ids[token] for token in set(tokenize(query))
+            if token in self._term_ids
+        ]
+        if not term_ids:
+            return np.zeros(self.n_docs, dtype=np.float32)
+
+        # Gather every query term's postings in one go: long job
+        # descriptions have hundreds of terms, too many for a loop of
+        # per-term slice adds
+        term_ids = np.array(term_ids, dtype=np.int64)
+        starts = self.offsets[term_ids]
+        lengths = self.offsets[term_ids + 1] - starts
+
+        ends = np.cumsum(lengths)
+        slots = np.arange(ends[-1]) + np.repeat(starts - (ends - lengths), lengths)
+
+        scores = np.bincount(
+            self.doc_ids[slots], self.weights[slots], minlength=self.n_docs
+        ).astype(np.float32)
+
+        if mask is not None:
+            scores *= mask
+
+        return scores
+
+    def search(self, query, top_k, mask=None):
+        """
+        Positions of the top_k matching documents, best first. Documents
+        without any query term are never returned.
+        """
+        scores = self.scores(query, mask)
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > top_k:
+            top = np.argpartition(-scores[matched], top_k - 1)[:top_k]
+            matched = matched[top]
+
+        order = np.argsort(-scores[matched], kind="stable")
+        return matched[order], scores[matched[order]]
+
+
+# ========================
+# FUSION
+# ========================
+
+def reciprocal_rank_fusion(rankings, k=RRF_K, top_k=None):
+    """
+    Fuse ranked lists of positions: each list contributes 1 / (k + rank)
+    to every position it contains. Returns [(position, score)], best first.
+    """
+    fused = {}
+
+    for ranking in rankings:
+        for rank, position in enumerate(ranking, start=1):
+            position = int(position)
+            fused[position] = fused.get(position, 0.0) + 1.0 / (k + rank)
+
+    ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+    return ranked[:top_k] if top_k is not None else ranked
+
+
+# ========================
+# BUILD / BENCHMARK
+# ========================
+
+def load_texts(path=CORPUS_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return [item["text"] for item in json.load(f)]
+
+
+def benchmark_queries():
+    """
+    Labeled dataset queries when available, else corpus assessment names.
+    """
+    try:
+        from pipeline.evaluate import load_labeled_data
+        return list(load_labeled_data())
+    except (ImportError, OSError, ValueError):
+        return [text.split(".")[0] for text in load_texts()]
+
+
+def benchmark(
+    index,
+    queries,
+    top_k=FUSION_DEPTH,
+    warmup=BENCHMARK_WARMUP_ROUNDS,
+    min_samples=BENCHMARK_MIN_SAMPLES,
+    min_seconds=BENCHMARK_MIN_SECONDS
+):
+    """
+    Per-query latency of tokenize + score + top-k, of RRF fusion of that
+    list with a dense list of the same depth, and of the two together
+    (what a hybrid request adds on top of the dense search). Queries are
+    cycled until at least `min_samples` calls and `min_seconds` are
+    sampled, after `warmup` untimed rounds. GC is paused while timing, as
+    timeit does, so a collection doesn't land in one query's sample.
+    """
+    lexical = []
+    fusion = []
+    hybrid = []
+    dense = np.arange(top_k)
+
+    for _ in range(warmup):
+        for query in queries:
+            positions, _ = index.search(query, top_k)
+            reciprocal_rank_fusion([dense, positions], top_k=top_k)
+
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        total = 0.0
+        while len(hybrid) < min_samples or total < min_seconds:
+            for query in queries:
+                start = time.perf_counter()
+                positions, _ = index.search(query, top_k)
+                searched = time.perf_counter()
+                reciprocal_rank_fusion([dense, positions], top_k=top_k)
+                fused = time.perf_counter()
+
+                lexical.append(searched - start)
+                fusion.append(fused - searched)
+                hybrid.append(fused - start)
+                total += fused - start
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    def summary(samples):
+        ms = np.array(samples) * 1000
+        return {
+            "p50_ms": round(float(np.percentile(ms, 50)), 4),
+            "p95_ms": round(float(np.percentile(ms, 95)), 4),
+            "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        }
+
+    return {
+        "lexical": summary(lexical),
+        "fusion": summary(fusion),
+        "hybrid": summary(hybrid),
+        "samples": len(hybrid),
+    }
+
+
+def run_benchmark(scales=(1, 10, 100)):
+    """
+    The budget applies to lexical search + fusion on the corpus actually
+    served (scale 1); larger scales replicate it to show how latency
+    grows with postings length.
+    """
+    texts = load_texts()
+    queries = benchmark_queries()
+    within_budget = True
+
+    print(
+        f"Benchmarking BM25 + RRF over {len(queries)} queries "
+        f"(p99 budget {HYBRID_P99_BUDGET_MS} ms)\n"
+    )
+
+    for scale in scales:
+        index = BM25Index.build(texts * scale)
+        result = benchmark(index, queries)
+
+        hybrid_p99 = result["hybrid"]["p99_ms"]
+        if scale == 1:
+            within_budget = hybrid_p99 < HYBRID_P99_BUDGET_MS
+
+        print(
+            f"{len(texts) * scale:>7} docs | "
+            f"lexical p50 {result['lexical']['p50_ms']:.4f} ms, "
+            f"p99 {result['lexical']['p99_ms']:.4f} ms | "
+            f"fusion p99 {result['fusion']['p99_ms']:.4f} ms | "
+            f"lexical + fusion p99 {hybrid_p99:.4f} ms "
+            f"({result['samples']} samples)"
+        )
+
+    print(f"\n{'✅' if within_budget else '❌'} Lexical + fusion p99 on the served corpus "
+          f"{'within' if within_budget else 'over'} {HYBRID_P99_BUDGET_MS} ms")
+    return within_budget
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the BM25 lexical index")
+    parser.add_argument(
+        "--benchmark", action="store_true",
+        help="report lexical search / fusion latency at 1x, 10x and 100x corpus size"
+    )
+    args = parser.parse_args()
+
+    if args.benchmark:
+        raise SystemExit(0 if run_benchmark() else 1)
+
+    start = time.perf_counter()
+    texts = load_texts()
+    index = BM25Index.build(texts)
+    index.save(LEXICAL_INDEX_PATH)
+
+    print(f"Indexed {index.n_docs} documents, {len(index.vocabulary)} terms, "
+          f"{len(index.doc_ids)} postings in {time.perf_counter() - start:.2f}s")
+    print(f"Saved to: {LEXICAL_INDEX_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,15 @@
-import faiss
-import json
-import numpy as np
-from sentence_transformers import SentenceTransformer
+import argparse
 from pathlib import Path
 
+from pipeline.retriever import RecommenderEngine
+
 # ========================
 # CONFIG
 # ========================
 
 INDEX_PATH = Path("data/processed/faiss.index")
-META_PATH = Path("data/processed/embedding_metadata.json")
 CORPUS_PATH = Path("data/processed/embedding_corpus.json")
+LEXICAL_INDEX_PATH = Path("data/processed/bm25.npz")
 
 MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 TOP_K = 5
@@ -20,39 +19,33 @@ TOP_K = 5
 # LOAD RESOURCES
 # ========================
 
-def load_resources():
-    index = faiss.read_index(str(INDEX_PATH))
-
-    with open(META_PATH, "r", encoding="utf-8") as f:
-        metadata = json.load(f)
-
-    with open(CORPUS_PATH, "r", encoding="utf-8") as f:
-        corpus = json.load(f)
-
-    model = SentenceTransformer(MODEL_NAME)
-
-    return index, metadata, corpus, model
+def load_resources(hybrid=False):
+    # The engine's embedding cache is shared across calls, so repeated
+    # queries skip the model. Hybrid mode also matches skill names
+    # ("Java", "SQL") lexically through the BM25 index.
+    return RecommenderEngine(
+        index_path=INDEX_PATH,
+        corpus_path=CORPUS_PATH,
+        model_name=MODEL_NAME,
+        lexical_path=LEXICAL_INDEX_PATH if hybrid else None
+    )
 
 
 # ========================
 # QUERY FUNCTION
 # ========================
 
-def recommend(query, index, metadata, corpus, model, top_k=TOP_K):
-    query_embedding = model.encode(
-        [query],
-        normalize_embeddings=True
-    )
-
-    scores, indices = index.search(query_embedding, top_k)
+def recommend(query, engine, top_k=TOP_K):
+    hits = engine.recommend(query, top_k)
 
     recommendations = []
 
-    for rank, idx in enumerate(indices[0]):
-        item = corpus[idx]
+    for rank, hit in enumerate(hits):
+        item = hit.record
         recommendations.append({
             "rank": rank + 1,
-            "similarity": round(float(scores[0][rank]), 4),
+            # Cosine similarity, or the RRF score in hybrid mode
+            "similarity": round(hit.score, 4),
             "url": item["url"],
             "text_preview": item["text"].split("Languages:")[0][:300] + "..."
         })
@@ -65,7 +58,14 @@ def recommend(query, index, metadata, corpus, model, top_k=TOP_K):
 # ========================
 
 def main():
-    index, metadata, corpus, model = load_resources()
+    parser = argparse.ArgumentParser(description="Interactive recommendation demo")
+    parser.add_argument(
+        "--hybrid", action="store_true",
+        help="fuse FAISS results with the BM25 index (python -m pipeline.preprocess)"
+    )
+    args = parser.parse_args()
+
+    engine = load_resources(hybrid=args.hybrid)
 
     print("\n🔎 SHL Assessment Recommendation Engine")
     print("Type a job requirement (or 'exit' to quit)\n")
@@ -80,7 +80,7 @@ def main():
             print("⚠️ Please enter a valid query.\n")
             continue
 
-        results = recommend(query, index, metadata, corpus, model)
+        results = recommend(query, engine)
 
 
         print("\nTop Recommendations:\n")
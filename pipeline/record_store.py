@@ -0,0 +1,250 @@
+import os
+import json
+import struct
+from pathlib import Path
+
+import numpy as np
+
+from pipeline.prepare_embeddings import document_id
+
+# ========================
+# CONFIG
+# ========================
+
+RECORDS_PATH = Path("data/processed/records.bin")
+
+MAGIC = b"SHLREC01"
+ALIGNMENT = 64
+
+# Text fields, stored back to back in one UTF-8 blob
+STRING_FIELDS = (
+    "url",
+    "name",
+    "description",
+    "text",
+    "job_levels",
+    "languages",
+    "test_type",
+)
+
+NOT_SPECIFIED = "Not specified"
+DEFAULT_TEST_TYPE = "Individual Test"
+
+# Flag columns: 1 = Yes, 0 = No, -1 = unknown
+FLAG_VALUES = {"yes": 1, "no": 0}
+FLAG_LABELS = {1: "Yes", 0: "No", -1: NOT_SPECIFIED}
+
+
+# ========================
+# COMPILE
+# ========================
+
+def parse_duration(value):
+    """
+    Minutes as an int, or -1 when the catalogue has no usable number.
+    """
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        return -1
+
+
+def parse_flag(value):
+    return FLAG_VALUES.get(str(value).strip().lower(), -1)
+
+
+def _pad(f):
+    padding = -f.tell() % ALIGNMENT
+    f.write(b"\0" * padding)
+
+
+def compile_records(corpus, catalogue, path=RECORDS_PATH):
+    """
+    Write the record store for `corpus` (embedding_corpus.json order, i.e.
+    index positions) with fields joined from `catalogue` by URL.
+
+    Layout: MAGIC, u64 header length, JSON header, then 64-byte aligned
+    columns. The header maps each column to its dtype, shape and offset.
+    """
+    by_url = {record["url"]: record for record in catalogue}
+    n = len(corpus)
+
+    blob = bytearray()
+    string_offsets = np.zeros((len(STRING_FIELDS), n + 1), dtype=np.uint64)
+
+    rows = []
+    for item in corpus:
+        record = by_url.get(item["url"], {})
+
+        # Empty = no scraped description; readers fall back to the
+        # embedding text (what the API used to return) without storing it twice
+        description = record.get("description") or ""
+        if description == NOT_SPECIFIED:
+            description = ""
+
+        rows.append({
+            "url": item["url"],
+            "name": record.get("name") or item["text"].split(".")[0],
+            "description": description,
+            "text": item["text"],
+            "job_levels": record.get("job_levels") or NOT_SPECIFIED,
+            "languages": record.get("languages") or NOT_SPECIFIED,
+            "test_type": record.get("test_type") or DEFAULT_TEST_TYPE,
+            "duration": parse_duration(record.get("duration", NOT_SPECIFIED)),
+            "remote": parse_flag(record.get("remote_support", NOT_SPECIFIED)),
+            "adaptive": parse_flag(record.get("adaptive_support", NOT_SPECIFIED)),
+        })
+
+    # Field-major so each field's strings are contiguous in the blob
+    for f, field in enumerate(STRING_FIELDS):
+        string_offsets[f, 0] = len(blob)
+        for i, row in enumerate(rows):
+            blob += row[field].encode("utf-8")
+            string_offsets[f, i + 1] = len(blob)
+
+    columns = {
+        "ids": np.array([document_id(row["url"]) for row in rows], dtype=np.int64),
+        "duration": np.array([row["duration"] for row in rows], dtype=np.int32),
+        "remote": np.array([row["remote"] for row in rows], dtype=np.int8),
+        "adaptive": np.array([row["adaptive"] for row in rows], dtype=np.int8),
+        "string_offsets": string_offsets,
+        "blob": np.frombuffer(bytes(blob), dtype=np.uint8),
+    }
+
+    # Offsets are relative to the start of the data section, so the
+    # header can be sized before they are known
+    header = {"count": n, "string_fields": list(STRING_FIELDS), "columns": {}}
+    offset = 0
+    for name, array in columns.items():
+        header["columns"][name] = {
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": offset,
+        }
+        offset += array.nbytes + (-array.nbytes % ALIGNMENT)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+
+    header_bytes = json.dumps(header).encode("utf-8")
+
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        _pad(f)
+
+        for array in columns.values():
+            f.write(array.tobytes())
+            _pad(f)
+
+    # Servers mmap this file; never let them see a partial write
+    os.replace(tmp_path, path)
+
+    return n
+
+
+# ========================
+# READ
+# ========================
+
+class RecordStore:
+    """
+    Read-only, memory-mapped view of records.bin.
+
+    Behaves like the list of corpus dicts it replaces: len(), iteration
+    and store[position] -> dict with "url", "text" and the catalogue
+    fields, so existing `hit.record[...]` callers keep working. Columns
+    are numpy views over the mapping; nothing is parsed or copied up
+    front, and every process shares the same page-cache pages.
+    """
+
+    def __init__(self, path=RECORDS_PATH):
+        self.path = Path(path)
+        self._mmap = np.memmap(self.path, dtype=np.uint8, mode="r")
+
+        if bytes(self._mmap[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{self.path} is not a record store")
+
+        (header_size,) = struct.unpack_from("<Q", self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        header = json.loads(
+            bytes(self._mmap[header_start:header_start + header_size])
+        )
+
+        data_start = header_start + header_size
+        data_start += -data_start % ALIGNMENT
+
+        self.count = header["count"]
+        self.string_fields = header["string_fields"]
+        self._field_slots = {
+            field: slot for slot, field in enumerate(self.string_fields)
+        }
+
+        columns = {}
+        for name, spec in header["columns"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"]))
+            start = data_start + spec["offset"]
+            columns[name] = np.frombuffer(
+                self._mmap, dtype=dtype, count=count, offset=start
+            ).reshape(spec["shape"])
+
+        self.ids = columns["ids"]
+        self.duration = columns["duration"]
+        self.remote = columns["remote"]
+        self.adaptive = columns["adaptive"]
+        self._offsets = columns["string_offsets"]
+        self._blob = columns["blob"]
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for position in range(self.count):
+            yield self[position]
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += self.count
+        if not 0 <= position < self.count:
+            raise IndexError(position)
+
+        record = {"id": position}
+        for field in self.string_fields:
+            record[field] = self.string(field, position)
+
+        if not record["description"]:
+            record["description"] = record["text"]
+
+        duration = int(self.duration[position])
+        record["duration"] = str(duration) if duration >= 0 else NOT_SPECIFIED
+        record["remote_support"] = FLAG_LABELS[int(self.remote[position])]
+        record["adaptive_support"] = FLAG_LABELS[int(self.adaptive[position])]
+
+        return record
+
+    def string(self, field, position):
+        offsets = self._offsets[self._field_slots[field]]
+        start, end = int(offsets[position]), int(offsets[position + 1])
+        return self._blob[start:end].tobytes().decode("utf-8")
+
+    def strings(self, field):
+        """
+        Every value of one text field, in position order.
+        """
+        return [self.string(field, position) for position in range(self.count)]
+
+
+def open_records(path):
+    """
+    Corpus records from a compiled store (.bin) or embedding_corpus.json.
+    """
+    path = Path(path)
+
+    if path.suffix == RECORDS_PATH.suffix:
+        return RecordStore(path)
+
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,623 @@
+import os
+import threading
+import time
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+from pipeline.embedding_cache import EmbeddingCache, encode_queries
+from pipeline.encoders import ENCODER_BACKEND, instrument_tokenizer, load_encoder
+from pipeline.filters import FilterIndex, search_parameters, selector_for
+from pipeline.index_config import (
+    apply_search_params,
+    build_index,
+    config_path_for,
+    load_index_config,
+)
+from pipeline.prepare_embeddings import document_id
+from pipeline.preprocess import FUSION_DEPTH, BM25Index, reciprocal_rank_fusion
+from pipeline.record_store import open_records
+
+# faiss, torch and sentence_transformers are imported on first use so that
+# importing this module (and the API app) stays cheap
+
+# ========================
+# CONFIG
+# ========================
+
+INDEX_PATH = Path("data/processed/faiss.index")
+CORPUS_PATH = Path("data/processed/embedding_corpus.json")
+LEXICAL_INDEX_PATH = Path("data/processed/bm25.npz")
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+TOP_K = 5
+
+# Memory-map the index file instead of reading it into RAM
+INDEX_MMAP = os.getenv("INDEX_MMAP", "1") == "1"
+
+WARMUP_QUERY = "warm-up query for the assessment recommendation engine"
+
+
+Hit = namedtuple("Hit", ["position", "score", "record"])
+
+
+# ========================
+# SNAPSHOT
+# ========================
+
+class IndexSnapshot:
+    """
+    An index and the corpus records it was built from. Snapshots are never
+    mutated; a reload builds a new one and swaps the engine's reference.
+    """
+
+    def __init__(self, index, corpus, source=None, lexical=None):
+        if index.ntotal != len(corpus):
+            raise ValueError(
+                f"Index has {index.ntotal} vectors but corpus has "
+                f"{len(corpus)} records"
+            )
+        if lexical is not None and len(lexical) != len(corpus):
+            raise ValueError(
+                f"BM25 index has {len(lexical)} documents but corpus has "
+                f"{len(corpus)} records"
+            )
+
+        self.index = index
+        self.corpus = corpus
+        self.source = source or {}
+
+        # Optional BM25 index over the same positions, for hybrid search
+        self.lexical = lexical
+        self.loaded_at = time.time()
+
+        # Metadata indexes for filtered search, built on first use
+        self._filter_index = None
+
+        # ID-mapped indexes (incremental builds) label vectors with
+        # document_id(url) instead of the corpus position
+        self._ids = None
+        self._sorted_ids = None
+        self._sorted_positions = None
+        if _is_id_mapped(index):
+            # A compiled record store carries the ids precomputed
+            ids = getattr(corpus, "ids", None)
+            if ids is None:
+                ids = np.array(
+                    [document_id(item["url"]) for item in corpus], dtype=np.int64
+                )
+            self._ids = np.asarray(ids, dtype=np.int64)
+            self._sorted_positions = np.argsort(ids)
+            self._sorted_ids = self._ids[self._sorted_positions]
+
+    def to_positions(self, labels):
+        """
+        Translate FAISS labels to corpus positions (-1 stays -1).
+        """
+        if self._sorted_ids is None:
+            return labels
+
+        slots = np.searchsorted(self._sorted_ids, labels)
+        slots = np.minimum(slots, len(self._sorted_ids) - 1)
+        found = (labels >= 0) & (self._sorted_ids[slots] == labels)
+
+        return np.where(found, self._sorted_positions[slots], -1)
+
+    @property
+    def filter_index(self):
+        if self._filter_index is None:
+            self._filter_index = FilterIndex(self.corpus)
+        return self._filter_index
+
+    def search(self, query_embeddings, top_k, filters=None):
+        """
+        index.search returning corpus positions instead of FAISS labels.
+        With `filters`, only matching records are considered.
+        """
+        query_embeddings = np.ascontiguousarray(query_embeddings, dtype=np.float32)
+
+        if filters is None:
+            scores, labels = self.index.search(query_embeddings, top_k)
+        else:
+            scores, labels = self._filtered_search(query_embeddings, top_k, filters)
+
+        return scores, self.to_positions(labels)
+
+    def _filtered_search(self, query_embeddings, top_k, filters):
+        """
+        Filter inside the index through an IDSelector, so each row still
+        gets the top-k among matching records in a single search call.
+        """
+        mask = self.filter_index.mask(filters)
+        allowed = int(mask.sum())
+
+        if allowed == 0:
+            shape = (len(query_embeddings), top_k)
+            return (
+                np.full(shape, -np.inf, dtype=np.float32),
+                np.full(shape, -1, dtype=np.int64),
+            )
+
+        selector, keep_alive = selector_for(mask, self._ids)
+
+        scores, labels = self.index.search(
+            query_embeddings, top_k,
+            params=search_parameters(self.index, selector)
+        )
+
+        # HNSW / IVF can run out of candidates under a selective filter;
+        # redo those rows with an exhaustive probe
+        short = (labels >= 0).sum(axis=1) < min(top_k, allowed)
+        if short.any():
+            scores[short], labels[short] = self.index.search(
+                query_embeddings[short], top_k,
+                params=search_parameters(self.index, selector, exhaustive=True)
+            )
+
+        del keep_alive
+        return scores, labels
+
+    @classmethod
+    def from_files(
+        cls, index_path, corpus_path, lexical_path=None, mmap=INDEX_MMAP, timed=None
+    ):
+        timed = timed or _untimed
+
+        with timed("import_faiss"):
+            import faiss  # noqa: F401
+
+        config_path = config_path_for(index_path)
+
+        with timed("read_index"):
+            index = read_index(index_path, mmap=mmap)
+            # efSearch / nprobe chosen when the index was built
+            apply_search_params(index, load_index_config(config_path))
+
+        with timed("load_corpus"):
+            corpus = load_corpus(corpus_path)
+
+        lexical = load_lexical(lexical_path, timed)
+
+        sources = [index_path, corpus_path]
+        if config_path.exists():
+            sources.append(config_path)
+        if lexical is not None:
+            sources.append(lexical_path)
+
+        return cls(index, corpus, source=_file_versions(*sources), lexical=lexical)
+
+    @classmethod
+    def from_embeddings(
+        cls, embeddings_path, corpus_path, lexical_path=None, timed=None
+    ):
+        timed = timed or _untimed
+
+        with timed("import_faiss"):
+            import faiss  # noqa: F401
+
+        with timed("build_index"):
+            embeddings = np.load(embeddings_path)
+            config = load_index_config(config_path_for(embeddings_path))
+            index, _ = build_index(embeddings, config)
+
+        with timed("load_corpus"):
+            corpus = load_corpus(corpus_path)
+
+        lexical = load_lexical(lexical_path, timed)
+
+        sources = [embeddings_path, corpus_path]
+        if lexical is not None:
+            sources.append(lexical_path)
+
+        return cls(
+            index, corpus, source=_file_versions(*sources), lexical=lexical
+        )
+
+
+# ========================
+# HELPERS
+# ========================
+
+def read_index(index_path, mmap=INDEX_MMAP):
+    """
+    Read a FAISS index, memory-mapped when possible so pages are loaded on
+    demand (and shared between processes) instead of copied up front.
+
+    IO_FLAG_MMAP_IFC maps the vector codes of flat storage (IndexFlat*,
+    and the storage under HNSW / IDMap); plain IO_FLAG_MMAP only maps
+    on-disk IVF lists and still copies flat codes into every process.
+    """
+    import faiss
+
+    if mmap:
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+        try:
+            return faiss.read_index(
+                str(index_path), flags | faiss.IO_FLAG_READ_ONLY
+            )
+        except RuntimeError:
+            # Index type without mmap support
+            pass
+
+    return faiss.read_index(str(index_path))
+
+
+def _is_id_mapped(index):
+    import faiss
+
+    return isinstance(
+        faiss.downcast_index(index), (faiss.IndexIDMap, faiss.IndexIDMap2)
+    )
+
+
+def load_corpus(corpus_path):
+    """
+    records.bin (memory-mapped RecordStore) or embedding_corpus.json.
+    """
+    return open_records(corpus_path)
+
+
+def load_lexical(lexical_path, timed=None):
+    """
+    The BM25 index from pipeline/preprocess.py, or None when hybrid search
+    is off (no path) or the index hasn't been built.
+    """
+    if lexical_path is None or not Path(lexical_path).exists():
+        return None
+
+    with (timed or _untimed)("load_lexical"):
+        return BM25Index.load(lexical_path)
+
+
+def load_model(model_name, timed=None, backend="fp32"):
+    """
+    Query encoder for `backend` (see pipeline/encoders.py); fp32 is the
+    plain SentenceTransformer.
+    """
+    timed = timed or _untimed
+
+    if backend in ("fp32", "int8"):
+        with timed("import_sentence_transformers"):
+            import sentence_transformers  # noqa: F401
+
+    with timed("load_model"):
+        return load_encoder(model_name, backend)
+
+
+@contextmanager
+def _untimed(phase):
+    yield
+
+
+def _file_versions(*paths):
+    return {
+        str(path): os.stat(path).st_mtime_ns
+        for path in paths
+    }
+
+
+# ========================
+# ENGINE
+# ========================
+
+class RecommenderEngine:
+    """
+    Owns the query encoder, FAISS index and corpus records, and exposes
+    batched search over them.
+
+    Searches read the current snapshot once per call, so a reload that
+    lands mid-request never mixes the old index with the new corpus.
+
+    With a `lexical_path` (hybrid search), dense candidates are fused with
+    BM25 candidates by reciprocal rank fusion; hit scores are then RRF
+    scores rather than cosine similarities.
+    """
+
+    def __init__(
+        self,
+        index_path=INDEX_PATH,
+        corpus_path=CORPUS_PATH,
+        model_name=MODEL_NAME,
+        embeddings_path=None,
+        lexical_path=None,
+        encoder_backend=ENCODER_BACKEND,
+        model=None,
+        cache=None,
+        store=None,
+        lazy=False,
+    ):
+        self.index_path = Path(index_path)
+        self.corpus_path = Path(corpus_path)
+        self.embeddings_path = Path(embeddings_path) if embeddings_path else None
+        self.lexical_path = Path(lexical_path) if lexical_path else None
+        self.model_name = model_name
+        self.encoder_backend = encoder_backend
+
+        self._model = model
+        self.cache = cache if cache is not None else EmbeddingCache()
+        self.store = store
+
+        # Per-phase startup timings in seconds
+        self.timings = {}
+
+        # Optional observer(stage, seconds, count) for per-request stage
+        # latencies (encode, tokenize, search), e.g. api.metrics
+        self.stage_observer = None
+        self.ready = threading.Event()
+
+        self._load_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+
+        # Searches may run on several batcher workers at once
+        self._tokenize_lock = threading.Lock()
+        self._reloader = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="index-reload"
+        )
+        self._watcher = None
+        self._watching = threading.Event()
+
+        self.reloads = 0
+        self._snapshot = None
+
+        if not lazy:
+            self.load_index()
+            self.model
+
+    # ------------------------
+    # Loading
+    # ------------------------
+
+    @contextmanager
+    def _timed(self, phase):
+        start = time.perf_counter()
+        yield
+        self.timings[phase] = time.perf_counter() - start
+        print(f"⏱️ {phase}: {self.timings[phase]:.3f}s")
+
+    def _load_snapshot(self, timed=None):
+        if self.embeddings_path is not None:
+            return IndexSnapshot.from_embeddings(
+                self.embeddings_path, self.corpus_path, self.lexical_path,
+                timed=timed
+            )
+
+        return IndexSnapshot.from_files(
+            self.index_path, self.corpus_path, self.lexical_path, timed=timed
+        )
+
+    def _observe(self, stage, seconds, count=1):
+        if self.stage_observer is not None:
+            self.stage_observer(stage, seconds, count)
+
+    @contextmanager
+    def _stage(self, stage, count=1):
+        start = time.perf_counter()
+        yield
+        self._observe(stage, time.perf_counter() - start, count)
+
+    def load_index(self):
+        with self._load_lock:
+            if self._snapshot is None:
+                self._snapshot = self._load_snapshot(timed=self._timed)
+        return self._snapshot
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    self._model = instrument_tokenizer(
+                        load_model(
+                            self.model_name, timed=self._timed,
+                            backend=self.encoder_backend
+                        ),
+                        lambda seconds, count: self._observe("tokenize", seconds, count),
+                        lock=self._tokenize_lock
+                    )
+        return self._model
+
+    def warm_up(self):
+        """
+        Load everything and run one encode + search so the first real
+        request doesn't pay for lazy initialisation. Sets `ready`.
+        """
+        self.load_index()
+        self.model
+
+        with self._timed("warmup_encode"):
+            embedding = encode_queries(self.model, [WARMUP_QUERY])
+            self.search_embeddings(embedding, TOP_K, queries=[WARMUP_QUERY])
+
+        self.timings["total"] = sum(
+            seconds for phase, seconds in self.timings.items()
+            if phase != "total"
+        )
+        self.ready.set()
+        return self.timings
+
+    @property
+    def snapshot(self):
+        if self._snapshot is None:
+            return self.load_index()
+        return self._snapshot
+
+    @property
+    def corpus(self):
+        return self.snapshot.corpus
+
+    @property
+    def index(self):
+        return self.snapshot.index
+
+    def reload(self):
+        """
+        Load the index and corpus from disk and swap them in atomically.
+        In-flight searches finish against the snapshot they started with.
+        """
+        with self._reload_lock:
+            snapshot = self._load_snapshot()
+            self._snapshot = snapshot
+            self.reloads += 1
+
+        print(
+            f"🔄 Reloaded index ({snapshot.index.ntotal} vectors, "
+            f"{len(snapshot.corpus)} records)"
+        )
+        return snapshot
+
+    def reload_in_background(self):
+        """
+        Schedule a reload on the engine's reload thread; returns a Future.
+        """
+        return self._reloader.submit(self.reload)
+
+    def is_stale(self):
+        """
+        True if any source file changed since the current snapshot loaded.
+        """
+        if self._snapshot is None:
+            return False
+
+        try:
+            return _file_versions(*self._snapshot.source) != self._snapshot.source
+        except FileNotFoundError:
+            # Mid-rewrite by the index builder; check again later
+            return False
+
+    def start_watcher(self, interval=30.0):
+        """
+        Poll the source files and reload when they change.
+        """
+        if self._watcher is not None:
+            return
+
+        self._watching.set()
+
+        def watch():
+            while self._watching.is_set():
+                time.sleep(interval)
+                if self.is_stale():
+                    try:
+                        self.reload()
+                    except Exception as exc:
+                        # Keep serving the current snapshot
+                        print(f"⚠️ Index reload failed: {exc}")
+
+        self._watcher = threading.Thread(
+            target=watch, name="index-watcher", daemon=True
+        )
+        self._watcher.start()
+
+    def close(self):
+        self._watching.clear()
+        self._reloader.shutdown(wait=False)
+
+    # ------------------------
+    # Search
+    # ------------------------
+
+    def encode(self, queries, use_cache=True):
+        if not use_cache:
+            return encode_queries(self.model, queries)
+        return encode_queries(self.model, queries, self.cache, self.store)
+
+    def search_embeddings(self, query_embeddings, top_k=TOP_K, filters=None, queries=None):
+        """
+        `filters` is None or one Filters (or None) per query row; rows
+        sharing the same filters are searched together. Passing the query
+        `queries` text enables BM25 fusion when the snapshot has a
+        lexical index.
+        """
+        snapshot = self.snapshot
+
+        if queries is not None and snapshot.lexical is not None:
+            return self._hybrid_search(
+                snapshot, queries, query_embeddings, top_k, filters
+            )
+
+        scores, indices = self._dense_search(
+            snapshot, query_embeddings, top_k, filters
+        )
+
+        results = []
+        for row_scores, row_indices in zip(scores, indices):
+            results.append([
+                Hit(int(idx), float(score), snapshot.corpus[idx])
+                for score, idx in zip(row_scores, row_indices)
+                if idx >= 0
+            ])
+
+        return results
+
+    def _dense_search(self, snapshot, query_embeddings, top_k, filters):
+        if filters is None or all(f is None for f in filters):
+            return snapshot.search(query_embeddings, top_k)
+
+        groups = defaultdict(list)
+        for row, row_filters in enumerate(filters):
+            groups[row_filters].append(row)
+
+        scores = np.empty((len(query_embeddings), top_k), dtype=np.float32)
+        indices = np.empty((len(query_embeddings), top_k), dtype=np.int64)
+
+        for group_filters, rows in groups.items():
+            scores[rows], indices[rows] = snapshot.search(
+                query_embeddings[rows], top_k, group_filters
+            )
+
+        return scores, indices
+
+    def _hybrid_search(self, snapshot, queries, query_embeddings, top_k, filters):
+        """
+        Top FUSION_DEPTH candidates from FAISS and from BM25 (under the
+        same filters), fused with reciprocal rank fusion.
+        """
+        depth = max(top_k, FUSION_DEPTH)
+        _, indices = self._dense_search(snapshot, query_embeddings, depth, filters)
+
+        masks = {None: None}
+        results = []
+
+        for row, query in enumerate(queries):
+            row_filters = filters[row] if filters is not None else None
+            if row_filters not in masks:
+                masks[row_filters] = snapshot.filter_index.mask(row_filters)
+
+            dense = indices[row][indices[row] >= 0]
+            lexical, _ = snapshot.lexical.search(query, depth, masks[row_filters])
+
+            results.append([
+                Hit(position, score, snapshot.corpus[position])
+                for position, score in reciprocal_rank_fusion(
+                    [dense, lexical], top_k=top_k
+                )
+            ])
+
+        return results
+
+    def search(self, queries, top_k=TOP_K, filters=None, use_cache=True):
+        """
+        Batched search: one encode and one index.search for all queries
+        (one per distinct filter set when `filters` is given per query).
+        `use_cache=False` skips the query-embedding caches, for one-off
+        bulk queries that would only evict the hot ones.
+        """
+        if not queries:
+            return []
+
+        # Stage times are per batch; count them once per query in it
+        with self._stage("encode", len(queries)):
+            embeddings = self.encode(queries, use_cache)
+
+        with self._stage("search", len(queries)):
+            return self.search_embeddings(
+                embeddings, top_k, filters, queries=queries
+            )
+
+    def recommend(self, query, top_k=TOP_K, filters=None):
+        return self.search(
+            [query], top_k, None if filters is None else [filters]
+        )[0]
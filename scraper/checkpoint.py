@@ -0,0 +1,72 @@
+import os
+import json
+import threading
+from pathlib import Path
+
+
+# ========================
+# JSONL CHECKPOINT
+# ========================
+
+class JsonlCheckpoint:
+    """
+    Append-only JSONL file of scraped records, one per line, so an
+    interrupted run can resume without refetching finished pages.
+    append() may be called from several threads.
+    """
+
+    def __init__(self, path, key="url"):
+        self.path = Path(path)
+        self.key = key
+        self._file = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Records written so far, keyed by `key`. A torn last line from a
+        crash is ignored.
+        """
+        records = {}
+
+        if not self.path.exists():
+            return records
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[record[self.key]] = record
+
+        return records
+
+    def append(self, record):
+        with self._lock:
+            self._append(record)
+
+    def _append(self, record):
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+
+            # Terminate a torn line so it doesn't swallow this record
+            if self._file.tell() > 0:
+                with open(self.path, "rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        self._file.write("\n")
+
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def clear(self):
+        self.close()
+        if self.path.exists():
+            os.remove(self.path)
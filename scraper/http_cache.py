@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+
+# ========================
+# CONFIG
+# ========================
+
+CACHE_DIR = Path("data/raw/http_cache")
+
+
+# ========================
+# HTTP CACHE
+# ========================
+
+class HttpCache:
+    """
+    On-disk response cache keyed by URL.
+
+    Each entry keeps the body plus its ETag / Last-Modified validators so
+    the next fetch can be a conditional GET. Callers may also attach data
+    derived from the body (e.g. the parsed record), tagged with a version,
+    so a 304 can skip parsing entirely.
+    """
+
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        # Shared by crawler threads; counters are only changed under the lock
+        self._lock = threading.Lock()
+        self.not_modified = 0
+        self.fetched = 0
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        folder = self.directory / key[:2]
+        return folder / f"{key}.json", folder / f"{key}.html"
+
+    def _write(self, path, text):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + f".{os.getpid()}.tmp")
+
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+        os.replace(tmp_path, path)
+
+    def entry(self, url):
+        meta_path, _ = self._paths(url)
+
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def body(self, url):
+        _, body_path = self._paths(url)
+
+        try:
+            with open(body_path, "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def conditional_headers(self, url):
+        entry = self.entry(url)
+        if entry is None:
+            return {}
+
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        return headers
+
+    def store(self, url, body, headers):
+        meta_path, body_path = self._paths(url)
+
+        self._write(body_path, body)
+        self._write(meta_path, json.dumps({
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+        }))
+
+        with self._lock:
+            self.fetched += 1
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def get_parsed(self, url, version):
+        entry = self.entry(url)
+
+        if entry and entry.get("parsed_version") == version:
+            return entry.get("parsed")
+
+        return None
+
+    def set_parsed(self, url, version, data):
+        entry = self.entry(url)
+        if entry is None:
+            return
+
+        entry["parsed_version"] = version
+        entry["parsed"] = data
+
+        meta_path, _ = self._paths(url)
+        self._write(meta_path, json.dumps(entry))
+
+    def stats(self):
+        return {"fetched": self.fetched, "not_modified": self.not_modified}
+
+
+# ========================
+# SYNC FETCH
+# ========================
+
+def cached_get(http, url, cache, timeout=30):
+    """
+    Conditional GET through `cache` with a requests.Session.
+
+    Returns (html, not_modified). On 304 the cached body is returned and
+    not_modified is True. Raises requests exceptions like session.get.
+    """
+    response = http.get(
+        url, timeout=timeout, headers=cache.conditional_headers(url)
+    )
+
+    if response.status_code == 304:
+        body = cache.body(url)
+        if body is not None:
+            cache.record_not_modified()
+            return body, True
+
+        # Validators without a body: refetch unconditionally
+        response = http.get(url, timeout=timeout)
+
+    response.raise_for_status()
+    cache.store(url, response.text, response.headers)
+
+    return response.text, False
@@ -2,7 +2,13 @@ import requests
 from bs4 import BeautifulSoup
 import json
 import time
-from urllib.parse import urljoin
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse, parse_qs
+
+from scraper.checkpoint import JsonlCheckpoint
+from scraper.http_cache import HttpCache, cached_get
 
 # ========================
 # CONFIGURATION
@@ -11,6 +17,10 @@ from urllib.parse import urljoin
 BASE_URL = "https://www.shl.com"
 CATALOG_URL = "https://www.shl.com/products/product-catalog/"
 OUTPUT_PATH = "data/raw/assessment_links.json"
+CHECKPOINT_PATH = "data/raw/assessment_links.checkpoint.jsonl"
+
+# Bump when the link / pagination extraction changes
+PARSER_VERSION = 1
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (compatible; SHLAssessmentBot/1.0)"
@@ -23,6 +33,15 @@ PAGE_SIZE = 24
 MAX_EMPTY_PAGES = 2
 REQUEST_DELAY = 1.5
 
+# Parallel crawl
+MAX_FAILED_PAGES = 3     # consecutive failed pages before giving up on a filter
+MAX_PAGES_PER_FILTER = 100
+
+# Requests / second to the catalog host, shared by all crawler threads:
+# the serial crawl's pace, so more workers add overlap, not load
+CRAWL_RATE = 1 / REQUEST_DELAY
+CRAWL_BURST = 1
+
 session = requests.Session()
 session.headers.update(HEADERS)
 
@@ -31,10 +50,43 @@ session.headers.update(HEADERS)
 # HELPERS
 # ========================
 
-def fetch_page(url, retries=3):
+class RateLimiter:
+    """
+    Thread-safe token bucket for one host: `rate` requests/second in
+    total across every thread sharing it, up to `burst` at once.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        # Waiters queue on the lock, so tokens go out one at a time
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                time.sleep((1 - self.tokens) / self.rate)
+
+
+def fetch_page(url, retries=3, http=None, limiter=None):
+    http = http or session
     for attempt in range(retries):
+        if limiter is not None:
+            limiter.acquire()
         try:
-            response = session.get(url, timeout=30)
+            response = http.get(url, timeout=30)
             response.raise_for_status()
             return BeautifulSoup(response.text, "html.parser")
         except requests.exceptions.RequestException:
@@ -53,13 +105,111 @@ def is_valid_assessment_link(href: str) -> bool:
     )
 
 
+def extract_assessment_links(soup):
+    return {
+        urljoin(BASE_URL, a["href"])
+        for a in soup.find_all("a", href=True)
+        if is_valid_assessment_link(a["href"])
+    }
+
+
+def last_page_start(soup, type_id):
+    """
+    Largest `start` offset linked from the pagination of a catalog page for
+    this type filter, or None if the page has no pagination links.
+    """
+    starts = []
+
+    for a in soup.find_all("a", href=True):
+        query = parse_qs(urlparse(a["href"]).query)
+
+        if "start" not in query:
+            continue
+        if query.get("type", [str(type_id)])[0] != str(type_id):
+            continue
+
+        try:
+            starts.append(int(query["start"][0]))
+        except ValueError:
+            continue
+
+    return max(starts) if starts else None
+
+
+def page_record(url, soup, type_id):
+    return {
+        "url": url,
+        "links": sorted(extract_assessment_links(soup)),
+        "last_start": last_page_start(soup, type_id),
+    }
+
+
+def fetch_catalog_page(url, type_id, http=None, cache=None, retries=3, limiter=None):
+    """
+    (record, not_modified) for one catalog page: its links and last
+    pagination offset, or None if it couldn't be fetched. With a cache,
+    an unchanged page (304) reuses the record extracted last time instead
+    of being parsed again. not_modified is per call, so callers sharing a
+    cache across threads can tell their own 304s apart. Every attempt
+    first takes a token from `limiter`, if given.
+    """
+    if cache is None:
+        soup = fetch_page(url, retries=retries, http=http, limiter=limiter)
+        return (page_record(url, soup, type_id) if soup is not None else None), False
+
+    http = http or session
+    for attempt in range(retries):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            html, not_modified = cached_get(http, url, cache)
+            break
+        except requests.exceptions.RequestException:
+            time.sleep(2)
+    else:
+        return None, False
+
+    if not_modified:
+        record = cache.get_parsed(url, PARSER_VERSION)
+        if record is not None:
+            return record, True
+
+    record = page_record(url, BeautifulSoup(html, "html.parser"), type_id)
+    cache.set_parsed(url, PARSER_VERSION, record)
+
+    return record, not_modified
+
+
+def load_checkpoint(fresh):
+    checkpoint = JsonlCheckpoint(CHECKPOINT_PATH)
+    if fresh:
+        checkpoint.clear()
+
+    done = checkpoint.load()
+    if done:
+        print(f"Resuming: {len(done)} catalog pages already checkpointed")
+
+    return checkpoint, done
+
+
+def save_links(collected_links, checkpoint):
+    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
+        json.dump(sorted(collected_links), f, indent=2)
+
+    # Crawl finished; the next run relies on the HTTP cache instead
+    checkpoint.clear()
+
+
 # ========================
 # MAIN CRAWLER
 # ========================
 
-def scrape_assessment_links():
+def scrape_assessment_links(use_cache=True, fresh=False):
     collected_links = set()
 
+    cache = HttpCache() if use_cache else None
+    checkpoint, done = load_checkpoint(fresh)
+
     for type_id in TYPE_FILTERS:
         print(f"\n=== Scraping catalog TYPE={type_id} ===")
 
@@ -70,22 +220,24 @@ def scrape_assessment_links():
             url = f"{CATALOG_URL}?type={type_id}&start={start}"
             print(f"Fetching: {url}")
 
-            soup = fetch_page(url)
-            if soup is None:
-                print("⚠️ Page skipped due to repeated failures.")
-                start += PAGE_SIZE
-                continue
+            page = done.get(url)
+            fetched = page is None
+            not_modified = False
 
-            new_links = 0
+            if fetched:
+                page, not_modified = fetch_catalog_page(url, type_id, cache=cache)
+                if page is None:
+                    print("⚠️ Page skipped due to repeated failures.")
+                    start += PAGE_SIZE
+                    continue
+                checkpoint.append(page)
 
-            for a in soup.find_all("a", href=True):
-                href = a["href"]
+            new_links = 0
 
-                if is_valid_assessment_link(href):
-                    full_url = urljoin(BASE_URL, href)
-                    if full_url not in collected_links:
-                        collected_links.add(full_url)
-                        new_links += 1
+            for full_url in page["links"]:
+                if full_url not in collected_links:
+                    collected_links.add(full_url)
+                    new_links += 1
 
             print(f"New assessments found: {new_links}")
             print(f"Total collected so far: {len(collected_links)}")
@@ -99,15 +251,182 @@ def scrape_assessment_links():
                 empty_pages = 0
 
             start += PAGE_SIZE
-            time.sleep(REQUEST_DELAY)
+
+            # Checkpointed pages and 304s cost nothing; only pace real fetches
+            if fetched and not not_modified:
+                time.sleep(REQUEST_DELAY)
 
     # Save results
-    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
-        json.dump(sorted(collected_links), f, indent=2)
+    save_links(collected_links, checkpoint)
 
+    if cache is not None:
+        print(f"HTTP cache: {cache.stats()}")
 
     print(f"Total Individual Test Solutions collected: {len(collected_links)}")
 
 
+# ========================
+# PARALLEL CRAWLER
+# ========================
+
+def crawl_type_filter(
+    type_id, collected_links, lock, cache=None, checkpoint=None, done=None, limiter=None
+):
+    """
+    Page through one type filter until its last page. The last page is
+    read from the pagination links rather than probed with empty pages;
+    a page with no assessment links at all also ends the filter. Pages in
+    `done` (a loaded checkpoint) are reused without a request.
+
+    Requests are paced by `limiter`; pass the same RateLimiter to every
+    filter crawled at once so they share one rate to the host. Without
+    one, this filter alone is paced at CRAWL_RATE.
+    """
+    done = done or {}
+    limiter = limiter or RateLimiter(CRAWL_RATE, CRAWL_BURST)
+
+    http = requests.Session()
+    http.headers.update(HEADERS)
+
+    stats = {
+        "type": type_id,
+        "pages": 0,
+        "failed_pages": 0,
+        "links_seen": 0,
+        "new_links": 0,
+    }
+
+    start = 0
+    last_start = None
+    failures = 0
+    started = time.perf_counter()
+
+    while stats["pages"] < MAX_PAGES_PER_FILTER:
+        url = f"{CATALOG_URL}?type={type_id}&start={start}"
+
+        page = done.get(url)
+
+        if page is None:
+            page, _ = fetch_catalog_page(
+                url, type_id, http=http, cache=cache, limiter=limiter
+            )
+            if page is not None and checkpoint is not None:
+                checkpoint.append(page)
+
+        if page is None:
+            stats["failed_pages"] += 1
+            failures += 1
+            print(f"⚠️ [type={type_id}] Failed: {url}")
+
+            if failures >= MAX_FAILED_PAGES:
+                print(f"⚠️ [type={type_id}] Giving up after {failures} failed pages")
+                break
+
+            if last_start is not None and start >= last_start:
+                break
+
+            start += PAGE_SIZE
+            continue
+
+        failures = 0
+        stats["pages"] += 1
+
+        links = set(page["links"])
+
+        with lock:
+            new_links = links - collected_links
+            collected_links.update(new_links)
+
+        stats["links_seen"] += len(links)
+        stats["new_links"] += len(new_links)
+
+        print(f"[type={type_id}] start={start}: {len(links)} links, {len(new_links)} new")
+
+        if page["last_start"] is not None:
+            last_start = max(last_start or 0, page["last_start"])
+
+        if not links or (last_start is not None and start >= last_start):
+            break
+
+        start += PAGE_SIZE
+
+    elapsed = time.perf_counter() - started
+    stats["seconds"] = round(elapsed, 2)
+    stats["pages_per_second"] = round(stats["pages"] / elapsed, 2) if elapsed else 0.0
+    stats["duplicate_ratio"] = (
+        round(1 - stats["new_links"] / stats["links_seen"], 3)
+        if stats["links_seen"] else 0.0
+    )
+
+    return stats
+
+
+def scrape_assessment_links_parallel(workers=len(TYPE_FILTERS), use_cache=True, fresh=False):
+    collected_links = set()
+    lock = threading.Lock()
+
+    cache = HttpCache() if use_cache else None
+    checkpoint, done = load_checkpoint(fresh)
+
+    # One rate to the host for all threads
+    limiter = RateLimiter(CRAWL_RATE, CRAWL_BURST)
+
+    started = time.perf_counter()
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            all_stats = list(pool.map(
+                lambda type_id: crawl_type_filter(
+                    type_id, collected_links, lock, cache, checkpoint, done, limiter
+                ),
+                TYPE_FILTERS
+            ))
+    finally:
+        checkpoint.close()
+
+    elapsed = time.perf_counter() - started
+
+    save_links(collected_links, checkpoint)
+
+    print("\n=== Crawl report ===")
+    for stats in all_stats:
+        print(
+            f"type={stats['type']}: {stats['pages']} pages "
+            f"({stats['failed_pages']} failed) in {stats['seconds']}s | "
+            f"{stats['pages_per_second']} pages/s | "
+            f"{stats['links_seen']} links, {stats['new_links']} new | "
+            f"duplicate ratio {stats['duplicate_ratio']:.1%}"
+        )
+
+    total_pages = sum(stats["pages"] for stats in all_stats)
+    print(f"\nTotal: {total_pages} pages in {elapsed:.1f}s ({total_pages / elapsed:.2f} pages/s)")
+    if cache is not None:
+        print(f"HTTP cache: {cache.stats()}")
+    print(f"Total Individual Test Solutions collected: {len(collected_links)}")
+
+    return all_stats
+
+
 if __name__ == "__main__":
-    scrape_assessment_links()
+    parser = argparse.ArgumentParser(description="Crawl SHL catalog assessment links")
+    parser.add_argument(
+        "--parallel", action="store_true",
+        help="crawl all type filters concurrently"
+    )
+    parser.add_argument("--workers", type=int, default=len(TYPE_FILTERS))
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="don't use the on-disk HTTP cache / conditional GETs"
+    )
+    parser.add_argument(
+        "--fresh", action="store_true",
+        help="discard the checkpoint of an interrupted run"
+    )
+    args = parser.parse_args()
+
+    if args.parallel:
+        scrape_assessment_links_parallel(
+            args.workers, use_cache=not args.no_cache, fresh=args.fresh
+        )
+    else:
+        scrape_assessment_links(use_cache=not args.no_cache, fresh=args.fresh)
@@ -1,8 +1,24 @@
+import re
 import json
 import time
+import random
+import asyncio
+import argparse
+import aiohttp
 import requests
 from bs4 import BeautifulSoup
 from pathlib import Path
+from urllib.parse import urlparse
+from concurrent.futures import ProcessPoolExecutor
+
+from scraper.checkpoint import JsonlCheckpoint
+from scraper.http_cache import CACHE_DIR, HttpCache, cached_get
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:  # pure-Python fallback, several times slower
+    HTML_PARSER = "html.parser"
 
 # ========================
 # CONFIG
@@ -14,11 +30,24 @@ HEADERS = {
 
 INPUT_PATH = Path("data/raw/assessment_links.json")
 OUTPUT_PATH = Path("data/processed/shl_catalogue.json")
+CHECKPOINT_PATH = Path("data/raw/shl_catalogue.checkpoint.jsonl")
+
+# Bump when extract_details changes so cached parsed records are redone
+PARSER_VERSION = 2
 
 REQUEST_DELAY = 1.2
 TIMEOUT = 30
 RETRIES = 3
 
+# Async mode
+CONCURRENCY = 8
+RATE_PER_HOST = 2.0      # sustained requests / second per host
+BURST_PER_HOST = 4
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+PARSE_WORKERS = 2
+
 session = requests.Session()
 session.headers.update(HEADERS)
 
@@ -32,7 +61,20 @@ def fetch_page(url):
         try:
             response = session.get(url, timeout=TIMEOUT)
             response.raise_for_status()
-            return BeautifulSoup(response.text, "html.parser")
+            return BeautifulSoup(response.text, HTML_PARSER)
+        except requests.exceptions.RequestException:
+            time.sleep(2)
+    return None
+
+
+def fetch_html(url, cache):
+    """
+    Conditional GET through the HTTP cache; returns (html, not_modified)
+    or None after RETRIES failures.
+    """
+    for _ in range(RETRIES):
+        try:
+            return cached_get(session, url, cache, timeout=TIMEOUT)
         except requests.exceptions.RequestException:
             time.sleep(2)
     return None
@@ -43,81 +85,385 @@ def safe_text(soup, selector):
     return el.get_text(strip=True) if el else "Not specified"
 
 
-def extract_list_after_label(soup, label_text):
-    """
-    Extract comma-separated values that appear after a label.
-    """
-    text = soup.get_text(" ").lower()
-    label = label_text.lower()
-    if label not in text:
-        return "Not specified"
-
-    parts = text.split(label, 1)[1]
-    return parts.split(".")[0].strip()
+def clean_text(text):
+    return " ".join(text.split()).strip(" ,")
 
 
 # ========================
 # DETAIL SCRAPER
 # ========================
 
-def scrape_assessment_details(url):
-    soup = fetch_page(url)
-    if soup is None:
+def scrape_assessment_details(url, cache=None):
+    if cache is None:
+        soup = fetch_page(url)
+        if soup is None:
+            return None
+
+        return extract_details(soup, url)
+
+    fetched = fetch_html(url, cache)
+    if fetched is None:
         return None
 
-    name = safe_text(soup, "h1")
-    description = safe_text(soup, "div.product-description")
+    return parse_with_cache(url, *fetched, cache)
 
-    full_text = soup.get_text(" ").lower()
 
-    # Duration
-    duration = "Not specified"
-    for token in full_text.split():
-        if token.isdigit():
-            duration = token
+def parse_with_cache(url, html, not_modified, cache):
+    """
+    Unchanged pages (304) reuse the record parsed last time.
+    """
+    if not_modified:
+        record = cache.get_parsed(url, PARSER_VERSION)
+        if record is not None:
+            return record
+
+    record = parse_assessment_details(html, url)
+    if record is not None:
+        cache.set_parsed(url, PARSER_VERSION, record)
+
+    return record
+
+
+def parse_assessment_details(html, url, parser=HTML_PARSER):
+    """
+    Parse a fetched page. Top-level so it can run in a process pool.
+    """
+    return extract_details(BeautifulSoup(html, parser), url)
+
+
+# Section headings on a product page -> record field
+SECTION_FIELDS = {
+    "description": "description",
+    "job levels": "job_levels",
+    "languages": "languages",
+    "assessment length": "duration",
+}
+
+# "<label>: <span class='catalogue__circle -yes'>" rows -> record field
+FLAG_FIELDS = {
+    "remote testing": "remote_support",
+    "adaptive/irt": "adaptive_support",
+}
+
+HEADING_TAGS = {"h2", "h3", "h4"}
+SCAN_TAGS = ["h1", "h2", "h3", "h4", "p"]
+
+
+def section_text(heading):
+    """
+    Text of the elements following a section heading, up to the next one.
+    """
+    parts = []
+    for sibling in heading.find_next_siblings():
+        if sibling.name in HEADING_TAGS:
             break
+        parts.append(sibling.get_text(" "))
 
-    # Job levels & languages (best-effort)
-    job_levels = extract_list_after_label(soup, "job level")
-    languages = extract_list_after_label(soup, "language")
+    return clean_text(" ".join(parts))
 
-    remote_support = "Yes" if "remote" in full_text else "No"
-    adaptive_support = "Yes" if "adaptive" in full_text else "No"
+
+def extract_details(soup, url):
+    """
+    Pull the record out of the labelled sections of a product page in a
+    single walk over headings and paragraphs. Missing sections stay
+    "Not specified" instead of picking up unrelated page text.
+    """
+    name = None
+    sections = {}
+    flags = {}
+
+    for el in soup.find_all(SCAN_TAGS):
+        if el.name == "h1":
+            if name is None:
+                name = clean_text(el.get_text(" "))
+
+        elif el.name in HEADING_TAGS:
+            field = SECTION_FIELDS.get(clean_text(el.get_text(" ")).lower())
+            if field and field not in sections:
+                sections[field] = section_text(el)
+
+        else:
+            label = el.get_text(" ").split(":", 1)[0]
+            field = FLAG_FIELDS.get(clean_text(label).lower())
+            if field and field not in flags:
+                flags[field] = el.find(class_="-yes") is not None
+
+    description = sections.get("description") or safe_text(soup, "div.product-description")
+
+    # "Approximate Completion Time in minutes = 30"
+    duration = "Not specified"
+    match = re.search(r"\d+", sections.get("duration", ""))
+    if match:
+        duration = match.group()
+
+    # Adaptive is only flagged in the catalogue table; fall back to the
+    # description when the page has no Adaptive/IRT row
+    adaptive = flags.get("adaptive_support")
+    if adaptive is None:
+        adaptive = "adaptive" in description.lower()
 
     return {
-        "name": name,
+        "name": name or "Not specified",
         "url": url,
-        "description": description,
+        "description": description or "Not specified",
         "duration": duration,
-        "job_levels": job_levels,
-        "languages": languages,
-        "remote_support": remote_support,
-        "adaptive_support": adaptive_support
+        "job_levels": sections.get("job_levels") or "Not specified",
+        "languages": sections.get("languages") or "Not specified",
+        "remote_support": "Yes" if flags.get("remote_support") else "No",
+        "adaptive_support": "Yes" if adaptive else "No"
     }
 
 
 # ========================
-# MAIN PIPELINE
+# BULK RE-PARSING
 # ========================
 
-def run_detail_scraping():
-    with open(INPUT_PATH, "r", encoding="utf-8") as f:
-        urls = json.load(f)
+def parse_cached_page(url, directory=CACHE_DIR, parser=HTML_PARSER):
+    """
+    Parse the cached body of `url`. Workers read the HTML from disk
+    themselves so only the URL and the record cross process boundaries.
+    """
+    html = HttpCache(directory).body(url)
+    if html is None:
+        return None
+
+    return parse_assessment_details(html, url, parser)
+
+
+def reparse_cached(urls, cache, workers=PARSE_WORKERS, parser=HTML_PARSER, chunksize=8):
+    """
+    Re-run extraction over cached HTML (no network), in a process pool
+    when workers > 0. Stores the new records as the cache's parsed data
+    and returns them in `urls` order (None where nothing is cached).
+    """
+    directories = [cache.directory] * len(urls)
+    parsers = [parser] * len(urls)
 
+    if workers:
+        with ProcessPoolExecutor(workers) as pool:
+            records = list(pool.map(
+                parse_cached_page, urls, directories, parsers, chunksize=chunksize
+            ))
+    else:
+        records = list(map(parse_cached_page, urls, directories, parsers))
+
+    for url, record in zip(urls, records):
+        if record is not None:
+            cache.set_parsed(url, PARSER_VERSION, record)
+
+    return records
+
+
+def benchmark_parsing(urls, cache, workers=PARSE_WORKERS):
+    """
+    Pages parsed per second for each available parser backend, in
+    process and with a process pool.
+    """
+    urls = [url for url in urls if cache.entry(url) is not None]
+    if not urls:
+        print("No cached pages to benchmark; run the scraper first.")
+        return []
+
+    parsers = ["html.parser"] + (["lxml"] if HTML_PARSER == "lxml" else [])
     results = []
+
+    print(f"Parsing {len(urls)} cached pages\n")
+
+    for parser in parsers:
+        for pool_size in sorted({0, workers}):
+            start = time.perf_counter()
+            reparse_cached(urls, cache, workers=pool_size, parser=parser)
+            elapsed = time.perf_counter() - start
+
+            result = {
+                "parser": parser,
+                "workers": pool_size,
+                "pages": len(urls),
+                "seconds": round(elapsed, 3),
+                "pages_per_second": round(len(urls) / elapsed, 1),
+            }
+            results.append(result)
+
+            print(
+                f"{parser:<12} workers={pool_size}: "
+                f"{result['pages_per_second']} pages/s ({elapsed:.2f}s)"
+            )
+
+    return results
+
+
+# ========================
+# ASYNC FETCHING
+# ========================
+
+class TokenBucket:
+    """
+    Per-host rate limiter: `rate` tokens/second, up to `burst` banked.
+    pause() blocks the host entirely, e.g. after a 429.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def backoff_delay(attempt, retry_after=None):
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass  # HTTP-date form; fall back to exponential
+
+    delay = BACKOFF_BASE * (2 ** attempt)
+    return min(delay, BACKOFF_MAX) * random.uniform(0.5, 1.0)
+
+
+async def fetch_html_async(http, url, buckets, cache=None, retries=RETRIES):
+    """
+    Returns (html, not_modified), or None if the page couldn't be fetched.
+    """
+    host = urlparse(url).netloc
+    bucket = buckets.setdefault(host, TokenBucket(RATE_PER_HOST, BURST_PER_HOST))
+
+    headers = cache.conditional_headers(url) if cache is not None else {}
+
+    for attempt in range(retries):
+        await bucket.acquire()
+
+        try:
+            async with http.get(url, headers=headers) as response:
+                if response.status == 304 and cache is not None:
+                    body = cache.body(url)
+                    if body is not None:
+                        cache.record_not_modified()
+                        return body, True
+
+                    headers = {}
+                    continue
+
+                if response.status in RETRY_STATUSES:
+                    delay = backoff_delay(
+                        attempt, response.headers.get("Retry-After")
+                    )
+                    # Slow the whole host down, not just this URL
+                    bucket.pause(delay)
+                    print(f"⚠️ {response.status} for {url}; backing off {delay:.1f}s")
+                    continue
+
+                if response.status >= 400:
+                    # Other client errors won't fix themselves
+                    print(f"⚠️ {response.status} for {url}; skipping")
+                    return None
+
+                html = await response.text()
+                if cache is not None:
+                    cache.store(url, html, response.headers)
+
+                return html, False
+
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            await asyncio.sleep(backoff_delay(attempt))
+
+    return None
+
+
+async def scrape_details_async(
+    urls,
+    concurrency=CONCURRENCY,
+    parse_workers=PARSE_WORKERS,
+    buckets=None,
+    cache=None,
+    checkpoint=None
+):
+    """
+    Fetch and parse assessment pages concurrently. One ClientSession
+    (keep-alive connection pool) is shared by all requests and parsing runs
+    in a process pool so it never blocks the event loop. Results keep the
+    order of `urls`; failed pages are None. Each record is appended to
+    `checkpoint` as soon as it is parsed.
+    """
+    loop = asyncio.get_running_loop()
+    buckets = {} if buckets is None else buckets
+    semaphore = asyncio.Semaphore(concurrency)
+
     total = len(urls)
+    done = 0
 
-    print(f"Scraping details for {total} assessments\n")
+    connector = aiohttp.TCPConnector(limit=concurrency, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=TIMEOUT)
+
+    pool = ProcessPoolExecutor(parse_workers) if parse_workers else None
+
+    async def scrape_one(url):
+        nonlocal done
 
-    for idx, url in enumerate(urls, start=1):
-        print(f"[{idx}/{total}] {url}")
+        async with semaphore:
+            fetched = await fetch_html_async(http, url, buckets, cache)
 
-        data = scrape_assessment_details(url)
-        if data:
-            results.append(data)
+        result = None
+        if fetched is not None:
+            html, not_modified = fetched
 
-        time.sleep(REQUEST_DELAY)
+            if cache is not None and not_modified:
+                result = cache.get_parsed(url, PARSER_VERSION)
+
+            if result is None:
+                result = await loop.run_in_executor(
+                    pool, parse_assessment_details, html, url
+                )
+                if cache is not None and result is not None:
+                    cache.set_parsed(url, PARSER_VERSION, result)
+
+            if checkpoint is not None and result is not None:
+                checkpoint.append(result)
+
+        done += 1
+        status = "ok" if result else "failed"
+        print(f"[{done}/{total}] {status} {url}")
+        return result
+
+    try:
+        async with aiohttp.ClientSession(
+            headers=HEADERS, connector=connector, timeout=timeout
+        ) as http:
+            return await asyncio.gather(*(scrape_one(url) for url in urls))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+# ========================
+# MAIN PIPELINE
+# ========================
 
+def save_results(results):
     OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
 
     with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
@@ -127,5 +473,152 @@ def run_detail_scraping():
     print(f"Output file: {OUTPUT_PATH}")
 
 
+def load_progress(urls, checkpoint, fresh):
+    if fresh:
+        checkpoint.clear()
+
+    done = checkpoint.load()
+    remaining = [url for url in urls if url not in done]
+
+    if done:
+        print(f"Resuming: {len(done)} assessments already checkpointed")
+
+    return done, remaining
+
+
+def finish(urls, records, checkpoint, cache):
+    # Keep the input order, like a single uninterrupted run
+    results = [records[url] for url in urls if url in records]
+    save_results(results)
+
+    if cache is not None:
+        print(f"HTTP cache: {cache.stats()}")
+
+    # Output is complete; the next run starts from scratch (and the HTTP
+    # cache turns unchanged pages into 304s)
+    checkpoint.clear()
+
+
+def run_detail_scraping_async(
+    concurrency=CONCURRENCY,
+    parse_workers=PARSE_WORKERS,
+    use_cache=True,
+    fresh=False
+):
+    with open(INPUT_PATH, "r", encoding="utf-8") as f:
+        urls = json.load(f)
+
+    cache = HttpCache() if use_cache else None
+    checkpoint = JsonlCheckpoint(CHECKPOINT_PATH)
+    records, remaining = load_progress(urls, checkpoint, fresh)
+
+    print(f"Scraping details for {len(remaining)} assessments (async, {concurrency} connections)\n")
+
+    start = time.perf_counter()
+    try:
+        results = asyncio.run(scrape_details_async(
+            remaining,
+            concurrency=concurrency,
+            parse_workers=parse_workers,
+            cache=cache,
+            checkpoint=checkpoint
+        ))
+    finally:
+        checkpoint.close()
+    elapsed = time.perf_counter() - start
+
+    fetched = [r for r in results if r]
+    print(f"\nFetched {len(fetched)} pages in {elapsed:.1f}s ({len(remaining) / max(elapsed, 1e-9):.2f} pages/s)")
+
+    records.update((r["url"], r) for r in fetched)
+    finish(urls, records, checkpoint, cache)
+
+
+def run_detail_scraping(use_cache=True, fresh=False):
+    with open(INPUT_PATH, "r", encoding="utf-8") as f:
+        urls = json.load(f)
+
+    cache = HttpCache() if use_cache else None
+    checkpoint = JsonlCheckpoint(CHECKPOINT_PATH)
+    records, remaining = load_progress(urls, checkpoint, fresh)
+
+    total = len(remaining)
+
+    print(f"Scraping details for {total} assessments\n")
+
+    try:
+        for idx, url in enumerate(remaining, start=1):
+            print(f"[{idx}/{total}] {url}")
+
+            not_modified_before = cache.not_modified if cache else 0
+
+            data = scrape_assessment_details(url, cache)
+            if data:
+                records[url] = data
+                checkpoint.append(data)
+
+            # A 304 is cheap; only pace real fetches
+            if not cache or cache.not_modified == not_modified_before:
+                time.sleep(REQUEST_DELAY)
+    finally:
+        checkpoint.close()
+
+    finish(urls, records, checkpoint, cache)
+
+
+def run_reparse(workers=PARSE_WORKERS):
+    with open(INPUT_PATH, "r", encoding="utf-8") as f:
+        urls = json.load(f)
+
+    start = time.perf_counter()
+    records = reparse_cached(urls, HttpCache(), workers=workers)
+    elapsed = time.perf_counter() - start
+
+    results = [r for r in records if r]
+    print(f"Re-parsed {len(results)} cached pages in {elapsed:.2f}s ({len(results) / max(elapsed, 1e-9):.1f} pages/s)")
+    if len(results) < len(urls):
+        print(f"⚠️ {len(urls) - len(results)} pages not cached; run the scraper to fetch them")
+
+    save_results(results)
+
+
 if __name__ == "__main__":
-    run_detail_scraping()
+    parser = argparse.ArgumentParser(description="Scrape SHL assessment detail pages")
+    parser.add_argument(
+        "--async", dest="use_async", action="store_true",
+        help="concurrent, rate-limited fetching"
+    )
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--parse-workers", type=int, default=PARSE_WORKERS)
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="don't use the on-disk HTTP cache / conditional GETs"
+    )
+    parser.add_argument(
+        "--fresh", action="store_true",
+        help="discard the checkpoint of an interrupted run"
+    )
+    parser.add_argument(
+        "--reparse", action="store_true",
+        help="re-extract records from cached HTML without fetching"
+    )
+    parser.add_argument(
+        "--benchmark", action="store_true",
+        help="report pages parsed per second over the cached HTML"
+    )
+    args = parser.parse_args()
+
+    if args.benchmark:
+        with open(INPUT_PATH, "r", encoding="utf-8") as f:
+            benchmark_parsing(json.load(f), HttpCache(), args.parse_workers)
+    elif args.reparse:
+        run_reparse(args.parse_workers)
+    elif args.use_async:
+        run_detail_scraping_async(
+            args.concurrency,
+            args.parse_workers,
+            use_cache=not args.no_cache,
+            fresh=args.fresh
+        )
+    else:
+        run_detail_scraping(use_cache=not args.no_cache, fresh=args.fresh)
@@ -0,0 +1,139 @@
+"""
+MicroBatcher (api/batching.py) worker resilience: a caller that goes away
+while its query waits must not take the batch worker down with it.
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from api.batching import DeadlineExceeded, MicroBatcher
+
+TIMEOUT = 5
+
+
+class BlockingEngine:
+    """
+    Returns one hit per query. The first search blocks until `release` is
+    set, so tests can queue queries behind a batch in progress.
+    """
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.searched = []
+
+    def search(self, queries, top_k, filters=None):
+        self.started.set()
+        assert self.release.wait(TIMEOUT)
+        self.searched.extend(queries)
+        return [[{"query": query}] for query in queries]
+
+
+@pytest.fixture
+def engine():
+    return BlockingEngine()
+
+
+@pytest.fixture
+def batcher(engine):
+    batcher = MicroBatcher(engine, top_k=5, batch_window_ms=0)
+    yield batcher
+    engine.release.set()
+    batcher.close()
+
+
+def batch_workers():
+    return [t for t in threading.enumerate() if t.name.startswith("recommend-batcher")]
+
+
+def test_cancelled_query_does_not_stop_the_worker(engine, batcher):
+    first = batcher.submit("first")
+    assert engine.started.wait(TIMEOUT)
+
+    waiting = batcher.submit("cancelled")
+    assert waiting.cancel()
+
+    engine.release.set()
+    assert first.result(TIMEOUT) == [{"query": "first"}]
+
+    # Served by the same, still running, worker
+    assert batcher.submit("after").result(TIMEOUT) == [{"query": "after"}]
+    assert len(batch_workers()) == 1
+    assert "cancelled" not in engine.searched
+    assert batcher.stats.snapshot()["cancelled"] == 1
+
+
+def test_disconnected_async_caller_does_not_stop_the_worker(engine, batcher):
+    first = batcher.submit("first")
+    assert engine.started.wait(TIMEOUT)
+
+    async def disconnect():
+        # What a cancelled request handler does to the concurrent Future
+        task = asyncio.ensure_future(asyncio.wrap_future(batcher.submit("gone")))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(disconnect())
+    engine.release.set()
+    first.result(TIMEOUT)
+
+    assert batcher.submit("after").result(TIMEOUT) == [{"query": "after"}]
+    assert len(batch_workers()) == 1
+
+
+def test_failing_batch_does_not_stop_the_worker(engine, batcher):
+    engine.release.set()
+
+    def broken_observer(stage, seconds, count=1):
+        raise RuntimeError("observer failed")
+
+    batcher.stage_observer = broken_observer
+    with pytest.raises(RuntimeError, match="observer failed"):
+        batcher.submit("failed").result(TIMEOUT)
+
+    batcher.stage_observer = None
+    assert batcher.submit("after").result(TIMEOUT) == [{"query": "after"}]
+
+
+def test_expired_query_of_a_gone_caller_does_not_stop_the_worker(engine, batcher):
+    first = batcher.submit("first")
+    assert engine.started.wait(TIMEOUT)
+
+    # Both expire behind the blocked batch; one caller has gone away
+    gone = batcher.submit("gone", deadline_ms=10)
+    expired = batcher.submit("expired", deadline_ms=10)
+    assert gone.cancel()
+    time.sleep(0.05)
+
+    engine.release.set()
+    first.result(TIMEOUT)
+
+    with pytest.raises(DeadlineExceeded):
+        expired.result(TIMEOUT)
+    assert batcher.submit("after").result(TIMEOUT) == [{"query": "after"}]
+    assert len(batch_workers()) == 1
+
+    stats = batcher.stats.snapshot()
+    assert stats["shed"]["deadline_expired"] == 1
+    assert stats["cancelled"] == 1
+
+
+def test_failed_search_does_not_stop_the_worker(batcher):
+    class FailingOnce(BlockingEngine):
+        def search(self, queries, top_k, filters=None):
+            if not self.searched:
+                self.searched.append(None)
+                raise RuntimeError("search failed")
+            return super().search(queries, top_k, filters)
+
+    batcher.engine = FailingOnce()
+    batcher.engine.release.set()
+
+    with pytest.raises(RuntimeError, match="search failed"):
+        batcher.submit("failed").result(TIMEOUT)
+    assert batcher.submit("after").result(TIMEOUT) == [{"query": "after"}]
+    assert batcher.stats.snapshot()["errors"] == 1
@@ -0,0 +1,172 @@
+"""
+/recommend/batch (api/app.py) with the search stubbed out: request
+metrics cover the whole streamed response, search failures reach the
+client as a fixed message, and admission is bounded by BULK_MAX_REQUESTS.
+"""
+import asyncio
+import json
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import ClientDisconnect
+
+from api import app as api_app
+from api import metrics
+
+ENDPOINT = "/recommend/batch"
+SEARCH_SECONDS = 0.2
+
+
+def requests_with(status):
+    return metrics.REQUESTS.labels(ENDPOINT, status).get()
+
+
+def duration():
+    child = metrics.REQUEST_DURATION.labels(ENDPOINT)
+    return sum(child.counts), child.sum
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def slow_search(queries, filters):
+        await asyncio.sleep(SEARCH_SECONDS)
+        return [[{"query": query}] for query in queries]
+
+    monkeypatch.setattr(api_app, "bulk_search", slow_search)
+    monkeypatch.setattr(api_app.engine.ready, "is_set", lambda: True)
+    monkeypatch.setattr(api_app, "bulk_slots", threading.BoundedSemaphore(1))
+
+    # No lifespan: nothing is loaded, the stubs answer everything
+    return TestClient(api_app.app, raise_server_exceptions=False)
+
+
+def test_duration_covers_the_streamed_body(client):
+    count, total = duration()
+    ok = requests_with("200")
+
+    response = client.post(ENDPOINT, json=["java developer", "sales manager"])
+
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 2
+    assert requests_with("200") == ok + 1
+
+    new_count, new_total = duration()
+    assert new_count == count + 1
+    assert new_total - total >= SEARCH_SECONDS
+
+
+def test_errors_while_streaming_are_counted(client, monkeypatch):
+    def broken_parse(row):
+        raise RuntimeError("parser bug")
+
+    monkeypatch.setattr(api_app, "parse_bulk_row", broken_parse)
+    failed = requests_with("500")
+    ok = requests_with("200")
+
+    client.post(ENDPOINT, json=["java developer"])
+
+    assert requests_with("500") == failed + 1
+    assert requests_with("200") == ok
+    assert metrics.IN_FLIGHT.labels(ENDPOINT).get() == 0
+
+
+def test_errors_before_streaming_are_counted(client):
+    rejected = requests_with("415")
+
+    response = client.post(ENDPOINT, content=b"x", headers={"content-type": "text/plain"})
+
+    assert response.status_code == 415
+    assert requests_with("415") == rejected + 1
+    assert metrics.IN_FLIGHT.labels(ENDPOINT).get() == 0
+
+
+def test_search_errors_are_not_sent_to_the_client(client, monkeypatch, capsys):
+    async def failing_search(queries, filters):
+        raise OSError("/srv/data/faiss.index: Input/output error")
+
+    monkeypatch.setattr(api_app, "bulk_search", failing_search)
+
+    response = client.post(ENDPOINT, json=["java developer", {"id": "x"}])
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    assert lines[0] == {"index": 0, "error": "search failed"}
+    # Row-level parse errors still say what is wrong with the row
+    assert lines[1]["id"] == "x"
+    assert "query" in lines[1]["error"]
+
+    assert "faiss.index" not in response.text
+    assert "faiss.index" in capsys.readouterr().out
+
+
+def slot_is_free():
+    if not api_app.bulk_slots.acquire(blocking=False):
+        return False
+    api_app.bulk_slots.release()
+    return True
+
+
+def test_bulk_requests_beyond_the_limit_get_429(client):
+    shed = metrics.SHED.labels("bulk_full").get()
+
+    # One bulk request already in progress
+    assert api_app.bulk_slots.acquire(blocking=False)
+    try:
+        response = client.post(ENDPOINT, json=["java developer"])
+    finally:
+        api_app.bulk_slots.release()
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == api_app.RETRY_AFTER
+    assert metrics.SHED.labels("bulk_full").get() == shed + 1
+
+    assert client.post(ENDPOINT, json=["java developer"]).status_code == 200
+    assert slot_is_free()
+
+
+def test_slot_is_released_on_every_outcome(client, monkeypatch):
+    # Rejected before streaming
+    client.post(ENDPOINT, content=b"x", headers={"content-type": "text/plain"})
+    assert slot_is_free()
+
+    # Failed while streaming
+    def broken_parse(row):
+        raise RuntimeError("parser bug")
+
+    monkeypatch.setattr(api_app, "parse_bulk_row", broken_parse)
+    client.post(ENDPOINT, json=["java developer"])
+    assert slot_is_free()
+
+
+def test_client_gone_mid_stream_is_recorded_and_frees_the_slot(client):
+    """
+    Drive the ASGI app directly: the client accepts the response start,
+    then the connection drops on the first body chunk.
+    """
+    closed = requests_with(metrics.CLIENT_CLOSED_STATUS)
+    body = json.dumps(["java developer"] * 3).encode()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"},
+        "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": ENDPOINT, "raw_path": ENDPOINT.encode(), "query_string": b"",
+        "root_path": "", "headers": [(b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            raise OSError("connection reset")
+
+    async def main():
+        with pytest.raises(ClientDisconnect):
+            await api_app.app(scope, receive, send)
+
+    asyncio.run(main())
+
+    assert requests_with(metrics.CLIENT_CLOSED_STATUS) == closed + 1
+    assert metrics.IN_FLIGHT.labels(ENDPOINT).get() == 0
+    assert slot_is_free()
@@ -0,0 +1,178 @@
+"""
+Parallel catalog crawl (scraper/scrape_shl.py) with one HttpCache and one
+RateLimiter shared by the type-filter threads: together they stay under
+the limiter's rate, 304s are told apart per call, and the cache counters
+add up across threads.
+"""
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from scraper import scrape_shl
+from scraper.http_cache import HttpCache
+
+CACHED_TYPE = 1
+FRESH_TYPE = 2
+LAST_START = {CACHED_TYPE: scrape_shl.PAGE_SIZE, FRESH_TYPE: 2 * scrape_shl.PAGE_SIZE}
+
+
+def catalog_html(type_id, start):
+    links = "".join(
+        f'<a href="/products/product-catalog/view/t{type_id}-{start}-{i}/">x</a>'
+        for i in range(3)
+    )
+    pages = "".join(
+        f'<a href="?type={type_id}&start={offset}">{offset}</a>'
+        for offset in range(0, LAST_START[type_id] + 1, scrape_shl.PAGE_SIZE)
+    )
+    return f"<html><body>{links}<div class='pagination'>{pages}</div></body></html>"
+
+
+class FakeResponse:
+    def __init__(self, status_code, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(self.status_code)
+
+
+class FakeCatalog:
+    """
+    Serves catalog pages with an ETag per URL. Fetches of the fresh type
+    wait until the cached type has been answered with a 304, so a 304 in
+    one thread always lands while the other is fetching.
+    """
+
+    def __init__(self):
+        self.first_304 = threading.Event()
+        self.request_times = []
+
+    def session(self):
+        catalog = self
+
+        class Session:
+            headers = {}
+
+            def get(self, url, timeout=None, headers=None):
+                return catalog.get(url, headers or {})
+
+        return Session()
+
+    def get(self, url, headers):
+        self.request_times.append(time.monotonic())
+        query = parse_qs(urlparse(url).query)
+        type_id, start = int(query["type"][0]), int(query["start"][0])
+        etag = f'"{type_id}-{start}"'
+
+        if headers.get("If-None-Match") == etag:
+            self.first_304.set()
+            return FakeResponse(304)
+
+        if type_id == FRESH_TYPE:
+            assert self.first_304.wait(timeout=5)
+
+        return FakeResponse(200, catalog_html(type_id, start), {"ETag": etag})
+
+
+def test_parallel_crawl_shares_one_rate(tmp_path, monkeypatch):
+    catalog = FakeCatalog()
+    monkeypatch.setattr(scrape_shl.requests, "Session", catalog.session)
+
+    cache = HttpCache(tmp_path)
+    lock = threading.Lock()
+
+    # Warm the cache for the cached type; nothing blocks without a 304
+    catalog.first_304.set()
+    scrape_shl.crawl_type_filter(
+        CACHED_TYPE, set(), lock, cache=cache, limiter=scrape_shl.RateLimiter(1000.0, 10)
+    )
+    catalog.first_304.clear()
+    catalog.request_times.clear()
+    cache.fetched = 0
+
+    rate = 20.0
+    limiter = scrape_shl.RateLimiter(rate, burst=1)
+    collected = set()
+    results = {}
+
+    def crawl(type_id):
+        results[type_id] = scrape_shl.crawl_type_filter(
+            type_id, collected, lock, cache=cache, limiter=limiter
+        )
+
+    threads = [
+        threading.Thread(target=crawl, args=(type_id,))
+        for type_id in (FRESH_TYPE, CACHED_TYPE)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert results[CACHED_TYPE]["pages"] == 2
+    assert results[FRESH_TYPE]["pages"] == 3
+    assert len(collected) == 5 * 3
+
+    # Both threads together: one request per 1 / rate, not one each
+    times = sorted(catalog.request_times)
+    assert len(times) == 5
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    assert min(gaps) >= 0.9 / rate
+
+    assert cache.stats() == {"fetched": 3, "not_modified": 2}
+
+
+def test_rate_limiter_is_shared_across_threads():
+    rate, threads, calls = 50.0, 8, 5
+    limiter = scrape_shl.RateLimiter(rate, burst=1)
+
+    def take():
+        for _ in range(calls):
+            limiter.acquire()
+
+    started = time.monotonic()
+    workers = [threading.Thread(target=take) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    # The first token is free, every other one waits for the shared rate
+    assert time.monotonic() - started >= 0.9 * (threads * calls - 1) / rate
+
+
+def test_fetch_catalog_page_reports_not_modified(tmp_path):
+    catalog = FakeCatalog()
+    catalog.first_304.set()
+    http = catalog.session()
+    cache = HttpCache(tmp_path)
+    url = f"{scrape_shl.CATALOG_URL}?type={CACHED_TYPE}&start=0"
+
+    first, not_modified = scrape_shl.fetch_catalog_page(url, CACHED_TYPE, http=http, cache=cache)
+    assert not not_modified
+    assert first["last_start"] == LAST_START[CACHED_TYPE]
+
+    again, not_modified = scrape_shl.fetch_catalog_page(url, CACHED_TYPE, http=http, cache=cache)
+    assert not_modified
+    assert again == first
+
+
+def test_counters_are_exact_across_threads(tmp_path):
+    cache = HttpCache(tmp_path)
+
+    def bump():
+        for _ in range(2000):
+            cache.record_not_modified()
+
+    threads = [threading.Thread(target=bump) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache.not_modified == 8 * 2000
@@ -0,0 +1,149 @@
+"""
+Filtered search (pipeline/filters.py through IndexSnapshot) on records
+with real SHL job levels and a mix of remote / adaptive flags: every
+filtered query still gets the true top-k among the matching records.
+"""
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from pipeline.filters import make_filters, split_levels
+from pipeline.prepare_embeddings import document_id
+from pipeline.record_store import RecordStore, compile_records
+from pipeline.retriever import IndexSnapshot
+
+DIM = 32
+COUNT = 400
+TOP_K = 5
+
+LEVELS = (
+    "Entry-Level, Graduate",
+    "Graduate, Mid-Professional, Professional Individual Contributor",
+    "Mid-Professional, Professional Individual Contributor",
+    "Manager, Front Line Manager, Supervisor",
+    "Director, Executive",
+    "General Population",
+    "Not specified",
+)
+
+
+def make_catalogue(count=COUNT, seed=0):
+    rng = np.random.default_rng(seed)
+    corpus, catalogue = [], []
+
+    for i in range(count):
+        url = f"https://www.shl.com/products/product-catalog/view/test-{i}/"
+        corpus.append({"id": i, "url": url, "text": f"Assessment {i}. Description."})
+        catalogue.append({
+            "name": f"Assessment {i}",
+            "url": url,
+            "description": "Description.",
+            "duration": str(int(rng.integers(5, 60))),
+            "job_levels": LEVELS[i % len(LEVELS)],
+            "languages": "English (USA)",
+            "remote_support": "Yes" if i % 3 else "No",
+            "adaptive_support": "Yes" if i % 4 == 0 else "No",
+        })
+
+    embeddings = rng.standard_normal((count, DIM)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return corpus, catalogue, embeddings
+
+
+def matches(record, filters):
+    duration = int(record["duration"])
+    if filters.min_duration is not None and duration < filters.min_duration:
+        return False
+    if filters.max_duration is not None and duration > filters.max_duration:
+        return False
+    if filters.remote is not None and (record["remote_support"] == "Yes") != filters.remote:
+        return False
+    if filters.adaptive is not None and (record["adaptive_support"] == "Yes") != filters.adaptive:
+        return False
+    if filters.job_levels and not set(split_levels(record["job_levels"])) & set(filters.job_levels):
+        return False
+    return True
+
+
+def build(kind, embeddings, corpus):
+    if kind == "flat":
+        index = faiss.IndexFlatIP(DIM)
+        index.add(embeddings)
+    elif kind == "idmap":
+        index = faiss.IndexIDMap2(faiss.IndexFlatIP(DIM))
+        ids = np.array([document_id(item["url"]) for item in corpus], dtype=np.int64)
+        index.add_with_ids(embeddings, ids)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(DIM, 16, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efSearch = 16
+        index.add(embeddings)
+    else:
+        quantizer = faiss.IndexFlatIP(DIM)
+        index = faiss.IndexIVFFlat(quantizer, DIM, 16, faiss.METRIC_INNER_PRODUCT)
+        index.train(embeddings)
+        index.add(embeddings)
+        index.nprobe = 1
+    return index
+
+
+FILTERS = [
+    make_filters(job_levels=["Graduate"]),
+    make_filters(job_levels=["director", "Front Line Manager"]),
+    make_filters(remote=False),
+    make_filters(remote=True, adaptive=True),
+    make_filters(max_duration=20, job_levels=["Mid-Professional"]),
+]
+
+
+@pytest.fixture(params=["json", "records_bin"])
+def records(request, tmp_path):
+    corpus, catalogue, embeddings = make_catalogue()
+    if request.param == "json":
+        return corpus, catalogue, embeddings, catalogue
+
+    path = tmp_path / "records.bin"
+    compile_records(corpus, catalogue, path)
+    return corpus, catalogue, embeddings, RecordStore(path)
+
+
+@pytest.mark.parametrize("kind", ["flat", "idmap", "hnsw", "ivf"])
+@pytest.mark.parametrize("filters", FILTERS)
+def test_filtered_search_returns_true_top_k(records, kind, filters):
+    corpus, catalogue, embeddings, store = records
+    snapshot = IndexSnapshot(build(kind, embeddings, corpus), store)
+
+    queries = embeddings[:8] + 0.05
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    scores, positions = snapshot.search(queries, TOP_K, filters)
+
+    allowed = np.array([matches(record, filters) for record in catalogue])
+    assert allowed.sum() >= TOP_K
+
+    expected = np.argsort(-(queries @ embeddings[allowed].T), axis=1)[:, :TOP_K]
+    expected = np.flatnonzero(allowed)[expected]
+
+    for row in range(len(queries)):
+        assert len(positions[row]) == TOP_K
+        assert all(allowed[p] for p in positions[row])
+        if kind in ("flat", "idmap"):
+            assert list(positions[row]) == list(expected[row])
+
+
+def test_filter_without_matches_returns_no_hits(records):
+    corpus, _, embeddings, store = records
+    snapshot = IndexSnapshot(build("flat", embeddings, corpus), store)
+
+    _, positions = snapshot.search(
+        embeddings[:2], TOP_K, make_filters(job_levels=["Astronaut"])
+    )
+    assert (positions == -1).all()
+
+
+def test_filter_index_lists_real_levels(records):
+    corpus, _, embeddings, store = records
+    snapshot = IndexSnapshot(build("flat", embeddings, corpus), store)
+
+    assert "professional individual contributor" in snapshot.filter_index.job_levels
+    assert "not specified" not in snapshot.filter_index.job_levels
@@ -0,0 +1,47 @@
+"""
+Request files for the load generator (benchmarks/loadgen.py): lines that
+could never be a /recommend body are rejected up front, naming the line.
+"""
+import pytest
+
+from benchmarks.loadgen import load_requests, workload
+
+
+def write_lines(tmp_path, *lines):
+    path = tmp_path / "requests.jsonl"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+def test_request_objects_and_bare_queries(tmp_path):
+    path = write_lines(
+        tmp_path, '{"query": "java developer", "max_duration": 30}', "", '"sales manager"'
+    )
+
+    bodies = load_requests(path)
+
+    assert bodies == [
+        {"query": "java developer", "max_duration": 30},
+        {"query": "sales manager"},
+    ]
+    assert next(workload(bodies, unique=True))["query"] == "java developer #0"
+
+
+@pytest.mark.parametrize("line", [
+    '{"max_duration": 30}',
+    '{"query": null}',
+    '{"query": "   "}',
+    '{"q": "java developer"}',
+])
+def test_objects_without_a_query_are_rejected(tmp_path, line):
+    path = write_lines(tmp_path, '{"query": "ok"}', line)
+
+    with pytest.raises(ValueError, match=r'requests\.jsonl:2: request object has no "query"'):
+        load_requests(path)
+
+
+def test_invalid_json_names_the_line(tmp_path):
+    path = write_lines(tmp_path, '{"query": "ok"}', '{"query": ')
+
+    with pytest.raises(ValueError, match=r"requests\.jsonl:2: not valid JSON"):
+        load_requests(path)
@@ -0,0 +1,63 @@
+"""
+Request tracking (api/metrics.py): every way out of a tracked request is
+counted under the right status and leaves nothing in flight.
+"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from api import metrics
+
+
+def requests_with(endpoint, status):
+    return metrics.REQUESTS.labels(endpoint, status).get()
+
+
+def in_flight(endpoint):
+    return metrics.IN_FLIGHT.labels(endpoint).get()
+
+
+@pytest.mark.parametrize("exc, status", [
+    (None, "200"),
+    (HTTPException(status_code=503), "503"),
+    (RuntimeError("boom"), "500"),
+    (asyncio.CancelledError(), metrics.CLIENT_CLOSED_STATUS),
+    (GeneratorExit(), metrics.CLIENT_CLOSED_STATUS),
+])
+def test_track_request_status(exc, status):
+    endpoint = f"/test/{status}/{type(exc).__name__}"
+
+    try:
+        with metrics.track_request(endpoint):
+            if exc is not None:
+                raise exc
+    except BaseException as raised:
+        assert raised is exc
+
+    assert requests_with(endpoint, status) == 1
+    assert requests_with(endpoint, "200") == (1 if status == "200" else 0)
+    assert in_flight(endpoint) == 0
+
+
+def test_cancelled_handler_is_not_counted_as_success():
+    endpoint = "/test/cancelled-task"
+    started = asyncio.Event()
+
+    async def handler():
+        with metrics.track_request(endpoint):
+            started.set()
+            await asyncio.sleep(10)
+
+    async def main():
+        task = asyncio.ensure_future(handler())
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+
+    assert requests_with(endpoint, metrics.CLIENT_CLOSED_STATUS) == 1
+    assert requests_with(endpoint, "200") == 0
+    assert in_flight(endpoint) == 0
@@ -0,0 +1,157 @@
+"""
+Async detail scraper (scraper/scrape_shl_details.py) against a local
+aiohttp server serving the product page fixture: the connection cap,
+the per-host token bucket, 429 / Retry-After backoff and 304 reuse of
+cached parsed records.
+"""
+import asyncio
+import time
+from pathlib import Path
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from scraper import scrape_shl_details
+from scraper.http_cache import HttpCache
+from scraper.scrape_shl_details import TokenBucket, scrape_details_async
+
+FIXTURES = Path(__file__).parent / "fixtures"
+PAGE = (FIXTURES / "shl_product_page.html").read_text(encoding="utf-8")
+
+# Large enough that only the bucket under test limits anything
+UNLIMITED = 1000.0
+
+
+class FakeCatalogue:
+    """
+    Serves /view/<slug>/ as the fixture page, renamed to the slug, with an
+    ETag. Records every request; `throttle` maps a slug to the number of
+    429s (with Retry-After) it answers before the page.
+    """
+
+    def __init__(self, delay=0.0, throttle=None, retry_after="0.3"):
+        self.delay = delay
+        self.throttle = dict(throttle or {})
+        self.retry_after = retry_after
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.not_modified = 0
+
+        self.app = web.Application()
+        self.app.router.add_get("/view/{slug}/", self.handle)
+
+    async def handle(self, request):
+        slug = request.match_info["slug"]
+        self.requests.append((slug, time.monotonic()))
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+
+        if self.throttle.get(slug):
+            self.throttle[slug] -= 1
+            return web.Response(status=429, headers={"Retry-After": self.retry_after})
+
+        etag = f'"{slug}"'
+        if request.headers.get("If-None-Match") == etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers={"ETag": etag})
+
+        body = PAGE.replace("Java 8 (New)", slug)
+        return web.Response(text=body, content_type="text/html", headers={"ETag": etag})
+
+
+async def scrape(server, slugs, rate=UNLIMITED, burst=UNLIMITED, **kwargs):
+    urls = [str(server.make_url(f"/view/{slug}/")) for slug in slugs]
+    buckets = {f"127.0.0.1:{server.port}": TokenBucket(rate, burst)}
+    return await scrape_details_async(urls, parse_workers=0, buckets=buckets, **kwargs)
+
+
+def run(catalogue, *scrapes):
+    """
+    Start the server, run each scrape (slugs, kwargs) in turn against it
+    and return their results.
+    """
+    async def main():
+        server = TestServer(catalogue.app, host="127.0.0.1")
+        await server.start_server()
+        try:
+            return [await scrape(server, slugs, **kwargs) for slugs, kwargs in scrapes]
+        finally:
+            await server.close()
+
+    return asyncio.run(main())
+
+
+def slugs(n):
+    return [f"page-{i}" for i in range(n)]
+
+
+def test_connections_are_capped_at_concurrency():
+    catalogue = FakeCatalogue(delay=0.1)
+
+    [results] = run(catalogue, (slugs(12), {"concurrency": 3}))
+
+    assert [r["name"] for r in results] == slugs(12)
+    assert catalogue.max_in_flight == 3
+
+
+def test_requests_follow_the_token_bucket():
+    rate, burst, n = 20.0, 2, 10
+    catalogue = FakeCatalogue()
+
+    [results] = run(catalogue, (slugs(n), {"rate": rate, "burst": burst, "concurrency": n}))
+
+    assert all(results)
+    times = sorted(t for _, t in catalogue.requests)
+    start = times[0]
+
+    # The burst goes out at once, the rest at `rate`
+    assert sum(t - start < 0.5 / rate for t in times) <= burst
+    assert times[-1] - start >= 0.9 * (n - burst) / rate
+    for i, t in enumerate(times):
+        assert t - start >= 0.9 * max(0, i + 1 - burst) / rate
+
+
+def test_429_backs_off_for_retry_after():
+    catalogue = FakeCatalogue(throttle={"page-0": 1}, retry_after="0.3")
+
+    [results] = run(catalogue, (slugs(2), {"concurrency": 1}))
+
+    assert [r["name"] for r in results] == slugs(2)
+
+    attempts = [t for slug, t in catalogue.requests if slug == "page-0"]
+    assert len(attempts) == 2
+    assert attempts[1] - attempts[0] >= 0.29
+
+    # The pause covers the host, so the next page waits behind it too
+    later = [t for slug, t in catalogue.requests if slug == "page-1"]
+    assert later[0] - attempts[0] >= 0.29
+
+
+def test_unchanged_pages_reuse_cached_records(tmp_path, monkeypatch):
+    cache = HttpCache(tmp_path)
+    catalogue = FakeCatalogue()
+
+    parsed = []
+    parse = scrape_shl_details.parse_assessment_details
+
+    def counting_parse(html, url, *args):
+        parsed.append(url)
+        return parse(html, url, *args)
+
+    monkeypatch.setattr(scrape_shl_details, "parse_assessment_details", counting_parse)
+
+    # Same server (and URLs) for both runs
+    first, second = run(catalogue, (slugs(5), {"cache": cache}), (slugs(5), {"cache": cache}))
+
+    assert all(first)
+    assert second == first
+    assert catalogue.not_modified == 5
+    assert cache.stats() == {"fetched": 5, "not_modified": 5}
+    # Only the first run parsed; the 304s reused the cached records
+    assert len(parsed) == 5
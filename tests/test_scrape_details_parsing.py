@@ -0,0 +1,78 @@
+"""
+Section-based extraction (scraper/scrape_shl_details.py) on product page
+markup: the labelled sections are read, while the language / region
+picker in the header and the footer, which produced job_levels='and
+region' and footer text in languages, are ignored.
+"""
+from pathlib import Path
+
+import pytest
+
+from scraper.http_cache import HttpCache
+from scraper.scrape_shl_details import (
+    PARSER_VERSION,
+    parse_assessment_details,
+    reparse_cached,
+)
+
+FIXTURES = Path(__file__).parent / "fixtures"
+URL = "https://www.shl.com/products/product-catalog/view/java-8-new/"
+
+PARSERS = ["html.parser"]
+try:
+    import lxml  # noqa: F401
+    PARSERS.append("lxml")
+except ImportError:
+    pass
+
+
+def read_fixture(name):
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_extracts_labelled_sections(parser):
+    record = parse_assessment_details(read_fixture("shl_product_page.html"), URL, parser)
+
+    assert record == {
+        "name": "Java 8 (New)",
+        "url": URL,
+        "description": (
+            "Multi-choice test that measures the knowledge of Java class design, "
+            "exceptions, generics, collections, concurrency, JDBC and Java I/O "
+            "fundamentals."
+        ),
+        "duration": "18",
+        "job_levels": "Mid-Professional, Professional Individual Contributor",
+        "languages": "English (USA)",
+        "remote_support": "Yes",
+        "adaptive_support": "No",
+    }
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_missing_sections_stay_not_specified(parser):
+    record = parse_assessment_details(
+        read_fixture("shl_product_page_minimal.html"), URL, parser
+    )
+
+    assert record["name"] == "Verify - Numerical Ability"
+    assert record["job_levels"] == "Not specified"
+    assert record["languages"] == "Not specified"
+    assert record["duration"] == "Not specified"
+    assert record["remote_support"] == "No"
+    # No Adaptive/IRT row: falls back to the description
+    assert record["adaptive_support"] == "Yes"
+
+
+def test_reparse_cached_updates_parsed_records(tmp_path):
+    cache = HttpCache(tmp_path)
+    cache.store(URL, read_fixture("shl_product_page.html"), {"ETag": '"v1"'})
+    cache.set_parsed(URL, PARSER_VERSION - 1, {"job_levels": "and region"})
+
+    missing = URL.replace("java-8-new", "not-cached")
+    records = reparse_cached([URL, missing], cache, workers=0)
+
+    assert records[1] is None
+    assert records[0]["job_levels"] == "Mid-Professional, Professional Individual Contributor"
+    assert cache.get_parsed(URL, PARSER_VERSION) == records[0]